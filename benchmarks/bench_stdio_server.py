@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Crawl4AI MCP标准输入输出服务器的吞吐量/延迟基准测试。
+
+启动本地固定站点，通过管道启动crawl4ai_mcp_server.py，按场景以指定并发发送JSON-RPC请求，
+统计每个场景（工具）的请求速率、延迟分位数、首个响应时间和服务器进程树的峰值RSS，
+结果以JSON输出，可与之前的结果比较以发现性能回退。
+
+用法：
+    python benchmarks/bench_stdio_server.py --requests 20 --concurrency 4 --output bench.json
+    python benchmarks/bench_stdio_server.py --compare bench.json --tolerance 0.15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:  # psutil为可选依赖，缺失时从/proc读取RSS
+    psutil = None
+
+from fixture_server import FixtureServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SERVER = os.path.join(REPO_ROOT, "crawl4ai_mcp_server.py")
+
+# RSS采样间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.05
+
+# 场景：调用的工具和按序号生成参数的函数，参数中的{base}为固定站点地址
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "crawl_webpage_static": {
+        "tool": "crawl_webpage",
+        "arguments": lambda base, i: {"url": f"{base}/static/{i}", "bypass_cache": True},
+    },
+    "crawl_webpage_cached": {
+        "tool": "crawl_webpage",
+        "arguments": lambda base, i: {"url": f"{base}/static/0"},
+    },
+    "crawl_webpage_js": {
+        "tool": "crawl_webpage",
+        "arguments": lambda base, i: {"url": f"{base}/js/{i}", "bypass_cache": True},
+    },
+    "crawl_webpage_slow": {
+        "tool": "crawl_webpage",
+        "arguments": lambda base, i: {"url": f"{base}/slow/{i}?delay=500", "bypass_cache": True},
+    },
+    "crawl_webpages_batch": {
+        "tool": "crawl_webpages",
+        "arguments": lambda base, i: {
+            "urls": [f"{base}/static/{i * 10 + k}" for k in range(10)], "bypass_cache": True},
+    },
+    "crawl_website_site": {
+        "tool": "crawl_website",
+        "arguments": lambda base, i: {"url": f"{base}/site/s{i}/0", "max_depth": 2, "max_pages": 10},
+    },
+    "extract_structured_data": {
+        "tool": "extract_structured_data",
+        "arguments": lambda base, i: {"url": f"{base}/static/{i}"},
+    },
+}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """最近秩法计算分位数"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(q * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def process_tree_rss_mb(pid: int) -> float:
+    """返回进程及其所有子进程（浏览器）的RSS总和，单位MB"""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return 0.0
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total / (1024 * 1024)
+
+    # 没有psutil时遍历/proc（仅Linux）
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as f:
+                fields = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            continue
+        children.setdefault(int(fields["PPid"].strip()), []).append(int(entry))
+        rss[int(entry)] = int(fields.get("VmRSS", "0 kB").split()[0]) * 1024
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total / (1024 * 1024)
+
+
+class ServerProcess:
+    """通过管道与服务器进程通信，按ID匹配响应"""
+
+    def __init__(self, server_path: str, env: Dict[str, str]):
+        self.server_path = server_path
+        self.env = env
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.started_at = 0.0
+        self.first_response_at: Optional[float] = None
+        self.notifications = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 1
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """启动服务器并等待启动时主动发送的初始化响应"""
+        self.started_at = time.perf_counter()
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, self.server_path,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            env=self.env, limit=64 * 1024 * 1024)
+        self._reader = asyncio.create_task(self._read_loop())
+        await self.request("initialize", {})
+
+    async def request(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """发送请求并等待对应的响应"""
+        request_id = self._next_id
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        self.process.stdin.write(json.dumps(message).encode("utf-8") + b"\n")
+        await self.process.stdin.drain()
+        return await future
+
+    def rss_mb(self) -> float:
+        return process_tree_rss_mb(self.process.pid)
+
+    async def stop(self):
+        """发送shutdown并等待进程退出"""
+        try:
+            await asyncio.wait_for(self.request("shutdown", {}), timeout=30)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        try:
+            self.process.stdin.close()
+            await asyncio.wait_for(self.process.wait(), timeout=30)
+        except asyncio.TimeoutError:
+            self.process.kill()
+        if self._reader:
+            self._reader.cancel()
+
+    async def _read_loop(self):
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("服务器已退出"))
+                return
+            if self.first_response_at is None:
+                self.first_response_at = time.perf_counter()
+            message = json.loads(line)
+            for item in message if isinstance(message, list) else [message]:
+                if "id" not in item:
+                    self.notifications += 1
+                    continue
+                future = self._pending.pop(item["id"], None)
+                if future is not None and not future.done():
+                    future.set_result(item)
+
+
+class RssSampler:
+    """
+    在后台线程中持续采样服务器进程树的RSS，记录峰值
+
+    遍历进程树不在计时的事件循环上进行，不影响测得的延迟。
+    """
+
+    def __init__(self, server: ServerProcess, interval: float = RSS_SAMPLE_INTERVAL):
+        self.server = server
+        self.interval = interval
+        self.peak = server.rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> float:
+        """停止采样并返回峰值RSS（MB）"""
+        self._stop.set()
+        self._thread.join()
+        return self.peak
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.server.rss_mb())
+
+
+async def run_scenario(server: ServerProcess, name: str, base_url: str,
+                       requests: int, concurrency: int) -> Dict[str, Any]:
+    """
+    以固定并发运行一个场景
+
+    Args:
+        server: 服务器进程
+        name: 场景名称
+        base_url: 固定站点地址
+        requests: 请求总数
+        concurrency: 同时进行的请求数
+
+    Returns:
+        场景统计结果
+    """
+    spec = SCENARIOS[name]
+    build_arguments: Callable[[str, int], Dict[str, Any]] = spec["arguments"]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    first_done: List[float] = []
+    response_bytes = [0]
+
+    if name == "crawl_webpage_cached":
+        # 预热缓存，只测量命中路径
+        await server.request("tools/call", {"name": spec["tool"], "arguments": build_arguments(base_url, 0)})
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await server.request(
+                "tools/call", {"name": spec["tool"], "arguments": build_arguments(base_url, i)})
+            elapsed = (time.perf_counter() - started) * 1000
+        if not first_done:
+            first_done.append(time.perf_counter())
+        latencies.append(elapsed)
+        response_bytes[0] += len(json.dumps(response))
+        if "error" in response:
+            error_type = response["error"].get("data", {}).get("error_type", "error")
+            errors[error_type] = errors.get(error_type, 0) + 1
+        elif isinstance(response["result"].get("result"), dict) and \
+                response["result"]["result"].get("success") is False:
+            errors["ToolFailure"] = errors.get("ToolFailure", 0) + 1
+
+    sampler = RssSampler(server)
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        wall = time.perf_counter() - started
+    finally:
+        peak_rss = sampler.stop()
+
+    return {
+        "tool": spec["tool"],
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "requests_per_second": round(requests / wall, 3) if wall else 0.0,
+        "ttfr_ms": round((first_done[0] - started) * 1000, 2) if first_done else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "max": round(max(latencies, default=0.0), 2),
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        },
+        "response_bytes": response_bytes[0],
+        "peak_rss_mb": round(peak_rss, 1),
+    }
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    """启动固定站点和服务器，依次运行所选场景"""
+    fixture = FixtureServer(port=args.fixture_port).start()
+    env = dict(os.environ)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    # 服务器模块从仓库根目录导入
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+
+    server = ServerProcess(args.server, env)
+    try:
+        await server.start()
+        startup_ms = (server.first_response_at - server.started_at) * 1000
+        idle_rss = server.rss_mb()
+
+        scenarios = {}
+        for name in args.scenarios:
+            print(f"运行场景 {name} ...", file=sys.stderr)
+            scenarios[name] = await run_scenario(
+                server, name, fixture.base_url, args.requests, args.concurrency)
+
+        server_metrics = (await server.request("server/metrics", {})).get("result")
+    finally:
+        await server.stop()
+        fixture.stop()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "server": os.path.relpath(args.server, REPO_ROOT),
+            "git_revision": git_revision(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "env": args.env,
+        },
+        "startup_ms": round(startup_ms, 2),
+        "idle_rss_mb": round(idle_rss, 1),
+        "scenarios": scenarios,
+        "server_metrics": server_metrics,
+    }
+
+
+def git_revision() -> Optional[str]:
+    """返回当前的git提交，便于对比不同版本的结果"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    对比两次结果，返回超过容差的回退项
+
+    Args:
+        baseline: 基线结果
+        current: 本次结果
+        tolerance: 允许的相对变差，例如0.1表示10%
+
+    Returns:
+        回退描述列表
+    """
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        checks = [
+            ("latency_ms.p50", before["latency_ms"]["p50"], now["latency_ms"]["p50"], True),
+            ("latency_ms.p95", before["latency_ms"]["p95"], now["latency_ms"]["p95"], True),
+            ("requests_per_second", before["requests_per_second"], now["requests_per_second"], False),
+            ("peak_rss_mb", before["peak_rss_mb"], now["peak_rss_mb"], True),
+        ]
+        for metric, old, new, lower_is_better in checks:
+            if not old:
+                continue
+            change = (new - old) / old
+            worse = change > tolerance if lower_is_better else change < -tolerance
+            print(f"{name:28s} {metric:22s} {old:>10.2f} -> {new:>10.2f} ({change:+.1%})",
+                  file=sys.stderr)
+            if worse:
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl4AI MCP服务器基准测试")
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="服务器脚本路径")
+    parser.add_argument("--requests", type=int, default=20, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=4, help="每个场景的并发请求数")
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=list(SCENARIOS),
+                        help=f"逗号分隔的场景列表，可选: {','.join(SCENARIOS)}")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="传给服务器的环境变量，可重复")
+    parser.add_argument("--fixture-port", type=int, default=0, help="固定站点端口，0为随机")
+    parser.add_argument("--output", help="结果JSON的输出路径，默认输出到标准输出")
+    parser.add_argument("--compare", help="与之对比的基线结果JSON")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="对比时允许的相对变差")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+
+    result = asyncio.run(run_benchmark(args))
+    encoded = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(encoded + "\n")
+    else:
+        print(encoded)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), result, args.tolerance)
+        if regressions:
+            print("性能回退:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
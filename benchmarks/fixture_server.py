@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+基准测试使用的本地HTTP固定站点。
+
+提供四类页面，内容由路径确定，每次运行完全一致，不依赖外部网络：
+    /static/<n>             静态文章页面
+    /js/<n>                 正文由脚本在加载后插入的页面
+    /slow/<n>?delay=<ms>    延迟响应的页面
+    /site/<name>/<n>        多页面站点，每页链接到若干后续页面，可供crawl_website使用
+
+可单独运行：python benchmarks/fixture_server.py --port 8765
+"""
+
+import argparse
+import html
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# 每个页面的段落数和每段的句子数，决定页面大小
+PARAGRAPHS_PER_PAGE = 40
+SENTENCES_PER_PARAGRAPH = 6
+
+# 多页面站点的规模：每页的链接数和站点总页数
+SITE_FANOUT = 3
+SITE_PAGES = 40
+
+_WORDS = ("crawler", "browser", "markdown", "latency", "pipeline", "request", "cache",
+          "throughput", "extraction", "schema", "network", "render", "session", "token")
+
+
+def paragraph(seed: int, index: int) -> str:
+    """按种子生成确定的段落文本"""
+    sentences = []
+    for s in range(SENTENCES_PER_PARAGRAPH):
+        words = [_WORDS[(seed * 31 + index * 7 + s * 3 + w) % len(_WORDS)] for w in range(12)]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def article_body(seed: int) -> str:
+    """生成文章正文HTML"""
+    parts = [f"<h1>Fixture article {seed}</h1>"]
+    for i in range(PARAGRAPHS_PER_PAGE):
+        if i % 10 == 0:
+            parts.append(f"<h2>Section {i // 10 + 1}</h2>")
+        parts.append(f"<p>{paragraph(seed, i)}</p>")
+    parts.append("<table><tr><th>key</th><th>value</th></tr>"
+                 f"<tr><td>seed</td><td>{seed}</td></tr></table>")
+    parts.append(f'<img src="/static/img/{seed}.png" alt="figure {seed}">')
+    return "\n".join(parts)
+
+
+def page(title: str, body: str, head_extra: str = "") -> bytes:
+    """组装完整的HTML页面"""
+    return (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(title)}</title>{head_extra}</head>"
+            f"<body><main>{body}</main></body></html>").encode("utf-8")
+
+
+def static_page(n: int) -> bytes:
+    return page(f"Static {n}", article_body(n))
+
+
+def js_page(n: int) -> bytes:
+    """正文由脚本在DOMContentLoaded后延迟插入，只有渲染后的DOM才包含内容"""
+    body = article_body(n).replace("\\", "\\\\").replace("`", "\\`").replace("</", "<\\/")
+    script = ("<script>document.addEventListener('DOMContentLoaded', function () {"
+              f"setTimeout(function () {{ document.querySelector('main').innerHTML = `{body}`; }}, 50);"
+              "});</script>")
+    return page(f"Script {n}", "<p>Loading...</p>", script)
+
+
+def site_page(name: str, n: int) -> bytes:
+    links = []
+    for k in range(1, SITE_FANOUT + 1):
+        target = n * SITE_FANOUT + k
+        if target < SITE_PAGES:
+            links.append(f'<li><a href="/site/{name}/{target}">Page {target}</a></li>')
+    # 带跟踪参数和片段的重复链接，检验前沿队列的去重
+    if n + 1 < SITE_PAGES:
+        links.append(f'<li><a href="/site/{name}/{n + 1}?utm_source=bench#top">Again</a></li>')
+    nav = f"<nav><ul>{''.join(links)}</ul></nav>"
+    return page(f"Site {name} page {n}", nav + article_body(zlib.crc32(f"{name}/{n}".encode()) % 10000))
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """按路径生成固定页面"""
+
+    server_version = "Crawl4AIFixture/1.0"
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        segments = [s for s in parts.path.split("/") if s]
+        query = parse_qs(parts.query)
+        try:
+            status, body, content_type = self.route(segments, query)
+        except (ValueError, IndexError):
+            status, body, content_type = 404, b"not found", "text/plain"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "max-age=60")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self, segments, query) -> Tuple[int, bytes, str]:
+        kind = segments[0] if segments else ""
+        if kind == "static" and len(segments) == 3 and segments[1] == "img":
+            return 200, b"\x89PNG\r\n\x1a\n", "image/png"
+        if kind == "static":
+            return 200, static_page(int(segments[1])), "text/html; charset=utf-8"
+        if kind == "js":
+            return 200, js_page(int(segments[1])), "text/html; charset=utf-8"
+        if kind == "slow":
+            time.sleep(int(query.get("delay", ["1000"])[0]) / 1000)
+            return 200, static_page(int(segments[1])), "text/html; charset=utf-8"
+        if kind == "site":
+            n = int(segments[2]) if len(segments) > 2 else 0
+            if n >= SITE_PAGES:
+                raise ValueError(n)
+            return 200, site_page(segments[1], n), "text/html; charset=utf-8"
+        if kind == "robots.txt":
+            return 200, b"User-agent: *\nAllow: /\n", "text/plain"
+        raise ValueError(kind)
+
+    def log_message(self, format, *args):
+        # 基准测试时不输出访问日志
+        pass
+
+
+class FixtureServer:
+    """在后台线程中运行的固定站点"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), FixtureHandler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="运行基准测试固定站点")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = FixtureServer(args.host, args.port)
+    print(f"固定站点: {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
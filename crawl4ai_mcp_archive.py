@@ -0,0 +1,273 @@
+"""
+Crawl4AI MCP服务器的抓取存档。
+录制模式下把浏览器的每次抓取（URL、响应头、渲染后的HTML和Markdown）写入本地存档，
+服务器返回的原始响应体单独保存；
+回放模式下完全由存档提供抓取结果，不启动浏览器也不访问网络。
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from crawl4ai_mcp_cache import normalize_url
+from crawl4ai_mcp_files import atomic_write, sharded_path
+from crawl4ai_mcp_pool import CrawlerPool
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+# 存档模式
+ARCHIVE_MODES = ("off", "record", "replay")
+
+# 从爬取结果中保存的字段
+_RESULT_FIELDS = ("url", "status_code", "response_headers", "html", "markdown",
+                  "metadata", "media", "links")
+
+# 原始响应体文件的后缀
+_RAW_BODY_SUFFIX = ".body.gz"
+
+
+class FetchArchive:
+    """
+    抓取存档
+
+    每个规范化URL对应一个gzip压缩的JSON条目和一个gzip压缩的原始响应体，同一URL后录制的覆盖先录制的；
+    manifest.jsonl按录制顺序追加每次录制的URL和时间，便于用存档预热缓存或复现问题。
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: 存档目录，不存在时自动创建
+        """
+        self.directory = directory
+        self.records = 0
+        self.replays = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_path(self, url: str) -> str:
+        return sharded_path(self.directory, normalize_url(url), ".json.gz")
+
+    def _raw_body_path(self, url: str) -> str:
+        return sharded_path(self.directory, normalize_url(url), _RAW_BODY_SUFFIX)
+
+    async def record(self, url: str, result: Any, options: Dict[str, Any],
+                     raw_body: Optional[bytes] = None):
+        """
+        录制一次抓取
+
+        Args:
+            url: 请求的URL
+            result: crawl4ai的爬取结果
+            options: 影响结果的抓取选项，例如include_images
+            raw_body: 导航请求的原始响应体（脚本执行前的HTML），无法获取时为None
+        """
+        entry = {field: getattr(result, field, None) for field in _RESULT_FIELDS}
+        if entry["markdown"] is not None:
+            # 新版crawl4ai的markdown是带附加字段的str子类，只保存文本
+            entry["markdown"] = str(entry["markdown"])
+        entry.update({
+            "request_url": url,
+            "recorded_at": time.time(),
+            "options": options,
+        })
+        if raw_body is not None:
+            entry["raw_body"] = os.path.relpath(self._raw_body_path(url), self.directory)
+        try:
+            await asyncio.to_thread(self._write, url, entry, raw_body)
+            self.records += 1
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"录制 {url} 失败: {e}")
+
+    async def load(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        读取URL的存档条目
+
+        Args:
+            url: 请求的URL
+
+        Returns:
+            存档条目，不存在时返回None
+        """
+        entry = await asyncio.to_thread(self._read, url)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.replays += 1
+        return entry
+
+    async def load_raw_body(self, url: str) -> Optional[bytes]:
+        """
+        读取URL录制时的原始响应体
+
+        Args:
+            url: 请求的URL
+
+        Returns:
+            原始响应体，录制时未能获取或不存在时返回None
+        """
+        return await asyncio.to_thread(self._read_raw_body, url)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回存档的使用统计"""
+        return {"records": self.records, "replays": self.replays, "misses": self.misses}
+
+    def _write(self, url: str, entry: Dict[str, Any], raw_body: Optional[bytes]):
+        """原子写入原始响应体和条目，并追加到清单"""
+        path = self._entry_path(url)
+        if raw_body is not None:
+            atomic_write(self._raw_body_path(url), gzip.compress(raw_body))
+        else:
+            # 新录制的条目没有原始响应体时删除旧的，避免与条目不一致
+            try:
+                os.remove(self._raw_body_path(url))
+            except FileNotFoundError:
+                pass
+        atomic_write(path, gzip.compress(
+            json.dumps(entry, ensure_ascii=False, default=str).encode("utf-8")))
+
+        manifest = json.dumps({
+            "url": url,
+            "recorded_at": entry["recorded_at"],
+            "entry": os.path.relpath(path, self.directory),
+        }, ensure_ascii=False)
+        with open(os.path.join(self.directory, "manifest.jsonl"), "a", encoding="utf-8") as f:
+            f.write(manifest + "\n")
+
+    def _read(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._entry_path(url), "rb") as f:
+                return json.loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取 {url} 的存档失败: {e}")
+            return None
+
+    def _read_raw_body(self, url: str) -> Optional[bytes]:
+        try:
+            with open(self._raw_body_path(url), "rb") as f:
+                return gzip.decompress(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, zlib.error) as e:
+            logger.warning(f"读取 {url} 的原始响应体失败: {e}")
+            return None
+
+
+class ArchivedResult:
+    """由存档条目还原的爬取结果，字段与crawl4ai的CrawlResult一致"""
+
+    def __init__(self, entry: Dict[str, Any]):
+        for field in _RESULT_FIELDS:
+            setattr(self, field, entry.get(field))
+        self.metadata = self.metadata or {}
+        self.extracted_content = None
+        self.success = True
+        self.error_message = None
+
+
+class MissingResult:
+    """存档中不存在的URL，回放时作为失败结果返回"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.success = False
+        self.error_message = f"存档中没有该URL: {url}"
+        self.html = None
+        self.markdown = ""
+        self.metadata = {}
+        self.media = {}
+        self.links = {}
+        self.extracted_content = None
+
+
+class RecordingCrawler:
+    """
+    包装真实的爬虫，把成功的抓取写入存档
+
+    通过crawl4ai的after_goto钩子读取导航请求的原始响应体，与渲染后的HTML分开保存。
+    """
+
+    def __init__(self, crawler, archive: FetchArchive):
+        self._crawler = crawler
+        self._archive = archive
+        self._raw_body: Optional[bytes] = None
+
+    async def _capture_body(self, page, context=None, **kwargs):
+        response = kwargs.get("response")
+        if response is not None:
+            try:
+                self._raw_body = await response.body()
+            except Exception as e:
+                logger.debug(f"无法读取原始响应体: {e}")
+        return page
+
+    async def arun(self, url: str, config=None, **kwargs):
+        self._raw_body = None
+        strategy = getattr(self._crawler, "crawler_strategy", None)
+        if strategy is not None and hasattr(strategy, "set_hook"):
+            # 租出的实例只由当前调用使用，每次抓取前重新设置钩子
+            strategy.set_hook("after_goto", self._capture_body)
+        result = await self._crawler.arun(url=url, config=config, **kwargs)
+        if result.success:
+            options = {"include_images": getattr(config, "include_images", None)}
+            await self._archive.record(url, result, options, self._raw_body)
+        return result
+
+
+class ReplayCrawler:
+    """从存档返回抓取结果的爬虫，不访问网络"""
+
+    def __init__(self, archive: FetchArchive):
+        self._archive = archive
+
+    async def arun(self, url: str, config=None, **kwargs):
+        entry = await self._archive.load(url)
+        if entry is None:
+            logger.warning(f"回放时存档缺失: {url}")
+            return MissingResult(url)
+
+        return ArchivedResult(entry)
+
+
+class ArchivingCrawlerPool(CrawlerPool):
+    """
+    带存档的浏览器池
+
+    录制模式下租出的爬虫在返回结果的同时写入存档；回放模式下租出的爬虫只读存档，池本身不启动任何浏览器。
+    """
+
+    def __init__(self, archive: FetchArchive, mode: str, **pool_options: Any):
+        """
+        Args:
+            archive: 抓取存档
+            mode: "record"或"replay"
+            **pool_options: 传给CrawlerPool的参数
+        """
+        super().__init__(**pool_options)
+        self.archive = archive
+        self.mode = mode
+        logger.info(f"抓取存档: {archive.directory}（{mode}）")
+
+    async def start(self):
+        if self.mode == "replay":
+            return
+        await super().start()
+
+    @asynccontextmanager
+    async def lease(self):
+        if self.mode == "replay":
+            yield ReplayCrawler(self.archive)
+            return
+        async with super().lease() as crawler:
+            yield RecordingCrawler(crawler, self.archive)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), **{f"archive_{k}": v for k, v in self.archive.stats().items()}}
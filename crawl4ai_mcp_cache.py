@@ -0,0 +1,284 @@
+"""
+Crawl4AI MCP服务器的结果缓存。
+内存LRU层按字节预算淘汰，可选的磁盘层在重启后依然有效，每个条目都有独立的TTL；
+相同的进行中请求合并为一次抓取。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from enum import Enum, auto
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from crawl4ai_mcp_files import atomic_write, sharded_path
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+
+class CacheMode(Enum):
+    """
+    缓存模式
+
+    DEFAULT: 命中未过期条目时直接返回，否则抓取并写入缓存
+    BYPASS: 忽略已有条目重新抓取，并用新结果刷新缓存
+    FORCE: 只要存在条目（即使已过期）就直接返回，不存在时才抓取
+    """
+    DEFAULT = auto()
+    BYPASS = auto()
+    FORCE = auto()
+
+
+# URL中可以省略的默认端口
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化URL，使等价的URL得到相同的缓存键
+
+    scheme和主机名转为小写，去掉默认端口和片段，查询参数排序，空路径补为"/"。
+
+    Args:
+        url: 原始URL
+
+    Returns:
+        规范化后的URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and DEFAULT_PORTS.get(scheme) != parts.port:
+        host = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{userinfo}@{host}"
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def make_cache_key(kind: str, url: str, **options: Any) -> str:
+    """
+    由操作类型、规范化URL和影响输出的选项生成缓存键
+
+    Args:
+        kind: 操作类型，例如"crawl_webpage"
+        url: 页面URL
+        **options: 影响输出的选项，例如include_images
+
+    Returns:
+        缓存键字符串
+    """
+    return json.dumps([kind, normalize_url(url), sorted(options.items())],
+                      ensure_ascii=False, separators=(",", ":"))
+
+
+class ResultCache:
+    """
+    两层结果缓存
+
+    值为已序列化的JSON字节串，内存层按其字节数计入预算。
+    """
+
+    def __init__(self,
+                 max_memory_bytes: int = 64 * 1024 * 1024,
+                 default_ttl: float = 3600.0,
+                 disk_dir: Optional[str] = None):
+        """
+        Args:
+            max_memory_bytes: 内存层字节预算
+            default_ttl: 默认的条目有效期（秒）
+            disk_dir: 磁盘层目录，为空时不启用磁盘层
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.default_ttl = default_ttl
+        self.disk_dir = disk_dir
+        # 缓存键 -> (值, 过期时间戳)
+        self._memory: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            logger.info(f"结果缓存磁盘层: {self.disk_dir}")
+
+    async def get(self, key: str, mode: CacheMode = CacheMode.DEFAULT) -> Optional[bytes]:
+        """
+        按缓存模式查找条目
+
+        Args:
+            key: 缓存键
+            mode: 缓存模式
+
+        Returns:
+            命中时返回缓存的值，否则返回None
+        """
+        if mode == CacheMode.BYPASS:
+            return None
+
+        allow_stale = mode == CacheMode.FORCE
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if allow_stale or expires_at > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            self._evict_memory(key)
+
+        if self.disk_dir:
+            stored = await asyncio.to_thread(self._read_disk, key, allow_stale)
+            if stored is not None:
+                value, expires_at = stored
+                self._put_memory(key, value, expires_at)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: bytes, ttl: Optional[float] = None):
+        """
+        写入条目
+
+        Args:
+            key: 缓存键
+            value: 已序列化的JSON字节串
+            ttl: 有效期（秒），为空时使用默认值
+        """
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        self._put_memory(key, value, expires_at)
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, value, expires_at)
+            except OSError as e:
+                logger.warning(f"写入磁盘缓存失败: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        return {
+            "entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "disk_enabled": bool(self.disk_dir),
+        }
+
+    def _put_memory(self, key: str, value: bytes, expires_at: float):
+        """写入内存层并按字节预算淘汰最久未使用的条目"""
+        if len(value) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._evict_memory(key)
+        self._memory[key] = (value, expires_at)
+        self._memory_bytes += len(value)
+        while self._memory_bytes > self.max_memory_bytes:
+            oldest = next(iter(self._memory))
+            self._evict_memory(oldest)
+
+    def _evict_memory(self, key: str):
+        """从内存层移除条目"""
+        value, _ = self._memory.pop(key)
+        self._memory_bytes -= len(value)
+
+    def _disk_path(self, key: str) -> str:
+        """返回条目在磁盘层的文件路径"""
+        return sharded_path(self.disk_dir, key, ".entry")
+
+    def _read_disk(self, key: str, allow_stale: bool) -> Optional[Tuple[bytes, float]]:
+        """读取磁盘条目，过期条目会被删除（FORCE模式除外）"""
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                # 第一行是元数据，其后是原样保存的值
+                meta = json.loads(f.readline())
+                if meta.get("key") != key:
+                    return None
+                if not allow_stale and meta["expires_at"] <= time.time():
+                    f.close()
+                    os.remove(path)
+                    return None
+                return f.read(), meta["expires_at"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key: str, value: bytes, expires_at: float):
+        """通过临时文件原子写入磁盘条目"""
+        meta = json.dumps({"key": key, "expires_at": expires_at}, ensure_ascii=False)
+        atomic_write(self._disk_path(key), meta.encode("utf-8") + b"\n", value)
+
+
+class SingleFlight:
+    """
+    合并相同的进行中请求
+
+    同一个键同时只执行一次抓取，其余调用等待并共享同一个结果（或异常）。
+    抓取在独立任务中运行：单个等待者被取消不影响其他等待者，所有等待者都取消后才取消抓取。
+    """
+
+    def __init__(self):
+        # 键 -> (抓取任务, 等待者数量)
+        self._flights: Dict[str, List[Any]] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行fn，若相同键的调用正在进行则等待其结果
+
+        Args:
+            key: 请求键，通常由make_cache_key生成
+            fn: 实际执行抓取的协程函数
+
+        Returns:
+            fn的返回值
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(fn())
+            flight = [task, 0]
+            self._flights[key] = flight
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.leaders += 1
+        else:
+            logger.info(f"合并进行中的相同请求: {key}")
+            self.coalesced += 1
+
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and flight[1] == 1:
+                # 最后一个等待者离开，结果已无人需要。先移除记录再取消：抓取任务的清理
+                # （例如关闭页面）完成前到达的相同请求开始新的抓取，而不是加入被取消的任务
+                self._forget(key, task)
+                task.cancel()
+            raise
+        finally:
+            flight[1] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回合并统计信息"""
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+    def _forget(self, key: str, task: asyncio.Future):
+        """抓取结束后移除记录，之后的调用重新抓取（或命中缓存）"""
+        flight = self._flights.get(key)
+        if flight is not None and flight[0] is task:
+            del self._flights[key]
@@ -0,0 +1,116 @@
+"""
+Crawl4AI MCP服务器的JSON编码工具。
+直接在UTF-8字节串上编码和解析，已安装orjson时使用orjson，否则回退到标准库json，两者输出相同。
+支持把已经序列化好的JSON片段原样拼接进外层结构，避免大结果被反复解析和编码。
+"""
+
+import json
+import logging
+import os
+import re
+from typing import Any, Callable, List
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，缺失时使用标准库json
+    orjson = None
+
+# 编解码后端：auto优先使用orjson，json强制使用标准库
+_REQUESTED_BACKEND = os.environ.get("CRAWL4AI_MCP_JSON_CODEC", "auto").lower()
+if _REQUESTED_BACKEND == "orjson" and orjson is None:
+    logger.warning("未安装orjson，JSON编解码回退到标准库json")
+JSON_BACKEND = "orjson" if orjson is not None and _REQUESTED_BACKEND != "json" else "json"
+
+
+class RawJSON:
+    """已序列化的JSON片段，编码时原样拼接"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __repr__(self) -> str:
+        return f"RawJSON({len(self.data)} bytes)"
+
+
+# 片段占位符，带每个进程随机的标记，不会与正常字符串内容冲突
+_PLACEHOLDER_TOKEN = os.urandom(8).hex()
+_PLACEHOLDER_RE = re.compile(
+    ('"\\\\u0000' + _PLACEHOLDER_TOKEN + ':(\\d+)\\\\u0000"').encode("ascii"))
+
+
+def _dumps_stdlib(obj: Any, default: Callable[[Any], Any]) -> bytes:
+    """使用标准库编码，格式与orjson一致（紧凑分隔符、不转义非ASCII字符）"""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"),
+                      default=default).encode("utf-8")
+
+
+def _dumps_orjson(obj: Any, default: Callable[[Any], Any]) -> bytes:
+    """使用orjson编码，orjson不支持的值（如超过64位的整数）交给标准库处理"""
+    try:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        return _dumps_stdlib(obj, default)
+
+
+_dumps = _dumps_orjson if JSON_BACKEND == "orjson" else _dumps_stdlib
+_loads = orjson.loads if JSON_BACKEND == "orjson" else json.loads
+
+
+def encode_json(obj: Any) -> bytes:
+    """
+    把对象编码为UTF-8 JSON字节串，其中的RawJSON片段直接拼接而不重新编码
+
+    Args:
+        obj: 要编码的对象
+
+    Returns:
+        JSON字节串
+    """
+    if isinstance(obj, RawJSON):
+        return obj.data
+
+    fragments: List[bytes] = []
+
+    def default(value: Any) -> Any:
+        if isinstance(value, RawJSON):
+            fragments.append(value.data)
+            return f"\x00{_PLACEHOLDER_TOKEN}:{len(fragments) - 1}\x00"
+        raise TypeError(
+            f"Object of type {type(value).__name__} is not JSON serializable")
+
+    encoded = _dumps(obj, default)
+    if not fragments:
+        return encoded
+
+    # 外层结构中只有占位符，一次切分后与片段交错拼接
+    parts = _PLACEHOLDER_RE.split(encoded)
+    for i in range(1, len(parts), 2):
+        parts[i] = fragments[int(parts[i])]
+    return b"".join(parts)
+
+
+def decode_json(value: Any) -> Any:
+    """
+    把JSON字节串或工具结果还原为Python对象
+
+    Args:
+        value: RawJSON、JSON字节串/字符串或普通对象
+
+    Returns:
+        解析后的对象
+
+    Raises:
+        json.JSONDecodeError: 输入不是合法JSON（orjson的解析错误也是其子类）
+    """
+    if isinstance(value, RawJSON):
+        return _loads(value.data)
+    if isinstance(value, (bytes, bytearray, memoryview, str)):
+        return _loads(value)
+    return value
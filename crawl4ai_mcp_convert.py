@@ -0,0 +1,175 @@
+"""
+Crawl4AI MCP服务器的页面处理进程池。
+输入达到阈值时在进程池中执行的只有真正解析整个页面的处理：HTTP引擎的HTML转Markdown、
+sitemap解析和结构化提取；小于阈值的输入直接在当前进程处理，省去进程间传输的开销。
+词数统计、canonical和链接解析只扫描Markdown或head，比pickle传输输入还快，总是在当前进程执行。
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from crawl4ai_mcp_frontier import extract_canonical_url
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+# 处理进程数，0表示全部在当前进程处理；默认使用所有CPU核心
+CONVERT_WORKERS = int(os.environ.get("CRAWL4AI_MCP_CONVERT_WORKERS", str(os.cpu_count() or 1)))
+
+# 小于该字节数的页面在当前进程处理
+CONVERT_INLINE_BYTES = int(os.environ.get("CRAWL4AI_MCP_CONVERT_INLINE_BYTES", str(256 * 1024)))
+
+# canonical只出现在head中，找不到</head>时最多保留的字符数
+_MAX_HEAD_CHARS = 65536
+
+
+def count_words(text: str) -> int:
+    """统计以空白分隔的词数"""
+    return len(text.split())
+
+
+def html_head(html: Optional[str]) -> Optional[str]:
+    """
+    截取HTML的head部分
+
+    canonical解析和增量爬取状态只需要head，避免扫描或保存整个页面。
+    """
+    if not html:
+        return html
+    head_end = html.find("</head>")
+    return html[:head_end + len("</head>")] if head_end != -1 else html[:_MAX_HEAD_CHARS]
+
+
+def analyze_page(page_url: str, head: Optional[str], links: List[Any]) -> Tuple[Optional[str], List[str]]:
+    """
+    解析爬取到的页面的canonical地址和链接，供网站爬取使用
+
+    Args:
+        page_url: 页面URL
+        head: 页面HTML的head部分
+        links: crawl4ai结果中的同站链接
+
+    Returns:
+        (canonical URL, 绝对链接列表)
+    """
+    resolved = []
+    for link in links:
+        href = link.get("href") if isinstance(link, dict) else link
+        if href:
+            resolved.append(urljoin(page_url, href))
+    return extract_canonical_url(head, page_url), resolved
+
+
+class ConversionPool:
+    """
+    页面处理进程池
+
+    进程在第一次需要时才启动；进程池损坏（例如处理进程被杀死）时重建，
+    当次任务改为在当前进程执行。
+    """
+
+    def __init__(self, workers: int = CONVERT_WORKERS, inline_bytes: int = CONVERT_INLINE_BYTES):
+        """
+        Args:
+            workers: 处理进程数，0表示不使用进程池
+            inline_bytes: 小于该字节数的任务在当前进程执行
+        """
+        self.workers = max(0, workers)
+        self.inline_bytes = inline_bytes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.inline = 0
+        self.offloaded = 0
+        self.restarts = 0
+
+    def offloads(self, size: int) -> bool:
+        """判断给定大小的任务是否交给进程池"""
+        return self.workers > 0 and size >= self.inline_bytes
+
+    async def run(self, size: int, fn: Callable[..., Any], *args) -> Any:
+        """
+        执行页面处理函数
+
+        Args:
+            size: 任务输入的大小（字节或字符数），用于和阈值比较
+            fn: 模块级函数，交给进程池时其参数和返回值必须可以pickle
+            *args: 函数参数
+
+        Returns:
+            函数的返回值
+        """
+        if not self.offloads(size):
+            self.inline += 1
+            return fn(*args)
+        return await self.submit(fn, *args)
+
+    async def submit(self, fn: Callable[..., Any], *args) -> Any:
+        """在进程池中执行函数，进程池损坏时在当前进程执行"""
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._get_executor(), fn, *args)
+            self.offloaded += 1
+            return result
+        except BrokenProcessPool:
+            logger.warning("页面处理进程池已损坏，重建进程池，本次任务在当前进程执行")
+            self._reset()
+            self.inline += 1
+            return fn(*args)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 服务器进程中有日志和写入线程，不直接fork，由forkserver派生处理进程。
+            # 处理进程会把主脚本作为__mp_main__重新导入，主脚本在导入时不能有副作用；
+            # forkserver预先导入本模块，处理进程启动时不必再逐个导入处理函数的依赖
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            if context.get_start_method() == "forkserver":
+                context.set_forkserver_preload(["crawl4ai_mcp_convert"])
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._executor
+
+    def _reset(self):
+        executor, self._executor = self._executor, None
+        self.restarts += 1
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        """关闭进程池，不等待正在执行的任务"""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回进程池统计信息"""
+        return {
+            "workers": self.workers,
+            "started": self._executor is not None,
+            "inline_bytes": self.inline_bytes,
+            "inline": self.inline,
+            "offloaded": self.offloaded,
+            "restarts": self.restarts,
+        }
+
+
+_conversion_pool: Optional[ConversionPool] = None
+
+
+def conversion_pool() -> ConversionPool:
+    """返回所有工具共享的页面处理进程池"""
+    global _conversion_pool
+    if _conversion_pool is None:
+        _conversion_pool = ConversionPool()
+    return _conversion_pool
+
+
+def close_conversion_pool():
+    """关闭共享的页面处理进程池"""
+    global _conversion_pool
+    if _conversion_pool is not None:
+        _conversion_pool.close()
+        _conversion_pool = None
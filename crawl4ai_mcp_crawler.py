@@ -0,0 +1,843 @@
+"""
+Crawl4AI MCP服务器的爬取实现。
+结果字段与crawl4ai_mcp.utils中对应实现相同，但以字典或已序列化的RawJSON返回，所有浏览器操作都通过服务器持有的浏览器池完成。
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from crawl4ai import CrawlerRunConfig
+from crawl4ai import CacheMode as CrawlerCacheMode
+from crawl4ai_mcp.utils import scroll_script
+
+from crawl4ai_mcp_cache import CacheMode, ResultCache, SingleFlight, make_cache_key
+from crawl4ai_mcp_codec import RawJSON, decode_json, encode_json
+from crawl4ai_mcp_convert import analyze_page, conversion_pool, count_words, html_head
+from crawl4ai_mcp_export import create_exporter
+from crawl4ai_mcp_extract import SchemaCache, compile_schema, run_plans, run_schemas, schema_hash
+from crawl4ai_mcp_files import atomic_write
+from crawl4ai_mcp_frontier import (
+    CrawlFrontier,
+    HostLimiter,
+    canonicalize_url
+)
+from crawl4ai_mcp_http import HttpFetcher, HttpFetchError
+from crawl4ai_mcp_pool import CrawlerPool
+from crawl4ai_mcp_sitemap import HostCache
+from crawl4ai_mcp_state import CrawlStateStore, UnchangedResult, content_hash
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+# 等待页面主要内容加载的条件
+WAIT_FOR_CONTENT = [
+    "document.readyState === 'complete'",
+    "document.querySelectorAll('p, h1, h2, h3, article, section, main').length > 0"
+]
+
+# 内容过少时重试使用的DOM等待条件
+WAIT_FOR_PARAGRAPHS = [
+    "document.readyState === 'complete'",
+    "document.querySelectorAll('p').length > 5",
+    "setTimeout(() => true, 8000)"
+]
+
+
+def build_page_config(include_images: bool = True) -> CrawlerRunConfig:
+    """
+    构建单页爬取配置
+
+    Args:
+        include_images: 是否包含图像
+
+    Returns:
+        爬虫运行配置
+    """
+    return CrawlerRunConfig(
+        include_images=include_images,
+        include_links=True,
+        # 结果缓存由服务器统一管理，不使用crawl4ai自带的缓存
+        cache_mode=CrawlerCacheMode.BYPASS,
+        wait_for=WAIT_FOR_CONTENT,
+        page_timeout=45000,
+        post_load_script=scroll_script,
+        max_content_length=20000000
+    )
+
+
+def default_extraction_schema(css_selector: str) -> Dict[str, Any]:
+    """返回未指定schema时使用的默认提取schema"""
+    return {
+        "name": "BasicPageInfo",
+        "baseSelector": css_selector,
+        "fields": [
+            {"name": "headings", "selector": "h1, h2, h3",
+                "type": "text", "multiple": True},
+            {"name": "paragraphs", "selector": "p",
+                "type": "text", "multiple": True},
+            {"name": "images", "selector": "img", "type": "attribute",
+                "attribute": "src", "multiple": True},
+            {"name": "links", "selector": "a", "type": "attribute",
+                "attribute": "href", "multiple": True},
+            {"name": "tables", "selector": "table",
+                "type": "html", "multiple": True}
+        ]
+    }
+
+
+def is_thin_content(result) -> bool:
+    """判断爬取到的内容是否可能不完整"""
+    markdown = result.markdown or ""
+    html = getattr(result, "html", None) or "1"
+    return len(markdown) < 2000 or len(markdown) / len(html) < 0.1
+
+
+async def fetch_page(pool: CrawlerPool, url: str, include_images: bool = True,
+                     retry_thin: bool = True, engine: str = "browser",
+                     http: Optional[HttpFetcher] = None):
+    """
+    爬取单个页面
+
+    auto引擎先用HTTP抓取，页面需要JavaScript渲染、内容为空或HTTP抓取失败时回退到浏览器；
+    http引擎只用HTTP抓取；没有可用的HTTP引擎时都由浏览器抓取。
+
+    Args:
+        pool: 浏览器池
+        url: 页面URL
+        include_images: 是否包含图像
+        retry_thin: 浏览器抓取的内容过少时是否使用DOM等待策略重试
+        engine: 抓取引擎，"auto"、"http"或"browser"
+        http: HTTP抓取引擎
+
+    Returns:
+        爬取结果，engine属性为"http"时由HTTP引擎抓取，否则由浏览器抓取
+
+    Raises:
+        HttpFetchError: 使用http引擎且抓取失败
+    """
+    if engine != "browser" and http is not None and http.available:
+        try:
+            result = await http.fetch(url, include_images=include_images)
+            if engine == "http" or not result.needs_browser:
+                return result
+            logger.info(f"页面需要浏览器渲染，回退到浏览器: {url}")
+        except HttpFetchError as e:
+            if engine == "http":
+                raise
+            logger.info(f"HTTP抓取 {url} 失败（{e}），回退到浏览器")
+        http.fallbacks += 1
+
+    config = build_page_config(include_images)
+    async with pool.lease() as crawler:
+        result = await crawler.arun(url=url, config=config)
+
+        if retry_thin and result.success and is_thin_content(result) and "." in url:
+            logger.warning(f"爬取到的内容可能不完整，使用DOM等待策略重试: {url}")
+            config.wait_for = WAIT_FOR_PARAGRAPHS
+            config.page_timeout = 60000
+            result = await crawler.arun(url=url, config=config)
+
+    return result
+
+
+def in_crawl_scope(start_url: str, url: str) -> bool:
+    """判断URL是否位于起始URL所在的目录下（同一主机）"""
+    start = urlparse(start_url)
+    parts = urlparse(url)
+    if parts.netloc.lower() != start.netloc.lower():
+        return False
+    prefix = start.path[:start.path.rfind("/") + 1] or "/"
+    return (parts.path or "/").startswith(prefix)
+
+
+async def revalidate_page(pool: CrawlerPool, url: str, include_images: bool, engine: str,
+                          http: Optional[HttpFetcher],
+                          previous: Optional[Dict[str, Any]]) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """
+    按上次的爬取状态重新抓取页面
+
+    先用HTTP发送条件请求：返回304或响应体与上次相同时直接使用保存的内容，不重新渲染；
+    页面有变化时按引擎使用HTTP结果或交给浏览器渲染。没有可用的HTTP引擎时由浏览器抓取。
+
+    Args:
+        pool: 浏览器池
+        url: 页面URL
+        include_images: 是否包含图像
+        engine: 抓取引擎，"auto"、"http"或"browser"
+        http: HTTP抓取引擎
+        previous: 上次的爬取状态，首次爬取时为None
+
+    Returns:
+        (爬取结果, 本次响应的校验信息)；页面未修改时结果为UnchangedResult，返回304时校验信息为None
+
+    Raises:
+        HttpFetchError: 使用http引擎且抓取失败
+    """
+    validators = None
+    # 首次爬取且只用浏览器时不需要HTTP探测
+    if http is not None and http.available and not (previous is None and engine == "browser"):
+        try:
+            probe = await http.fetch(url, etag=(previous or {}).get("etag"),
+                                     last_modified=(previous or {}).get("last_modified"),
+                                     include_images=include_images)
+        except HttpFetchError as e:
+            if engine == "http":
+                raise
+            logger.info(f"HTTP抓取 {url} 失败（{e}），使用浏览器")
+        else:
+            if probe is None and previous is not None:
+                return UnchangedResult(url, previous), None
+            if probe is not None:
+                validators = probe.validators
+                if previous is not None and probe.body_hash == previous.get("body_hash"):
+                    return UnchangedResult(url, previous), validators
+                if engine == "http" or (engine == "auto" and not probe.needs_browser):
+                    return probe, validators
+                if engine == "auto":
+                    logger.info(f"页面需要浏览器渲染，回退到浏览器: {url}")
+                    http.fallbacks += 1
+
+    result = await fetch_page(pool, url, include_images, retry_thin=False, engine="browser")
+    return result, validators
+
+
+def result_engine(result) -> str:
+    """返回抓取结果所用的引擎"""
+    return getattr(result, "engine", "browser")
+
+
+async def build_page_response(url: str, result, include_images: bool) -> Dict[str, Any]:
+    """
+    将爬取结果转换为crawl_webpage的响应格式
+
+    Args:
+        url: 请求的URL
+        result: crawl4ai的爬取结果
+        include_images: 是否包含图像信息
+
+    Returns:
+        响应字典
+    """
+    markdown = result.markdown or ""
+    response = {
+        "success": True,
+        "url": url,
+        "title": result.metadata.get("title", ""),
+        "markdown": markdown,
+        "word_count": count_words(markdown),
+        "character_count": len(markdown),
+        "crawl_time_ms": result.metadata.get("crawl_time_ms", 0),
+        "engine": result_engine(result)
+    }
+
+    if include_images and result.media and "images" in result.media:
+        response["images"] = len(result.media["images"])
+        image_urls = [img.get("src", "") for img in result.media["images"][:10]]
+        if image_urls:
+            response["image_urls"] = image_urls
+
+    return response
+
+
+async def crawl_webpage(pool: CrawlerPool, url: str, include_images: bool = True,
+                        cache: Optional[ResultCache] = None,
+                        cache_mode: CacheMode = CacheMode.DEFAULT,
+                        cache_ttl: Optional[float] = None,
+                        flights: Optional[SingleFlight] = None,
+                        engine: str = "auto",
+                        http: Optional[HttpFetcher] = None) -> Union[RawJSON, Dict[str, Any]]:
+    """
+    爬取单个网页并返回其内容为markdown格式
+
+    Args:
+        pool: 浏览器池
+        url: 要爬取的网页URL
+        include_images: 是否在结果中包含图像
+        cache: 结果缓存，为空时不使用缓存
+        cache_mode: 缓存模式
+        cache_ttl: 写入缓存时的有效期（秒），为空时使用缓存默认值
+        flights: 进行中请求的合并器，相同URL和选项的并发调用共享一次抓取
+        engine: 抓取引擎，"auto"、"http"或"browser"
+        http: HTTP抓取引擎，为空时由浏览器抓取
+
+    Returns:
+        成功时返回已序列化的结果（缓存中保存的也是同一份字节），失败时返回错误字典
+    """
+    key = make_cache_key("crawl_webpage", url, include_images=include_images, engine=engine)
+    if cache is not None:
+        cached = await cache.get(key, cache_mode)
+        if cached is not None:
+            logger.info(f"缓存命中: {url}")
+            return RawJSON(cached)
+
+    async def fetch() -> Union[bytes, Dict[str, Any]]:
+        logger.info(f"爬取网页: {url}")
+        try:
+            result = await fetch_page(pool, url, include_images, engine=engine, http=http)
+            if not result.success:
+                return {"success": False, "error": result.error_message}
+            # 只编码一次，缓存和响应共用同一份字节
+            payload = encode_json(await build_page_response(url, result, include_images))
+        except Exception as e:
+            logger.error(f"爬取 {url} 时出错: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+        # 只缓存成功的结果；由执行抓取的一方写入，合并的调用不重复写入
+        if cache is not None:
+            await cache.put(key, payload, cache_ttl)
+            # 浏览器渲染后的HTML也写入缓存，之后对该页面的结构化提取不必重新抓取；
+            # HTTP引擎的HTML没有执行脚本，不能代替渲染结果
+            if result.html and result_engine(result) == "browser":
+                await cache.put(page_html_key(url), result.html.encode("utf-8"), cache_ttl)
+        return payload
+
+    # 进行中的抓取本身就是最新结果，任何缓存模式都可以合并
+    outcome = await (flights.run(key, fetch) if flights is not None else fetch())
+    if isinstance(outcome, bytes):
+        return RawJSON(outcome)
+    # 错误字典可能被多个调用共享，返回副本
+    return dict(outcome)
+
+
+async def crawl_webpages(pool: CrawlerPool, urls: List[str], include_images: bool = True,
+                         cache: Optional[ResultCache] = None,
+                         cache_mode: CacheMode = CacheMode.DEFAULT,
+                         cache_ttl: Optional[float] = None,
+                         flights: Optional[SingleFlight] = None,
+                         max_concurrency: int = 8,
+                         on_result: Optional[Callable[[Any], Awaitable[None]]] = None,
+                         http: Optional[HttpFetcher] = None) -> Dict[str, Any]:
+    """
+    并发爬取多个互不相关的网页
+
+    每个URL按crawl_webpage的方式独立爬取（共享缓存和请求合并），单个URL失败只影响它自己的条目。
+
+    Args:
+        pool: 浏览器池
+        urls: 网页URL列表
+        include_images: 是否在结果中包含图像
+        cache: 结果缓存，为空时不使用缓存
+        cache_mode: 缓存模式
+        cache_ttl: 写入缓存时的有效期（秒）
+        flights: 进行中请求的合并器
+        max_concurrency: 同时爬取的最大URL数
+        on_result: 流式回调，每个URL完成时以其结果调用一次；指定后结果中只保留每个URL的状态
+        http: HTTP抓取引擎，静态页面优先用它抓取
+
+    Returns:
+        按输入顺序排列的各URL结果
+    """
+    logger.info(f"批量爬取 {len(urls)} 个网页 (并发: {max_concurrency})")
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def crawl_one(index: int, page_url: str) -> Any:
+        async with semaphore:
+            try:
+                entry = await crawl_webpage(pool, page_url, include_images, cache=cache,
+                                            cache_mode=cache_mode, cache_ttl=cache_ttl,
+                                            flights=flights, http=http)
+            except Exception as e:
+                logger.error(f"爬取 {page_url} 时出错: {str(e)}")
+                entry = {"success": False, "error": str(e)}
+        if isinstance(entry, dict):
+            # 错误条目补上URL，便于与输入对应
+            entry = {"url": page_url, **entry}
+        if on_result is None:
+            return entry
+        # 流式模式：完整结果立即交给回调，内存中只保留状态
+        await on_result({"index": index, "url": page_url, "result": entry})
+        status = {"index": index, "url": page_url, "success": isinstance(entry, RawJSON)}
+        if isinstance(entry, dict):
+            status["error"] = entry.get("error")
+        return status
+
+    results = await asyncio.gather(*(crawl_one(i, u) for i, u in enumerate(urls)))
+    succeeded = sum(1 for entry in results
+                    if isinstance(entry, RawJSON) or entry.get("success"))
+    response = {
+        "success": True,
+        "total": len(urls),
+        "succeeded": succeeded,
+        "failed": len(urls) - succeeded,
+        "results": results
+    }
+    if on_result is not None:
+        response["streamed"] = True
+    return response
+
+
+async def crawl_website(pool: CrawlerPool, url: str, max_depth: int = 1,
+                        max_pages: int = 5, include_images: bool = True,
+                        on_page: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+                        on_failure: Optional[Callable[[str, str], None]] = None,
+                        max_concurrency: int = 4,
+                        per_host_concurrency: int = 2,
+                        max_markdown_chars: Optional[int] = 10000,
+                        engine: str = "auto",
+                        http: Optional[HttpFetcher] = None,
+                        state: Optional[CrawlStateStore] = None,
+                        changed_only: bool = False,
+                        hosts: Optional[HostCache] = None,
+                        use_sitemap: bool = False,
+                        respect_robots: bool = False) -> Dict[str, Any]:
+    """
+    从给定URL开始并发爬取网站
+
+    页面按深度优先级从前沿队列取出并发抓取；URL去掉跟踪参数和片段后去重，
+    并遵循页面的rel=canonical。达到max_pages后立即取消仍在进行的抓取。
+    调用被取消（客户端取消或超过截止时间）时停止抓取，返回已完成的页面作为部分结果。
+    指定state时增量爬取：未修改的页面使用上次保存的内容和链接，每个页面标记为new、changed或unchanged。
+    use_sitemap时先用sitemap中起始URL所在目录下的页面（按lastmod从新到旧）填充队列，不必逐层跟随导航链接；
+    respect_robots时跳过robots.txt禁止的URL并遵循crawl-delay。
+
+    Args:
+        pool: 浏览器池
+        url: 爬取起始URL
+        max_depth: 最大爬取深度
+        max_pages: 最大爬取页面数量
+        include_images: 是否在结果中包含图像
+        on_page: 流式回调，每爬完一个页面调用一次；指定后结果中只保留页面摘要
+        on_failure: 页面抓取失败时调用，参数为URL和错误信息
+        max_concurrency: 同时抓取的最大页面数
+        per_host_concurrency: 单个主机同时抓取的最大页面数
+        max_markdown_chars: 每个页面返回的Markdown最大字符数，为空时不截断
+        engine: 抓取引擎，"auto"、"http"或"browser"
+        http: HTTP抓取引擎，为空时由浏览器抓取
+        state: 增量爬取状态存储，为空时完整爬取
+        changed_only: 增量爬取时结果只包含新增和有变化的页面，未修改的页面只列出URL
+        hosts: 按主机缓存的robots.txt规则和sitemap，为空时不使用sitemap和robots.txt
+        use_sitemap: 是否用sitemap中的URL填充前沿队列
+        respect_robots: 是否遵循robots.txt
+
+    Returns:
+        包含爬取结果的字典
+    """
+    logger.info(f"爬取网站: {url} (深度: {max_depth}, 最大页面数: {max_pages}, 并发: {max_concurrency})")
+    frontier = CrawlFrontier(max_depth, allowed_hosts=[urlparse(canonicalize_url(url)).netloc])
+    frontier.add(url, 0)
+    host_limiter = HostLimiter(per_host_concurrency)
+    in_flight: set = set()
+    # 抓取任务 -> 页面URL，任务抛出异常时用于报告失败的页面
+    task_urls: Dict[asyncio.Task, str] = {}
+    pages = []
+    unchanged_urls = []
+    status_counts = {"new": 0, "changed": 0, "unchanged": 0}
+    visited = 0
+    robots_skipped = 0
+    cancelled = False
+    if hosts is None and (use_sitemap or respect_robots):
+        logger.warning("没有可用的HTTP引擎，不使用sitemap和robots.txt")
+        use_sitemap = respect_robots = False
+
+    async def fetch(page_url: str, depth: int):
+        # 每个页面单独租用实例，不在整个爬取过程中占用浏览器
+        async with host_limiter.for_url(page_url):
+            if respect_robots:
+                rules = await hosts.robots(page_url)
+                if not rules.allowed(page_url):
+                    return page_url, depth, None, None, None
+                await host_limiter.pace(page_url, rules.crawl_delay)
+            if state is None:
+                result = await fetch_page(pool, page_url, include_images, retry_thin=False,
+                                          engine=engine, http=http)
+                return page_url, depth, result, None, None
+            previous = await state.get(page_url)
+            result, validators = await revalidate_page(pool, page_url, include_images, engine,
+                                                       http, previous)
+        return page_url, depth, result, previous, validators
+
+    try:
+        seeded = 0
+        try:
+            if use_sitemap:
+                seeds = [seed for seed in await hosts.sitemap_urls(url) if in_crawl_scope(url, seed)]
+                if respect_robots:
+                    rules = await hosts.robots(url)
+                    seeds = [seed for seed in seeds if rules.allowed(seed)]
+                # 种子与起始URL同为第0层，排在起始URL之后并保持lastmod顺序
+                seeded = frontier.add_links(seeds, 0)
+                logger.info(f"从sitemap加入 {seeded} 个URL")
+
+            while visited < max_pages and (frontier or in_flight):
+                while frontier and len(in_flight) < max(1, max_concurrency):
+                    page_url, depth = frontier.pop()
+                    task = asyncio.create_task(fetch(page_url, depth))
+                    task_urls[task] = page_url
+                    in_flight.add(task)
+
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if visited >= max_pages:
+                        break
+                    task_url = task_urls.pop(task)
+                    try:
+                        page_url, depth, result, previous, validators = task.result()
+                    except Exception as e:
+                        logger.warning(f"抓取页面时出错: {e}")
+                        if on_failure is not None:
+                            on_failure(task_url, str(e) or type(e).__name__)
+                        continue
+                    if result is None:
+                        logger.info(f"robots.txt禁止抓取: {page_url}")
+                        robots_skipped += 1
+                        continue
+                    if not result.success:
+                        if on_failure is not None:
+                            on_failure(page_url, result.error_message or "爬取失败")
+                        continue
+
+                    markdown = result.markdown or ""
+                    word_count = count_words(markdown)
+                    # 增量爬取时总是保存链接，下次页面未修改时仍能继续扩展
+                    expand = depth < max_depth or state is not None
+                    links = (result.links or {}).get("internal", []) if expand else []
+                    # canonical只解析HTML的head，开销很小，直接在当前进程执行
+                    canonical, page_links = analyze_page(
+                        page_url, html_head(getattr(result, "html", None)), links)
+
+                    # 页面声明的canonical地址已经爬取或排队时视为重复页面
+                    if canonical and canonical != page_url and not frontier.mark_seen(canonical):
+                        logger.info(f"跳过重复页面: {page_url} -> {canonical}")
+                        continue
+
+                    truncated = max_markdown_chars is not None and len(markdown) >= max_markdown_chars
+                    page_info = {
+                        "url": result.url or page_url,
+                        "title": result.metadata.get("title", ""),
+                        "word_count": word_count,
+                        "engine": result_engine(result),
+                        "character_count": len(markdown),
+                        "markdown": markdown[:max_markdown_chars] + "...(内容过长，已截断)" if truncated else markdown
+                    }
+                    visited += 1
+
+                    if state is not None:
+                        digest = content_hash(markdown)
+                        if isinstance(result, UnchangedResult) or (
+                                previous is not None and previous.get("content_hash") == digest):
+                            status = "unchanged"
+                        else:
+                            status = "changed" if previous is not None else "new"
+                        page_info["status"] = status
+                        status_counts[status] += 1
+                        await save_page_state(state, page_url, result, page_info, markdown, digest,
+                                              page_links, previous, validators, status)
+                        if status == "unchanged":
+                            unchanged_urls.append(page_info["url"])
+                            if changed_only:
+                                if depth < max_depth:
+                                    frontier.add_links(page_links, depth + 1)
+                                continue
+
+                    if on_page is not None:
+                        # 流式模式：页面内容立即交给回调，内存中只保留摘要
+                        await on_page(page_info)
+                        page_info = {key: page_info[key]
+                                     for key in ("url", "title", "word_count", "engine", "status")
+                                     if key in page_info}
+                    pages.append(page_info)
+
+                    if depth < max_depth:
+                        frontier.add_links(page_links, depth + 1)
+        except asyncio.CancelledError:
+            # 调用被取消（等待抓取、处理页面或保存状态时）：停止抓取，返回已完成的页面
+            logger.info(f"爬取 {url} 被取消，返回已完成的 {len(pages)} 个页面")
+            cancelled = True
+
+        response = {
+            "success": True,
+            "start_url": url,
+            "pages_crawled": visited,
+            "total_words": sum(page.get("word_count", 0) for page in pages),
+            "pages": pages
+        }
+        if state is not None:
+            response.update({f"pages_{status}": count for status, count in status_counts.items()})
+            response["unchanged_urls"] = unchanged_urls
+        if use_sitemap:
+            response["sitemap_seeded"] = seeded
+        if respect_robots:
+            response["robots_skipped"] = robots_skipped
+        if on_page is not None:
+            response["streamed"] = True
+        if cancelled:
+            response["partial"] = True
+        return response
+    except Exception as e:
+        logger.error(f"深度爬取 {url} 时出错: {str(e)}")
+        return {"success": False, "error": str(e)}
+    finally:
+        # 达到页面上限或出错时取消仍在进行的抓取
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+
+def page_html_key(url: str) -> str:
+    """返回页面渲染后HTML在结果缓存中的键，与抓取选项无关，只用于浏览器渲染的HTML"""
+    return make_cache_key("page_html", url)
+
+
+async def get_page_html(pool: CrawlerPool, url: str,
+                        cache: Optional[ResultCache] = None,
+                        cache_mode: CacheMode = CacheMode.DEFAULT,
+                        flights: Optional[SingleFlight] = None) -> Tuple[Optional[bytes], Optional[str], bool]:
+    """
+    获取页面渲染后的HTML，优先使用缓存
+
+    Args:
+        pool: 浏览器池
+        url: 页面URL
+        cache: 结果缓存
+        cache_mode: 缓存模式
+        flights: 进行中请求的合并器
+
+    Returns:
+        (UTF-8编码的HTML, 错误信息, 是否来自缓存)
+    """
+    key = page_html_key(url)
+    if cache is not None:
+        cached = await cache.get(key, cache_mode)
+        if cached is not None:
+            return cached, None, True
+
+    async def fetch() -> Union[bytes, str]:
+        logger.info(f"抓取页面HTML: {url}")
+        try:
+            result = await fetch_page(pool, url, retry_thin=False)
+        except Exception as e:
+            return str(e)
+        if not result.success:
+            return result.error_message or "爬取失败"
+        html = (result.html or "").encode("utf-8")
+        if cache is not None and html:
+            await cache.put(key, html)
+        return html
+
+    outcome = await (flights.run(key, fetch) if flights is not None else fetch())
+    if isinstance(outcome, bytes):
+        return outcome, None, False
+    return None, outcome, False
+
+
+async def save_page_state(state: CrawlStateStore, page_url: str, result, page_info: Dict[str, Any],
+                          markdown: str, digest: str, links: List[str],
+                          previous: Optional[Dict[str, Any]],
+                          validators: Optional[Dict[str, Any]], status: str):
+    """
+    保存页面的增量爬取状态
+
+    页面未修改且校验信息没有变化（例如返回304）时不重写条目。
+    """
+    if status == "unchanged" and (validators is None or all(
+            previous.get(key) == value for key, value in validators.items())):
+        return
+    entry = dict(previous or {})
+    entry.update({
+        "url": page_info["url"],
+        "title": page_info["title"],
+        "markdown": markdown,
+        "content_hash": digest,
+        "links": links,
+        "head": html_head(getattr(result, "html", None)),
+        "engine": page_info["engine"],
+        "crawled_at": time.time(),
+    })
+    # 由浏览器抓取且没有HTTP探测时不保存校验信息，下次通过内容摘要判断变化
+    entry.update(validators or {"etag": None, "last_modified": None, "body_hash": None})
+    await state.put(page_url, entry)
+
+
+async def extract_structured_data(pool: CrawlerPool, url: str,
+                                  schema: Optional[Dict[str, Any]] = None,
+                                  css_selector: str = "body",
+                                  schemas: Optional[List[Dict[str, Any]]] = None,
+                                  schema_cache: Optional[SchemaCache] = None,
+                                  cache: Optional[ResultCache] = None,
+                                  cache_mode: CacheMode = CacheMode.DEFAULT,
+                                  flights: Optional[SingleFlight] = None) -> Dict[str, Any]:
+    """
+    使用CSS选择器从网页中提取结构化数据
+
+    页面只抓取一次（缓存中有渲染后的HTML时不抓取），所有schema在同一份解析结果上执行；
+    schema的编译计划按摘要缓存，在多个页面上复用。
+
+    Args:
+        pool: 浏览器池
+        url: 要提取数据的网页URL
+        schema: 定义提取的schema
+        css_selector: 未指定schema时，默认schema用于定位页面部分的CSS选择器
+        schemas: 在同一页面上执行的多个schema，指定后忽略schema和css_selector
+        schema_cache: 编译计划缓存，为空时每次重新编译
+        cache: 结果缓存，保存页面渲染后的HTML
+        cache_mode: 缓存模式
+        flights: 进行中请求的合并器
+
+    Returns:
+        包含提取数据的字典；指定schemas时results按顺序包含每个schema的结果
+    """
+    logger.info(f"从 {url} 提取结构化数据")
+    schema_list = schemas if schemas else [schema or default_extraction_schema(css_selector)]
+    try:
+        if schema_cache is not None:
+            compiled = [schema_cache.get(s) for s in schema_list]
+        else:
+            compiled = [(schema_hash(s), compile_schema(s)) for s in schema_list]
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    try:
+        html, error, from_cache = await get_page_html(pool, url, cache, cache_mode, flights)
+        if html is None:
+            return {"success": False, "error": error}
+
+        start_time = time.perf_counter()
+        converter = conversion_pool()
+        if converter.offloads(len(html)):
+            # 编译计划不能跨进程传递，处理进程按schema使用自己的计划缓存
+            extracted = await converter.submit(run_schemas, schema_list, url, html)
+        else:
+            extracted = await converter.run(len(html), run_plans, [plan for _, plan in compiled], url, html)
+        response = {
+            "success": True,
+            "url": url,
+            "html_from_cache": from_cache,
+            "extraction_time_ms": round((time.perf_counter() - start_time) * 1000, 3)
+        }
+        if schemas:
+            response["results"] = [
+                {"name": plan.name, "schema_hash": digest, "data": data}
+                for (digest, plan), data in zip(compiled, extracted)
+            ]
+        else:
+            response["data"] = extracted[0]
+        return response
+    except Exception as e:
+        logger.error(f"从 {url} 提取数据时出错: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+async def save_as_markdown(pool: CrawlerPool, url: str, filename: str,
+                           include_images: bool = True) -> Dict[str, Any]:
+    """
+    爬取网页并将内容保存为Markdown文件
+
+    Args:
+        pool: 浏览器池
+        url: 要爬取的网页URL
+        filename: 保存Markdown的文件名
+        include_images: 是否包含图像
+
+    Returns:
+        操作结果的字典
+    """
+    logger.info(f"爬取 {url} 并保存为 {filename}")
+    try:
+        result = await fetch_page(pool, url, include_images)
+        if not result.success:
+            return {"success": False, "error": result.error_message}
+
+        # 确保文件名有.md扩展名
+        if not filename.endswith('.md'):
+            filename += '.md'
+
+        title = result.metadata.get("title", "")
+        markdown = result.markdown or ""
+        document = (f"# {title or 'Untitled'}\n\n"
+                    f"Source: {url}\n\n"
+                    f"Saved at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+                    f"{markdown}")
+        # 在线程中原子写入，不阻塞事件循环，也不会留下写了一半的文件
+        await asyncio.to_thread(atomic_write, filename, document.encode("utf-8"))
+
+        return {
+            "success": True,
+            "filename": filename,
+            "title": title,
+            "word_count": count_words(markdown),
+            "character_count": len(markdown),
+            "save_time": datetime.now().isoformat()
+        }
+    except Exception as e:
+        logger.error(f"保存 {url} 为Markdown时出错: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+async def export_site(pool: CrawlerPool, output_path: str, url: Optional[str] = None,
+                      urls: Optional[List[str]] = None, format: str = "directory",
+                      max_depth: int = 1, max_pages: int = 50, include_images: bool = True,
+                      max_concurrency: int = 4, per_host_concurrency: int = 2,
+                      skip_unchanged: bool = True,
+                      cache: Optional[ResultCache] = None,
+                      cache_mode: CacheMode = CacheMode.DEFAULT,
+                      flights: Optional[SingleFlight] = None,
+                      http: Optional[HttpFetcher] = None) -> Dict[str, Any]:
+    """
+    批量爬取并导出为Markdown
+
+    从url开始爬取网站，或爬取urls中的每个网页；页面爬完后立即交给导出目标写入，
+    内存中只保留清单条目。
+
+    Args:
+        pool: 浏览器池
+        output_path: 导出目录（directory格式）或文件路径（jsonl/tar格式）
+        url: 爬取网站的起始URL，与urls二选一
+        urls: 要导出的网页URL列表，与url二选一
+        format: 导出格式，"directory"、"jsonl"或"tar"
+        max_depth: 爬取网站时的最大深度
+        max_pages: 爬取网站时的最大页面数
+        include_images: 是否包含图像
+        max_concurrency: 同时爬取的最大页面数
+        per_host_concurrency: 爬取网站时单个主机同时抓取的最大页面数
+        skip_unchanged: 是否跳过内容与上次导出相同的页面
+        cache: 结果缓存，爬取URL列表时使用
+        cache_mode: 缓存模式
+        flights: 进行中请求的合并器
+        http: HTTP抓取引擎，静态页面优先用它抓取
+
+    Returns:
+        导出清单，不包含页面内容
+    """
+    if (url is None) == (urls is None):
+        return {"success": False, "error": "必须且只能指定url或urls之一"}
+
+    try:
+        exporter = create_exporter(format, output_path, skip_unchanged)
+    except (ValueError, OSError) as e:
+        return {"success": False, "error": str(e)}
+    logger.info(f"导出 {url or f'{len(urls)} 个网页'} 到 {exporter.output_path} ({format})")
+
+    try:
+        if url is not None:
+            crawl = await crawl_website(pool, url, max_depth, max_pages, include_images,
+                                        on_page=exporter.add, on_failure=exporter.add_failure,
+                                        max_concurrency=max_concurrency,
+                                        per_host_concurrency=per_host_concurrency,
+                                        max_markdown_chars=None, http=http)
+        else:
+            async def on_result(item: Dict[str, Any]):
+                entry = item["result"]
+                if isinstance(entry, RawJSON):
+                    await exporter.add(decode_json(entry))
+                else:
+                    exporter.add_failure(item["url"], entry.get("error") or "爬取失败")
+
+            crawl = await crawl_webpages(pool, urls, include_images, cache=cache,
+                                         cache_mode=cache_mode, flights=flights,
+                                         max_concurrency=max_concurrency, on_result=on_result,
+                                         http=http)
+        manifest = await exporter.finish()
+    except BaseException:
+        exporter.abort()
+        raise
+
+    if not crawl.get("success"):
+        manifest["success"] = False
+        manifest["error"] = crawl.get("error")
+    if crawl.get("partial"):
+        manifest["partial"] = True
+    return manifest
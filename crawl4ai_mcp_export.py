@@ -0,0 +1,375 @@
+"""
+Crawl4AI MCP服务器的批量导出。
+把爬取到的页面写入目录、JSONL文件或tar归档：写入在线程池中进行，文件通过临时文件原子替换，
+内容与上次导出相同的页面直接跳过，调用方只得到清单而不是文件内容。
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from crawl4ai_mcp_files import atomic_write
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+# 导出写入使用的线程数
+EXPORT_WRITE_WORKERS = int(os.environ.get("CRAWL4AI_MCP_EXPORT_WORKERS", "4"))
+
+# 清单文件名（目录格式）和后缀（JSONL/tar格式）
+MANIFEST_NAME = "manifest.json"
+MANIFEST_SUFFIX = ".manifest.json"
+
+# 导出文件名的最大长度
+_MAX_NAME_LENGTH = 150
+_UNSAFE_CHARS_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+_write_executor: Optional[ThreadPoolExecutor] = None
+
+
+def write_executor() -> ThreadPoolExecutor:
+    """返回所有导出共享的写入线程池"""
+    global _write_executor
+    if _write_executor is None:
+        _write_executor = ThreadPoolExecutor(
+            max_workers=EXPORT_WRITE_WORKERS, thread_name_prefix="crawl4ai-export")
+    return _write_executor
+
+
+def markdown_document(url: str, title: str, markdown: str) -> bytes:
+    """
+    生成导出的Markdown文件内容
+
+    与save_as_markdown的格式相同，但不含保存时间，使内容未变化的页面得到相同的字节。
+    """
+    return f"# {title or 'Untitled'}\n\nSource: {url}\n\n{markdown}".encode("utf-8")
+
+
+def url_to_filename(url: str, suffix: str = ".md") -> str:
+    """
+    由URL生成稳定且安全的文件名
+
+    Args:
+        url: 页面URL
+        suffix: 文件后缀
+
+    Returns:
+        文件名，例如example.com_docs_intro.md
+    """
+    parts = urlsplit(url)
+    path = parts.path.strip("/") or "index"
+    name = _UNSAFE_CHARS_RE.sub("_", f"{parts.netloc}_{path}").strip("_")
+    if parts.query or len(name) > _MAX_NAME_LENGTH:
+        # 查询参数和过长的路径用摘要区分
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()[:10]
+        name = f"{name[:_MAX_NAME_LENGTH]}_{digest}"
+    if name.endswith(suffix):
+        return name
+    return name + suffix
+
+
+def load_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    """读取上次导出的清单，返回URL到页面条目的映射"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {page["url"]: page for page in json.load(f).get("pages", [])}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+class Exporter:
+    """
+    导出目标的基类
+
+    子类实现_write_page和_commit；页面通过add逐个加入，finish写出清单并返回导出摘要。
+    """
+
+    format = ""
+
+    def __init__(self, output_path: str, skip_unchanged: bool = True):
+        """
+        Args:
+            output_path: 导出目录或文件路径
+            skip_unchanged: 是否跳过内容与上次导出相同的页面
+        """
+        self.output_path = os.path.abspath(output_path)
+        self.skip_unchanged = skip_unchanged
+        self.manifest_path = self._manifest_path()
+        self.previous = load_manifest(self.manifest_path) if skip_unchanged else {}
+        self.pages: List[Dict[str, Any]] = []
+        self.started_at = time.time()
+
+    def _manifest_path(self) -> str:
+        return self.output_path + MANIFEST_SUFFIX
+
+    def unchanged(self, url: str, digest: str) -> bool:
+        """内容摘要与上次导出相同"""
+        previous = self.previous.get(url)
+        return previous is not None and previous.get("sha256") == digest
+
+    async def add(self, page: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        加入一个页面
+
+        Args:
+            page: 包含url、title、markdown的页面结果
+
+        Returns:
+            该页面的清单条目
+        """
+        url = page["url"]
+        data = markdown_document(url, page.get("title", ""), page.get("markdown") or "")
+        digest = hashlib.sha256(data).hexdigest()
+        entry = {
+            "url": url,
+            "title": page.get("title", ""),
+            "sha256": digest,
+            "bytes": len(data),
+            "word_count": page.get("word_count", 0),
+        }
+        try:
+            entry.update(await self._write_page(url, data, digest))
+        except OSError as e:
+            logger.error(f"导出 {url} 失败: {e}")
+            entry.update({"status": "failed", "error": str(e)})
+        self.pages.append(entry)
+        return entry
+
+    def add_failure(self, url: str, error: str):
+        """记录爬取失败的页面"""
+        self.pages.append({"url": url, "status": "failed", "error": error})
+
+    async def finish(self) -> Dict[str, Any]:
+        """
+        完成导出并写出清单
+
+        Returns:
+            导出摘要，包含每个页面的清单条目
+        """
+        changed = await self._commit()
+        counts = {status: sum(1 for page in self.pages if page.get("status") == status)
+                  for status in ("written", "unchanged", "failed")}
+        manifest = {
+            "format": self.format,
+            "output": self.output_path,
+            "exported_at": time.time(),
+            "pages": self.pages,
+        }
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            write_executor(), atomic_write, self.manifest_path,
+            json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+        return {
+            "success": True,
+            "format": self.format,
+            "output": self.output_path,
+            "manifest": self.manifest_path,
+            "output_changed": changed,
+            "pages_exported": len(self.pages) - counts["failed"],
+            **counts,
+            "total_bytes": sum(page.get("bytes", 0) for page in self.pages),
+            "elapsed_seconds": round(time.time() - self.started_at, 3),
+            "pages": self.pages,
+        }
+
+    def abort(self):
+        """放弃导出，已写入的目录文件保留，未完成的单文件导出被丢弃"""
+
+    async def _write_page(self, url: str, data: bytes, digest: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def _commit(self) -> bool:
+        raise NotImplementedError
+
+
+class DirectoryExporter(Exporter):
+    """每个页面一个Markdown文件，文件在线程池中并行写入"""
+
+    format = "directory"
+
+    def __init__(self, output_path: str, skip_unchanged: bool = True):
+        super().__init__(output_path, skip_unchanged)
+        # 文件名 -> URL，不同URL得到相同文件名时（例如/a/b和/a_b）加URL摘要后缀区分
+        self._names: Dict[str, str] = {}
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.output_path, MANIFEST_NAME)
+
+    def _filename(self, url: str) -> str:
+        """返回页面的文件名，优先沿用上次导出的文件名"""
+        filename = url_to_filename(url)
+        for name in (self.previous.get(url, {}).get("path"), filename):
+            if name and self._names.setdefault(name, url) == url:
+                return name
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()[:10]
+        name = f"{filename[:-len('.md')]}_{digest}.md"
+        self._names[name] = url
+        return name
+
+    async def _write_page(self, url: str, data: bytes, digest: str) -> Dict[str, Any]:
+        filename = self._filename(url)
+        path = os.path.join(self.output_path, filename)
+        if (self.unchanged(url, digest) and self.previous[url].get("path") == filename
+                and os.path.exists(path)):
+            return {"path": filename, "status": "unchanged"}
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(write_executor(), atomic_write, path, data)
+        return {"path": filename, "status": "written"}
+
+    async def _commit(self) -> bool:
+        return any(page.get("status") == "written" for page in self.pages)
+
+
+class StreamExporter(Exporter):
+    """
+    单文件导出的基类
+
+    页面内容依次交给一个专用的写入线程追加到临时文件，结束时原子替换目标文件；
+    所有页面都与上次导出相同时保留原文件。
+    """
+
+    def __init__(self, output_path: str, skip_unchanged: bool = True):
+        super().__init__(output_path, skip_unchanged)
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.output_path), suffix=".tmp")
+        os.close(fd)
+        # 单线程保证写入顺序
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="crawl4ai-export-stream")
+        self._opened = self._writer.submit(self._open)
+
+    async def _write_page(self, url: str, data: bytes, digest: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        member = await loop.run_in_executor(self._writer, self._append, url, data, digest)
+        status = "unchanged" if self.unchanged(url, digest) else "written"
+        return {"member": member, "status": status}
+
+    async def _commit(self) -> bool:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._writer, self._close)
+            # 失败的页面不在文件中，只比较导出的页面
+            exported = [page for page in self.pages if page.get("status") != "failed"]
+            previously_exported = {url for url, page in self.previous.items()
+                                   if page.get("status") != "failed"}
+            keep_existing = (
+                self.skip_unchanged
+                and os.path.exists(self.output_path)
+                and previously_exported == {page["url"] for page in exported}
+                and all(page["status"] == "unchanged" for page in exported)
+            )
+            if keep_existing:
+                os.remove(self._tmp_path)
+                return False
+            os.replace(self._tmp_path, self.output_path)
+            return True
+        except BaseException:
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+            raise
+        finally:
+            self._writer.shutdown(wait=False)
+
+    def abort(self):
+        try:
+            self._writer.submit(self._close)
+        except RuntimeError:
+            # finish已经关闭了写入线程
+            pass
+        self._writer.shutdown(wait=True)
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _append(self, url: str, data: bytes, digest: str) -> str:
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+
+class JsonlExporter(StreamExporter):
+    """所有页面写入一个JSONL文件，每行一个页面"""
+
+    format = "jsonl"
+
+    def _open(self):
+        self._file = open(self._tmp_path, "wb")
+        self._line = 0
+
+    def _append(self, url: str, data: bytes, digest: str) -> str:
+        self._opened.result()
+        text = data.decode("utf-8")
+        record = {"url": url, "sha256": digest, "markdown": text}
+        self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._line += 1
+        return f"line:{self._line}"
+
+    def _close(self):
+        self._opened.result()
+        self._file.close()
+
+
+class TarExporter(StreamExporter):
+    """所有页面写入一个tar归档，输出路径以.gz或.tgz结尾时使用gzip压缩"""
+
+    format = "tar"
+
+    def _open(self):
+        compressed = self.output_path.endswith((".gz", ".tgz"))
+        self._tar = tarfile.open(self._tmp_path, "w:gz" if compressed else "w")
+        self._names = set()
+
+    def _append(self, url: str, data: bytes, digest: str) -> str:
+        self._opened.result()
+        name = url_to_filename(url)
+        if name in self._names:
+            name = f"{name[:-3]}_{digest[:8]}.md"
+        self._names.add(name)
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(data))
+        return name
+
+    def _close(self):
+        self._opened.result()
+        self._tar.close()
+
+
+EXPORTERS = {
+    "directory": DirectoryExporter,
+    "jsonl": JsonlExporter,
+    "tar": TarExporter,
+}
+
+
+def create_exporter(format: str, output_path: str, skip_unchanged: bool = True) -> Exporter:
+    """
+    按格式创建导出目标
+
+    Args:
+        format: "directory"、"jsonl"或"tar"
+        output_path: 导出目录或文件路径
+        skip_unchanged: 是否跳过内容未变化的页面
+
+    Returns:
+        导出目标
+    """
+    try:
+        exporter_class = EXPORTERS[format]
+    except KeyError:
+        raise ValueError(f"不支持的导出格式: {format}") from None
+    return exporter_class(output_path, skip_unchanged)
@@ -0,0 +1,352 @@
+"""
+Crawl4AI MCP服务器的结构化数据提取。
+提取schema按内容摘要编译为选择器计划并缓存，同一schema在多个页面上只编译一次；
+页面HTML只解析一次即可运行多个schema。安装了lxml和cssselect时在lxml上执行编译后的XPath，
+否则回退到crawl4ai的JsonCssExtractionStrategy。两种方式的提取结果格式相同。
+"""
+
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple, Union
+
+from crawl4ai.extraction_strategy import JsonCssExtractionStrategy
+
+try:
+    from cssselect import HTMLTranslator, SelectorError
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # lxml和cssselect为可选依赖，缺失时由crawl4ai执行提取
+    etree = None
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+# 是否使用lxml执行编译后的选择器计划
+FAST_PARSER = etree is not None
+
+# 编译计划支持的字段类型，其他类型（例如computed）交给crawl4ai执行
+_FIELD_TYPES = {"text", "attribute", "html", "regex", "nested", "list", "nested_list"}
+
+_TRANSFORMS = {
+    "lowercase": str.lower,
+    "uppercase": str.upper,
+    "strip": str.strip,
+}
+
+
+class UnsupportedSchema(Exception):
+    """schema使用了编译计划不支持的功能"""
+
+
+def schema_hash(schema: Dict[str, Any]) -> str:
+    """
+    计算schema的内容摘要
+
+    键顺序不同但内容相同的schema得到相同的摘要。
+    """
+    canonical = json.dumps(schema, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+if FAST_PARSER:
+    _translator = HTMLTranslator()
+    _TEXT_NODES = etree.XPath("descendant::text()")
+
+    def _compile_selector(css: str, prefix: str) -> "etree.XPath":
+        """把CSS选择器编译为XPath"""
+        try:
+            return etree.XPath(_translator.css_to_xpath(css, prefix=prefix))
+        except SelectorError as e:
+            raise ValueError(f"无效的CSS选择器 {css!r}: {e}") from None
+
+    def _element_text(element) -> str:
+        # 与BeautifulSoup的get_text(strip=True)一致：每段文本去掉首尾空白后直接拼接
+        return "".join(text.strip() for text in _TEXT_NODES(element))
+
+    def _element_html(element) -> str:
+        return etree.tostring(element, encoding="unicode", method="html", with_tail=False)
+
+
+def parse_html(html: Union[str, bytes]):
+    """
+    把页面HTML解析为lxml文档，供多个编译计划共用
+
+    Args:
+        html: 页面HTML
+
+    Returns:
+        lxml文档的根元素
+    """
+    if isinstance(html, str):
+        # 字符串形式的HTML可能带有编码声明，统一按UTF-8字节解析
+        html = html.encode("utf-8")
+    if not html.strip():
+        return None
+    parser = lxml_html.HTMLParser(encoding="utf-8")
+    return lxml_html.document_fromstring(html, parser=parser)
+
+
+class CompiledField:
+    """编译后的字段"""
+
+    __slots__ = ("name", "type", "selector", "attribute", "pattern", "group", "transform",
+                 "default", "fields")
+
+    def __init__(self, field: Dict[str, Any]):
+        field_type = field.get("type")
+        # 类型流水线和source（兄弟元素定位）由crawl4ai执行
+        if not isinstance(field_type, str) or field_type not in _FIELD_TYPES or "source" in field:
+            raise UnsupportedSchema(f"字段 {field.get('name')} 的类型 {field_type}")
+        if field_type == "regex" and not field.get("pattern"):
+            raise UnsupportedSchema(f"字段 {field.get('name')} 缺少pattern")
+        self.name = field["name"]
+        self.type = field_type
+        self.selector = _compile_selector(field["selector"], "descendant::") if "selector" in field else None
+        self.attribute = field.get("attribute")
+        self.pattern = re.compile(field["pattern"]) if field_type == "regex" else None
+        self.group = field.get("group", 1)
+        self.transform = field.get("transform")
+        self.default = field.get("default")
+        self.fields = [CompiledField(f) for f in field.get("fields", [])]
+
+    def extract(self, element) -> Any:
+        """从元素中提取字段值，嵌套和列表字段出错时返回默认值"""
+        if self.type not in ("nested", "list", "nested_list"):
+            return self.extract_single(element)
+        try:
+            matches = self.selector(element)
+            if self.type == "nested":
+                return extract_item(matches[0], self.fields) if matches else {}
+            if self.type == "list":
+                return [extract_item(match, self.fields, single=True) for match in matches]
+            return [extract_item(match, self.fields) for match in matches]
+        except Exception:
+            return self.default
+
+    def extract_single(self, element) -> Any:
+        """提取单值字段，任何错误都返回默认值"""
+        try:
+            if self.selector is not None:
+                matches = self.selector(element)
+                if not matches:
+                    return self.default
+                element = matches[0]
+
+            value = None
+            if self.type == "text":
+                value = _element_text(element)
+            elif self.type == "attribute":
+                value = element.get(self.attribute)
+            elif self.type == "html":
+                value = _element_html(element)
+            elif self.type == "regex":
+                match = self.pattern.search(_element_text(element))
+                value = match.group(self.group) if match else None
+
+            if self.transform and value is not None and self.transform in _TRANSFORMS:
+                value = _TRANSFORMS[self.transform](value)
+            return value if value is not None else self.default
+        except Exception:
+            return self.default
+
+
+def extract_item(element, fields: List[CompiledField], single: bool = False) -> Dict[str, Any]:
+    """按字段列表从元素中提取一个条目，值为None的字段不出现在结果中"""
+    item = {}
+    for field in fields:
+        value = field.extract_single(element) if single else field.extract(element)
+        if value is not None:
+            item[field.name] = value
+    return item
+
+
+class CompiledSchema:
+    """编译后的选择器计划，在lxml文档上执行"""
+
+    fast = True
+
+    def __init__(self, schema: Dict[str, Any]):
+        """
+        Args:
+            schema: JsonCssExtractionStrategy格式的schema
+
+        Raises:
+            UnsupportedSchema: schema使用了编译计划不支持的功能
+            ValueError: 选择器无效
+        """
+        self.name = schema.get("name", "")
+        self.base = _compile_selector(schema.get("baseSelector") or "html", "descendant-or-self::")
+        self.base_fields = [CompiledField(f) for f in schema.get("baseFields", [])]
+        self.fields = [CompiledField(f) for f in schema.get("fields", [])]
+
+    def run(self, document) -> List[Dict[str, Any]]:
+        """
+        在解析后的文档上执行提取
+
+        Args:
+            document: parse_html返回的文档
+
+        Returns:
+            每个基础元素对应一个条目
+        """
+        if document is None:
+            return []
+        results = []
+        for element in self.base(document):
+            item = extract_item(element, self.base_fields, single=True)
+            item.update(extract_item(element, self.fields))
+            if item:
+                results.append(item)
+        return results
+
+
+class StrategySchema:
+    """由crawl4ai的JsonCssExtractionStrategy执行的计划，在没有lxml或schema不受支持时使用"""
+
+    fast = False
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.name = schema.get("name", "")
+        self.strategy = JsonCssExtractionStrategy(schema)
+
+    def run(self, url: str, html: str) -> List[Dict[str, Any]]:
+        return self.strategy.extract(url, html)
+
+
+Plan = Union[CompiledSchema, StrategySchema]
+
+
+class SchemaCache:
+    """
+    编译计划缓存
+
+    按schema摘要保存编译后的计划，超出容量时淘汰最久未使用的计划。
+    """
+
+    def __init__(self, max_entries: int = 128):
+        """
+        Args:
+            max_entries: 最多保存的计划数
+        """
+        self.max_entries = max_entries
+        self._plans: "OrderedDict[str, Plan]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, schema: Dict[str, Any]) -> Tuple[str, Plan]:
+        """
+        返回schema的编译计划，不存在时编译并缓存
+
+        Args:
+            schema: 提取schema
+
+        Returns:
+            (schema摘要, 编译计划)
+
+        Raises:
+            ValueError: schema无效
+        """
+        digest = schema_hash(schema)
+        plan = self._plans.get(digest)
+        if plan is not None:
+            self._plans.move_to_end(digest)
+            self.hits += 1
+            return digest, plan
+
+        self.misses += 1
+        plan = compile_schema(schema)
+        self._plans[digest] = plan
+        while len(self._plans) > self.max_entries:
+            self._plans.popitem(last=False)
+        return digest, plan
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        return {
+            "entries": len(self._plans),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "fast_parser": FAST_PARSER,
+        }
+
+
+def compile_schema(schema: Dict[str, Any]) -> Plan:
+    """
+    编译schema
+
+    Args:
+        schema: 提取schema
+
+    Returns:
+        编译计划；没有lxml或schema使用了不支持的功能时返回由crawl4ai执行的计划
+
+    Raises:
+        ValueError: schema无效
+    """
+    if not isinstance(schema, dict) or not isinstance(schema.get("fields", []), list):
+        raise ValueError("schema必须是包含fields列表的对象")
+    if FAST_PARSER:
+        try:
+            return CompiledSchema(schema)
+        except UnsupportedSchema as e:
+            logger.info(f"schema {schema.get('name', '')} 使用了{e}，由crawl4ai执行")
+        except (KeyError, re.error) as e:
+            raise ValueError(f"无效的schema: {e}") from None
+    return StrategySchema(schema)
+
+
+def run_plans(plans: List[Plan], url: str, html: Union[str, bytes]) -> List[List[Dict[str, Any]]]:
+    """
+    在同一页面上执行多个计划，页面只解析一次
+
+    该函数是CPU密集的：小于CONVERT_INLINE_BYTES的页面直接在事件循环中调用，
+    更大的页面通过run_schemas在处理进程池中执行。
+
+    Args:
+        plans: 编译计划列表
+        url: 页面URL
+        html: 页面HTML
+
+    Returns:
+        与plans顺序对应的提取结果
+    """
+    document = None
+    parsed = False
+    text = None
+    results = []
+    for plan in plans:
+        if plan.fast:
+            if not parsed:
+                document = parse_html(html)
+                parsed = True
+            results.append(plan.run(document))
+        else:
+            if text is None:
+                text = html.decode("utf-8", errors="replace") if isinstance(html, bytes) else html
+            results.append(plan.run(url, text))
+    return results
+
+
+# 在处理进程中使用的编译计划缓存，每个进程各自编译
+_process_schema_cache = SchemaCache()
+
+
+def run_schemas(schemas: List[Dict[str, Any]], url: str,
+                html: Union[str, bytes]) -> List[List[Dict[str, Any]]]:
+    """
+    编译（或从当前进程的缓存中取出）schema并在页面上执行
+
+    编译计划不能在进程间传递，交给处理进程的是schema本身。
+
+    Args:
+        schemas: 提取schema列表
+        url: 页面URL
+        html: 页面HTML
+
+    Returns:
+        与schemas顺序对应的提取结果
+    """
+    return run_plans([_process_schema_cache.get(schema)[1] for schema in schemas], url, html)
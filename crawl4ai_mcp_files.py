@@ -0,0 +1,50 @@
+"""
+Crawl4AI MCP服务器的文件工具。
+缓存、存档、增量爬取状态、导出和指标文件共用的原子写入和按摘要分目录的存储布局。
+"""
+
+import hashlib
+import os
+import tempfile
+
+
+def atomic_write(path: str, *chunks: bytes):
+    """
+    通过同目录下的临时文件原子写入，读取方不会看到写了一半的文件
+
+    Args:
+        path: 目标路径，所在目录不存在时自动创建
+        *chunks: 依次写入的文件内容
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def sharded_path(directory: str, key: str, suffix: str) -> str:
+    """
+    返回键在按摘要分目录的存储中的文件路径
+
+    文件名是键的SHA-256摘要，按摘要前两位分到子目录，避免单个目录中文件过多。
+
+    Args:
+        directory: 存储目录
+        key: 条目的键，例如规范化后的URL
+        suffix: 文件后缀
+
+    Returns:
+        文件路径，例如directory/ab/ab12…ef.json.gz
+    """
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(directory, digest[:2], digest + suffix)
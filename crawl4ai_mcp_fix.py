@@ -12,15 +12,6 @@
 import os
 import re
 import sys
-from enum import Enum, auto
-
-# 定义CacheMode枚举
-
-
-class CacheMode(Enum):
-    DEFAULT = auto()
-    BYPASS = auto()
-    FORCE = auto()
 
 
 def fix_crawl4ai_mcp_server():
@@ -36,8 +27,8 @@ def fix_crawl4ai_mcp_server():
     with open(filename, 'r', encoding='utf-8') as f:
         content = f.read()
 
-    # 检查文件中是否已经定义了CacheMode
-    if "class CacheMode" in content:
+    # 检查文件中是否已经定义或导入了CacheMode（新版本从crawl4ai_mcp_cache导入）
+    if "class CacheMode" in content or "import CacheMode" in content:
         print(f"文件{filename}中已经定义了CacheMode类，无需修复")
         return True
 
@@ -0,0 +1,220 @@
+"""
+Crawl4AI MCP服务器的网站爬取前沿队列。
+负责URL规范化、去重、按深度排序，以及全局和单主机的并发限制。
+"""
+
+import asyncio
+import heapq
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from crawl4ai_mcp_cache import normalize_url
+
+# 不影响页面内容的跟踪参数
+TRACKING_PARAMS = {
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "igshid", "twclid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "ref_src",
+}
+
+# 以这些前缀开头的参数也视为跟踪参数
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_")
+
+# 匹配<link rel="canonical">标签
+_CANONICAL_TAG_RE = re.compile(
+    r"<link\b[^>]*\brel\s*=\s*[\"']?canonical[\"']?[^>]*>", re.IGNORECASE)
+_HREF_RE = re.compile(r"\bhref\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+
+
+def is_tracking_param(name: str) -> bool:
+    """判断查询参数是否为跟踪参数"""
+    lowered = name.lower()
+    return lowered in TRACKING_PARAMS or lowered.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    生成用于去重的规范URL
+
+    在normalize_url的基础上去掉跟踪参数和片段。
+
+    Args:
+        url: 原始URL
+
+    Returns:
+        规范URL
+    """
+    parts = urlsplit(url.strip())
+    if parts.query:
+        query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                           if not is_tracking_param(k)])
+        url = urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+    return normalize_url(url)
+
+
+def extract_canonical_url(html: Optional[str], base_url: str) -> Optional[str]:
+    """
+    从页面HTML中提取rel=canonical指向的URL
+
+    Args:
+        html: 页面HTML
+        base_url: 页面URL，用于解析相对地址
+
+    Returns:
+        规范化后的canonical URL，不存在时返回None
+    """
+    if not html:
+        return None
+    # canonical只出现在head中，避免扫描整个大页面
+    head_end = html.find("</head>")
+    head = html[:head_end] if head_end != -1 else html[:65536]
+    tag = _CANONICAL_TAG_RE.search(head)
+    if not tag:
+        return None
+    href = _HREF_RE.search(tag.group(0))
+    if not href:
+        return None
+    return canonicalize_url(urljoin(base_url, href.group(1).strip()))
+
+
+class CrawlFrontier:
+    """
+    网站爬取前沿队列
+
+    浅层页面优先出队，同一深度按发现顺序；所有入队过或已爬取的规范URL都记录在已访问集合中。
+    """
+
+    def __init__(self, max_depth: int, allowed_hosts: Optional[Iterable[str]] = None):
+        """
+        Args:
+            max_depth: 最大爬取深度
+            allowed_hosts: 允许爬取的主机（netloc），为空时不限制
+        """
+        self.max_depth = max_depth
+        self.allowed_hosts: Optional[Set[str]] = (
+            {host.lower() for host in allowed_hosts} if allowed_hosts else None)
+        self.seen: Set[str] = set()
+        # (优先级, 入队序号, 深度, 规范URL)
+        self._heap: List[Tuple[int, int, int, str]] = []
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add(self, url: str, depth: int, priority: Optional[int] = None) -> bool:
+        """
+        将URL加入队列
+
+        Args:
+            url: 页面URL
+            depth: 页面深度
+            priority: 排序优先级，越小越先出队，默认等于深度
+
+        Returns:
+            是否成功入队（重复、超出深度或不在允许主机内时返回False）
+        """
+        if depth > self.max_depth:
+            return False
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            return False
+        canonical = canonicalize_url(url)
+        if canonical in self.seen:
+            return False
+        if self.allowed_hosts is not None and urlsplit(canonical).netloc not in self.allowed_hosts:
+            return False
+
+        self.seen.add(canonical)
+        heapq.heappush(self._heap, (depth if priority is None else priority,
+                                    self._seq, depth, canonical))
+        self._seq += 1
+        return True
+
+    def add_links(self, links: Iterable[str], depth: int) -> int:
+        """
+        批量加入链接
+
+        Args:
+            links: 链接列表
+            depth: 链接的深度
+
+        Returns:
+            实际入队的数量
+        """
+        return sum(1 for link in links if self.add(link, depth))
+
+    def pop(self) -> Tuple[str, int]:
+        """
+        取出优先级最高的URL
+
+        Returns:
+            (规范URL, 深度)
+        """
+        _, _, depth, url = heapq.heappop(self._heap)
+        return url, depth
+
+    def mark_seen(self, url: str) -> bool:
+        """
+        标记URL已访问（例如页面的canonical地址）
+
+        Args:
+            url: 页面URL
+
+        Returns:
+            该URL此前是否未被记录
+        """
+        canonical = canonicalize_url(url)
+        if canonical in self.seen:
+            return False
+        self.seen.add(canonical)
+        return True
+
+
+class HostLimiter:
+    """按主机限制同时进行的抓取数量"""
+
+    def __init__(self, per_host: int):
+        """
+        Args:
+            per_host: 单个主机的最大并发数
+        """
+        self.per_host = max(1, per_host)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        # 主机 -> 下一次允许开始抓取的时间（crawl-delay）
+        self._next_start: Dict[str, float] = {}
+
+    def for_url(self, url: str) -> asyncio.Semaphore:
+        """
+        返回URL所属主机的信号量
+
+        Args:
+            url: 页面URL
+
+        Returns:
+            该主机的信号量
+        """
+        host = urlsplit(url).netloc.lower()
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host)
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    async def pace(self, url: str, delay: float):
+        """
+        按crawl-delay等待到URL所属主机允许开始下一次抓取
+
+        Args:
+            url: 页面URL
+            delay: 同一主机两次抓取开始之间的最小间隔（秒）
+        """
+        if delay <= 0:
+            return
+        host = urlsplit(url).netloc.lower()
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(now, self._next_start.get(host, now))
+        # 先预约时间段再等待，同时等待的抓取依次错开
+        self._next_start[host] = start + delay
+        if start > now:
+            await asyncio.sleep(start - now)
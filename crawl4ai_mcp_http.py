@@ -0,0 +1,370 @@
+"""
+Crawl4AI MCP服务器的HTTP抓取引擎。
+静态页面直接用长连接复用、带DNS缓存和压缩的HTTP客户端抓取，在处理进程池中转换为Markdown，
+不占用浏览器；启发式判断页面需要JavaScript渲染或内容为空时，由调用方回退到浏览器。
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp为可选依赖（crawl4ai已依赖它），缺失时所有页面都由浏览器抓取
+    aiohttp = None
+
+try:
+    import brotli  # noqa: F401  aiohttp在安装了brotli时才能解压br编码
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+try:
+    from crawl4ai.html2text import HTML2Text
+except ImportError:  # 旧版crawl4ai使用独立的html2text包
+    from html2text import HTML2Text
+
+from crawl4ai_mcp_convert import conversion_pool
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+# 抓取引擎
+ENGINES = ("auto", "http", "browser")
+
+# HTTP客户端配置
+HTTP_TIMEOUT = float(os.environ.get("CRAWL4AI_MCP_HTTP_TIMEOUT", "20"))
+HTTP_MAX_CONNECTIONS = int(os.environ.get("CRAWL4AI_MCP_HTTP_MAX_CONNECTIONS", "64"))
+HTTP_MAX_PER_HOST = int(os.environ.get("CRAWL4AI_MCP_HTTP_MAX_PER_HOST", "8"))
+HTTP_DNS_TTL = int(os.environ.get("CRAWL4AI_MCP_HTTP_DNS_TTL", "300"))
+HTTP_MAX_BYTES = int(os.environ.get("CRAWL4AI_MCP_HTTP_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# 可见文本少于该字符数的页面视为需要浏览器渲染
+HTTP_MIN_TEXT_CHARS = int(os.environ.get("CRAWL4AI_MCP_HTTP_MIN_TEXT_CHARS", "500"))
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0 Safari/537.36")
+
+_HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+# 单页应用的空挂载点，例如<div id="root"></div>
+_EMPTY_APP_ROOT_RE = re.compile(
+    r"<div[^>]+id=[\"'](?:root|app|__next|__nuxt|svelte)[\"'][^>]*>\s*</div>", re.IGNORECASE)
+_NOSCRIPT_JS_RE = re.compile(r"<noscript[^>]*>[^<]*(?:enable|requires?)\s+javascript", re.IGNORECASE)
+
+# 不计入可见文本的标签
+_HIDDEN_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+
+
+class _PageScanner(HTMLParser):
+    """一次扫描收集标题、链接、图片和可见文本长度"""
+
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.host = urlparse(base_url).netloc
+        self.title = ""
+        self.internal: List[Dict[str, str]] = []
+        self.external: List[Dict[str, str]] = []
+        self.images: List[Dict[str, str]] = []
+        self.text_chars = 0
+        self.script_chars = 0
+        self._hidden = 0
+        self._in_title = False
+        self._in_script = False
+        self._link: Optional[Dict[str, str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _HIDDEN_TAGS:
+            self._hidden += 1
+            self._in_script = tag == "script"
+        if tag == "title":
+            self._in_title = True
+        elif tag == "base":
+            href = dict(attrs).get("href")
+            if href:
+                self.base_url = urljoin(self.base_url, href)
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href and not href.startswith(("#", "javascript:", "mailto:", "tel:")):
+                self._link = {"href": urljoin(self.base_url, href), "text": ""}
+                links = self.internal if urlparse(self._link["href"]).netloc == self.host else self.external
+                links.append(self._link)
+        elif tag == "img":
+            attributes = dict(attrs)
+            src = attributes.get("src") or attributes.get("data-src")
+            if src:
+                self.images.append({"src": urljoin(self.base_url, src), "alt": attributes.get("alt") or ""})
+
+    def handle_endtag(self, tag):
+        if tag in _HIDDEN_TAGS and self._hidden:
+            self._hidden -= 1
+            self._in_script = False
+        if tag == "title":
+            self._in_title = False
+        elif tag == "a":
+            self._link = None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif self._in_script:
+            self.script_chars += len(data)
+        elif not self._hidden:
+            text = data.strip()
+            self.text_chars += len(text)
+            if self._link is not None and text:
+                self._link["text"] = (self._link["text"] + " " + text).strip()
+
+
+def convert_html(url: str, html: str, include_images: bool = True) -> Dict[str, Any]:
+    """
+    把抓取到的HTML转换为Markdown并收集页面信息
+
+    该函数是CPU密集的，通过处理进程池调用。
+
+    Args:
+        url: 页面的最终URL
+        html: 页面HTML
+        include_images: Markdown中是否保留图像
+
+    Returns:
+        包含markdown、title、links、images、响应体摘要和渲染判断依据的字典
+    """
+    scanner = _PageScanner(url)
+    scanner.feed(html)
+    scanner.close()
+
+    converter = HTML2Text(baseurl=url)
+    converter.body_width = 0
+    converter.ignore_images = not include_images
+    markdown = converter.handle(html)
+
+    return {
+        "markdown": markdown,
+        "title": scanner.title.strip(),
+        "links": {"internal": scanner.internal, "external": scanner.external},
+        "images": scanner.images,
+        "body_hash": hashlib.sha256(html.encode("utf-8")).hexdigest(),
+        "text_chars": scanner.text_chars,
+        "script_chars": scanner.script_chars,
+        "app_shell": bool(_EMPTY_APP_ROOT_RE.search(html) or _NOSCRIPT_JS_RE.search(html)),
+    }
+
+
+def needs_browser(page: Dict[str, Any]) -> bool:
+    """
+    判断HTTP抓取到的页面是否需要浏览器渲染
+
+    可见文本过少、页面是单页应用的空壳，或脚本远多于文本时需要浏览器。
+    """
+    text_chars = page["text_chars"]
+    if text_chars < HTTP_MIN_TEXT_CHARS:
+        return True
+    if page["app_shell"] and text_chars < 2000:
+        return True
+    return text_chars < 5000 and page["script_chars"] > text_chars * 10
+
+
+class HttpResult:
+    """HTTP引擎的抓取结果，字段与crawl4ai的CrawlResult一致"""
+
+    engine = "http"
+
+    def __init__(self, url: str, status_code: int, headers: Dict[str, str], html: str,
+                 page: Dict[str, Any], crawl_time_ms: float):
+        self.url = url
+        self.status_code = status_code
+        self.response_headers = headers
+        self.html = html
+        self.markdown = page["markdown"]
+        self.metadata = {"title": page["title"], "crawl_time_ms": crawl_time_ms}
+        self.media = {"images": page["images"]}
+        self.links = page["links"]
+        self.extracted_content = None
+        self.success = True
+        self.error_message = None
+        self.needs_browser = needs_browser(page)
+        self.body_hash = page["body_hash"]
+
+    @property
+    def validators(self) -> Dict[str, Optional[str]]:
+        """条件请求所需的校验信息"""
+        headers = {name.lower(): value for name, value in self.response_headers.items()}
+        return {
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "body_hash": self.body_hash,
+        }
+
+
+class HttpFetchError(Exception):
+    """HTTP抓取失败或响应不是HTML页面"""
+
+
+class HttpFetcher:
+    """
+    HTTP抓取引擎
+
+    所有请求共享一个连接池：连接保持复用，DNS解析结果缓存，响应自动解压。
+    会话在第一次抓取时创建，必须在事件循环中使用。
+    """
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT, max_connections: int = HTTP_MAX_CONNECTIONS,
+                 max_per_host: int = HTTP_MAX_PER_HOST, dns_ttl: int = HTTP_DNS_TTL,
+                 max_bytes: int = HTTP_MAX_BYTES):
+        """
+        Args:
+            timeout: 单次请求的总超时（秒）
+            max_connections: 连接池的最大连接数
+            max_per_host: 单个主机的最大连接数
+            dns_ttl: DNS解析结果的缓存时间（秒）
+            max_bytes: 响应体的最大字节数，超过时视为失败
+        """
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.dns_ttl = dns_ttl
+        self.max_bytes = max_bytes
+        self._session = None
+        self.fetches = 0
+        self.fallbacks = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.bytes_in = 0
+
+    @property
+    def available(self) -> bool:
+        """是否安装了HTTP客户端"""
+        return aiohttp is not None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                use_dns_cache=True,
+                keepalive_timeout=30,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    "User-Agent": USER_AGENT,
+                    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+                    "Accept-Encoding": ACCEPT_ENCODING,
+                },
+            )
+        return self._session
+
+    async def fetch(self, url: str, etag: Optional[str] = None,
+                    last_modified: Optional[str] = None,
+                    include_images: bool = True) -> Optional[HttpResult]:
+        """
+        抓取页面并转换为Markdown
+
+        Args:
+            url: 页面URL
+            etag: 上次响应的ETag，指定后发送If-None-Match条件请求
+            last_modified: 上次响应的Last-Modified，指定后发送If-Modified-Since条件请求
+            include_images: Markdown中是否保留图像
+
+        Returns:
+            抓取结果，needs_browser表示页面是否需要浏览器渲染；条件请求返回304时为None
+
+        Raises:
+            HttpFetchError: 请求失败、状态码不是2xx、响应不是HTML或过大
+        """
+        start_time = time.perf_counter()
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        try:
+            async with self._get_session().get(url, allow_redirects=True, headers=headers) as response:
+                if response.status == 304:
+                    self.not_modified += 1
+                    return None
+                if response.status >= 400:
+                    raise HttpFetchError(f"HTTP {response.status}")
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if content_type and content_type not in _HTML_TYPES:
+                    raise HttpFetchError(f"不是HTML页面: {content_type}")
+                if (response.content_length or 0) > self.max_bytes:
+                    raise HttpFetchError(f"响应过大: {response.content_length} 字节")
+                body = await response.content.read(self.max_bytes + 1)
+                if len(body) > self.max_bytes:
+                    raise HttpFetchError(f"响应超过 {self.max_bytes} 字节")
+                final_url = str(response.url)
+                status = response.status
+                headers = dict(response.headers)
+                charset = response.charset or "utf-8"
+        except HttpFetchError:
+            self.errors += 1
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            raise HttpFetchError(str(e) or type(e).__name__) from None
+
+        self.fetches += 1
+        self.bytes_in += len(body)
+        try:
+            html = body.decode(charset, errors="replace")
+        except LookupError:
+            html = body.decode("utf-8", errors="replace")
+        page = await conversion_pool().run(len(body), convert_html, final_url, html,
+                                               include_images)
+        crawl_time_ms = round((time.perf_counter() - start_time) * 1000, 3)
+        return HttpResult(final_url, status, headers, html, page, crawl_time_ms)
+
+    async def fetch_raw(self, url: str) -> Tuple[int, bytes]:
+        """
+        抓取任意资源的原始响应体，例如robots.txt和sitemap
+
+        Args:
+            url: 资源URL
+
+        Returns:
+            (状态码, 响应体)，状态码不是2xx时响应体为空
+
+        Raises:
+            HttpFetchError: 请求失败或响应过大
+        """
+        try:
+            async with self._get_session().get(url, allow_redirects=True) as response:
+                if response.status >= 300:
+                    return response.status, b""
+                body = await response.content.read(self.max_bytes + 1)
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            raise HttpFetchError(str(e) or type(e).__name__) from None
+        if len(body) > self.max_bytes:
+            raise HttpFetchError(f"响应超过 {self.max_bytes} 字节")
+        self.fetches += 1
+        self.bytes_in += len(body)
+        return status, body
+
+    async def close(self):
+        """关闭连接池"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> Dict[str, Any]:
+        """返回HTTP引擎统计信息"""
+        return {
+            "available": self.available,
+            "fetches": self.fetches,
+            "fallbacks": self.fallbacks,
+            "not_modified": self.not_modified,
+            "errors": self.errors,
+            "bytes_in": self.bytes_in,
+        }
@@ -0,0 +1,217 @@
+"""
+Crawl4AI MCP服务器的日志工具。
+日志记录在事件循环中只入队，由后台线程格式化并写入stderr；请求参数按需截断和脱敏，
+高频消息按类型采样，每条记录都带有所属请求的关联ID。
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+# 当前正在处理的请求的关联ID，由请求分发时设置，派生的任务自动继承
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default="-")
+
+# 日志格式：text为普通文本，json为每行一个JSON对象
+LOG_FORMAT = os.environ.get("CRAWL4AI_MCP_LOG_FORMAT", "text").lower()
+
+# 单个日志参数的最大字符数
+LOG_MAX_ARG_CHARS = int(os.environ.get("CRAWL4AI_MCP_LOG_MAX_ARG_CHARS", "500"))
+
+# 高频消息的采样间隔，格式为"类型=N,..."，表示每N条只记录1条
+LOG_SAMPLE = os.environ.get(
+    "CRAWL4AI_MCP_LOG_SAMPLE", "tools/list=10,ping=10,notifications/initialized=10")
+
+# 值需要脱敏的参数名（小写子串匹配）
+REDACT_KEYS = ("authorization", "cookie", "password", "passwd", "secret", "token", "api_key", "apikey")
+
+# 递归截断时每层最多保留的元素数
+_MAX_ITEMS = 20
+_MAX_DEPTH = 4
+
+
+def _is_sensitive(key: Any) -> bool:
+    """判断参数名是否需要脱敏"""
+    lowered = str(key).lower()
+    if lowered == "progresstoken":
+        return False
+    return any(word in lowered for word in REDACT_KEYS)
+
+
+def _shrink(value: Any, limit: int, depth: int = 0) -> Any:
+    """递归截断长字符串和大容器，并把敏感字段替换为***"""
+    if isinstance(value, str):
+        return value if len(value) <= limit else f"{value[:limit]}...(共{len(value)}字符)"
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)}字节>"
+    if depth >= _MAX_DEPTH and isinstance(value, (dict, list, tuple)):
+        return f"<{type(value).__name__}，{len(value)}项>"
+    if isinstance(value, dict):
+        shrunk = {}
+        for i, (key, item) in enumerate(value.items()):
+            if i >= _MAX_ITEMS:
+                shrunk["..."] = f"另有{len(value) - _MAX_ITEMS}项"
+                break
+            shrunk[key] = "***" if _is_sensitive(key) else _shrink(item, limit, depth + 1)
+        return shrunk
+    if isinstance(value, (list, tuple)):
+        shrunk = [_shrink(item, limit, depth + 1) for item in value[:_MAX_ITEMS]]
+        if len(value) > _MAX_ITEMS:
+            shrunk.append(f"...另有{len(value) - _MAX_ITEMS}项")
+        return shrunk
+    return value
+
+
+class LogSummary:
+    """
+    日志参数的惰性摘要
+
+    只有日志真正输出时才在后台线程中截断、脱敏并转为字符串，被级别或采样过滤掉的记录不产生任何开销。
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: Optional[int] = None):
+        self.value = value
+        self.limit = LOG_MAX_ARG_CHARS if limit is None else limit
+
+    def shrunk(self) -> Any:
+        """返回截断和脱敏后的值"""
+        return _shrink(self.value, self.limit)
+
+    def __str__(self) -> str:
+        text = str(self.shrunk())
+        return text if len(text) <= self.limit * 2 else text[:self.limit * 2] + "..."
+
+
+def summarize(value: Any, limit: Optional[int] = None) -> LogSummary:
+    """
+    包装日志参数，输出时截断和脱敏
+
+    Args:
+        value: 要记录的值，例如请求或工具参数
+        limit: 单个字符串保留的最大字符数，为空时使用LOG_MAX_ARG_CHARS
+
+    Returns:
+        惰性摘要对象，作为%s参数传给日志记录器
+    """
+    return LogSummary(value, limit)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, int]:
+    """
+    解析采样配置
+
+    Args:
+        spec: "类型=N,..."格式的字符串
+
+    Returns:
+        类型到采样间隔的映射
+    """
+    rates = {}
+    for part in spec.split(","):
+        key, _, every = part.strip().partition("=")
+        if key and every.strip().isdigit() and int(every) > 1:
+            rates[key] = int(every)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """按记录的sample_key采样，每N条只放行1条，并在放行的记录上标注采样间隔"""
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self._counts: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample_key", None)
+        every = self.rates.get(key) if key else None
+        if not every:
+            return True
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count % every:
+            return False
+        record.sampled = every
+        return True
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    只在调用线程中补充关联ID，格式化留给后台线程
+
+    默认的QueueHandler会在入队前格式化消息，这里保留原始参数，使summarize等惰性参数在后台线程求值。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """把日志记录格式化为单行JSON"""
+
+    # 通过extra传入、需要输出的结构化字段
+    EXTRA_FIELDS = ("request_id", "method", "tool", "duration_ms", "sampled")
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created))
+                  + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in self.EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """在原有文本格式中加入关联ID"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = "-"
+        return super().format(record)
+
+
+def install_queue_logging(logger_name: str) -> QueueListener:
+    """
+    把根记录器的处理器移到后台线程，并为指定记录器启用采样
+
+    Args:
+        logger_name: 需要采样的记录器名称
+
+    Returns:
+        已启动的QueueListener，进程退出时自动停止并写出剩余日志
+    """
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else TextFormatter()
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        root.removeHandler(handler)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root.addHandler(ContextQueueHandler(log_queue))
+
+    logging.getLogger(logger_name).addFilter(SamplingFilter(parse_sample_rates(LOG_SAMPLE)))
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,218 @@
+"""
+Crawl4AI MCP服务器的运行指标。
+按工具统计调用延迟分布和错误，记录排队/执行中的调用数和标准输入输出流量，
+可通过server/metrics方法查询，也可以定期写成Prometheus文本文件。
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from crawl4ai_mcp_files import atomic_write
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+# 延迟直方图的桶上界（毫秒）
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000,
+                      10000, 30000, 60000, 120000, 300000)
+
+# 以下字段在Prometheus输出中作为计数器，其余数值作为仪表
+COUNTER_KEYS = {"hits", "misses", "disk_hits", "leaders", "coalesced", "recycled",
+                "bytes_in", "bytes_out", "messages_in", "writes", "rejected_messages",
+                "inline", "offloaded", "restarts", "fetches", "fallbacks", "errors",
+                "not_modified", "reads", "sitemap_files"}
+
+
+class LatencyHistogram:
+    """固定桶的延迟直方图，分位数在桶内线性插值估算"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        # 最后一个位置统计超过最大桶上界的样本
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float):
+        """记录一次耗时"""
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def quantile(self, q: float) -> float:
+        """
+        估算分位数
+
+        Args:
+            q: 分位点，0到1之间
+
+        Returns:
+            估算的耗时（毫秒），没有样本时为0
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.max_ms
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = min(self.buckets[i], self.max_ms)
+                fraction = (rank - cumulative) / bucket_count
+                return lower + (max(upper, lower) - lower) * fraction
+            cumulative += bucket_count
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回汇总统计"""
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.50), 2),
+            "p95_ms": round(self.quantile(0.95), 2),
+            "p99_ms": round(self.quantile(0.99), 2),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+class ServerMetrics:
+    """服务器自身的调用和流量指标"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.tool_latency: Dict[str, LatencyHistogram] = {}
+        self.tool_errors: Dict[str, int] = {}
+        self.errors_by_type: Dict[str, int] = {}
+        self.queued = 0
+        self.in_flight = 0
+        self.bytes_in = 0
+        self.messages_in = 0
+        self.rejected_messages = 0
+
+    @contextmanager
+    def queued_call(self) -> Iterator[None]:
+        """统计等待执行（背压或并发限制）的调用"""
+        self.queued += 1
+        try:
+            yield
+        finally:
+            self.queued -= 1
+
+    @contextmanager
+    def running_call(self) -> Iterator[None]:
+        """统计正在执行的调用"""
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def observe_call(self, tool: str, duration_ms: float, error_type: Optional[str] = None):
+        """
+        记录一次工具调用
+
+        Args:
+            tool: 工具名称
+            duration_ms: 从收到调用到结束的耗时（毫秒）
+            error_type: 失败时的错误类型，成功时为空
+        """
+        histogram = self.tool_latency.get(tool)
+        if histogram is None:
+            histogram = self.tool_latency[tool] = LatencyHistogram()
+        histogram.observe(duration_ms)
+        if error_type:
+            self.tool_errors[tool] = self.tool_errors.get(tool, 0) + 1
+            self.errors_by_type[error_type] = self.errors_by_type.get(error_type, 0) + 1
+
+    def observe_message(self, size: int):
+        """记录一条从标准输入读取的消息"""
+        self.messages_in += 1
+        self.bytes_in += size
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回可直接序列化的指标快照"""
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "requests": {"queued": self.queued, "in_flight": self.in_flight},
+            "tools": {
+                name: {**histogram.snapshot(), "errors": self.tool_errors.get(name, 0)}
+                for name, histogram in self.tool_latency.items()
+            },
+            "errors_by_type": dict(self.errors_by_type),
+        }
+
+    def render_prometheus(self, sources: Dict[str, Dict[str, Any]]) -> str:
+        """
+        生成Prometheus文本格式的指标
+
+        Args:
+            sources: 其他组件的统计信息，例如{"cache": {...}, "pool": {...}}，其中的数值字段按原名导出
+
+        Returns:
+            Prometheus文本格式字符串
+        """
+        lines = [
+            "# TYPE crawl4ai_mcp_uptime_seconds gauge",
+            f"crawl4ai_mcp_uptime_seconds {time.time() - self.started_at:.1f}",
+            "# TYPE crawl4ai_mcp_requests_queued gauge",
+            f"crawl4ai_mcp_requests_queued {self.queued}",
+            "# TYPE crawl4ai_mcp_requests_in_flight gauge",
+            f"crawl4ai_mcp_requests_in_flight {self.in_flight}",
+            "# TYPE crawl4ai_mcp_tool_latency_ms histogram",
+        ]
+        for name, histogram in self.tool_latency.items():
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'crawl4ai_mcp_tool_latency_ms_bucket{{tool="{name}",le="{bound}"}} {cumulative}')
+            lines.append(
+                f'crawl4ai_mcp_tool_latency_ms_bucket{{tool="{name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'crawl4ai_mcp_tool_latency_ms_sum{{tool="{name}"}} {histogram.sum_ms:.3f}')
+            lines.append(f'crawl4ai_mcp_tool_latency_ms_count{{tool="{name}"}} {histogram.count}')
+        lines.append("# TYPE crawl4ai_mcp_errors_total counter")
+        for error_type, count in self.errors_by_type.items():
+            lines.append(f'crawl4ai_mcp_errors_total{{error_type="{error_type}"}} {count}')
+
+        for source, stats in sources.items():
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                kind = "counter" if key in COUNTER_KEYS else "gauge"
+                metric = f"crawl4ai_mcp_{source}_{key}" + ("_total" if kind == "counter" else "")
+                lines.append(f"# TYPE {metric} {kind}")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: str, content: str):
+    """通过临时文件原子写入，避免采集端读到写了一半的文件"""
+    atomic_write(path, content.encode("utf-8"))
+
+
+async def run_textfile_exporter(path: str, interval: float, render: Callable[[], str]):
+    """
+    定期把指标写入Prometheus文本文件（供node_exporter的textfile收集器读取）
+
+    Args:
+        path: 输出文件路径
+        interval: 写入间隔（秒）
+        render: 生成文本内容的函数
+    """
+    logger.info(f"定期写出Prometheus指标: {path}（每{interval}秒）")
+    while True:
+        try:
+            await asyncio.to_thread(write_textfile, path, render())
+        except OSError as e:
+            logger.warning(f"写出指标文件失败: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,326 @@
+"""
+Crawl4AI MCP服务器的浏览器池。
+由服务器持有一组预热的AsyncWebCrawler实例，供所有工具共享，避免每次调用都重新启动浏览器。
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:  # psutil为可选依赖，缺失时不做RSS回收
+    psutil = None
+
+from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+
+def default_browser_config() -> BrowserConfig:
+    """返回与工具实现一致的浏览器配置"""
+    return BrowserConfig(
+        headless=True,
+        viewport_width=1920,
+        viewport_height=1080,
+        browser_args=["--disable-web-security",
+                      "--disable-features=IsolateOrigins,site-per-process"]
+    )
+
+
+class PooledCrawler:
+    """池中的单个爬虫实例及其使用统计"""
+
+    def __init__(self, crawler: AsyncWebCrawler):
+        self.crawler = crawler
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.pages_served = 0
+        # 启动时派生的浏览器进程（playwright驱动及其子进程树的根），用于按实例统计RSS
+        self.browser_pids: List[int] = []
+        self.rss_checked_at = self.created_at
+
+
+class CrawlerPool:
+    """
+    预热的爬虫实例池
+
+    支持最小/最大实例数、空闲淘汰，以及在服务页面数或浏览器RSS超过阈值后回收实例。
+    """
+
+    def __init__(self,
+                 min_size: int = 1,
+                 max_size: int = 4,
+                 idle_timeout: float = 300.0,
+                 max_pages_per_crawler: int = 100,
+                 max_rss_mb: int = 2048,
+                 rss_check_interval: float = 30.0,
+                 browser_config_factory: Callable[[], BrowserConfig] = default_browser_config):
+        """
+        Args:
+            min_size: 常驻的最少实例数
+            max_size: 同时存在的最多实例数
+            idle_timeout: 超过最少实例数的空闲实例在多少秒后被关闭
+            max_pages_per_crawler: 单个实例服务多少个页面后回收，0表示不限制
+            max_rss_mb: 实例自身的浏览器进程树RSS超过该值（MB）时回收归还的实例，0表示不检查
+            rss_check_interval: 同一实例两次RSS检查的最小间隔（秒）
+            browser_config_factory: 创建浏览器配置的函数
+        """
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.idle_timeout = idle_timeout
+        self.max_pages_per_crawler = max_pages_per_crawler
+        self.max_rss_mb = max_rss_mb
+        self.rss_check_interval = rss_check_interval
+        self.browser_config_factory = browser_config_factory
+
+        self._idle: List[PooledCrawler] = []
+        self._size = 0
+        self._in_use = 0
+        self._recycled = 0
+        self._condition = asyncio.Condition()
+        self._started = False
+        self._closed = False
+        self._evict_task: Optional[asyncio.Task] = None
+        # 按RSS回收时串行启动实例，以便把新出现的子进程归到对应实例
+        self._start_lock = asyncio.Lock()
+
+        if self.max_rss_mb and psutil is None:
+            logger.warning("未安装psutil，浏览器池不会按RSS回收实例")
+
+    async def start(self):
+        """预热最少数量的实例并启动空闲淘汰任务，可重复调用"""
+        if self._started or self._closed:
+            return
+        self._started = True
+        logger.info(f"启动浏览器池: min={self.min_size}, max={self.max_size}")
+
+        for _ in range(self.min_size):
+            async with self._condition:
+                if self._size >= self.max_size:
+                    break
+                self._size += 1
+            try:
+                pooled = await self._create()
+            except BaseException as e:
+                async with self._condition:
+                    self._size -= 1
+                if not isinstance(e, Exception):
+                    raise
+                logger.error(f"预热浏览器实例失败: {e}")
+                break
+            async with self._condition:
+                self._idle.append(pooled)
+                self._condition.notify()
+
+        self._evict_task = asyncio.create_task(self._evict_idle_loop())
+
+    async def close(self):
+        """关闭所有实例，可重复调用"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._evict_task:
+            self._evict_task.cancel()
+
+        async with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        await asyncio.gather(*(self._destroy(p) for p in idle),
+                             return_exceptions=True)
+        logger.info("浏览器池已关闭")
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        租用一个爬虫实例，退出上下文时自动归还
+
+        Yields:
+            已启动的AsyncWebCrawler
+        """
+        pooled = await self.acquire()
+        try:
+            yield pooled.crawler
+        except asyncio.CancelledError:
+            # 被取消的抓取不影响浏览器本身，正常归还
+            await self.release(pooled)
+            raise
+        except BaseException:
+            # 出错的实例状态不可信，直接回收
+            await self.release(pooled, discard=True)
+            raise
+        else:
+            await self.release(pooled)
+
+    async def acquire(self) -> PooledCrawler:
+        """获取一个空闲实例，必要时创建新实例或等待归还"""
+        if not self._started:
+            await self.start()
+
+        async with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("浏览器池已关闭")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    self._in_use += 1
+                    return pooled
+                if self._size < self.max_size:
+                    self._size += 1
+                    self._in_use += 1
+                    break
+                await self._condition.wait()
+
+        try:
+            return await self._create()
+        except BaseException:
+            async with self._condition:
+                self._size -= 1
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+
+    async def release(self, pooled: PooledCrawler, discard: bool = False):
+        """
+        归还实例，超过页面数或RSS阈值的实例会被回收
+
+        Args:
+            pooled: 要归还的实例
+            discard: 是否直接回收
+        """
+        pooled.pages_served += 1
+        pooled.last_used = time.monotonic()
+
+        recycle = discard or self._closed or await self._should_recycle(pooled)
+        async with self._condition:
+            self._in_use -= 1
+            if recycle:
+                self._size -= 1
+            else:
+                self._idle.append(pooled)
+            self._condition.notify()
+
+        if recycle:
+            self._recycled += 1
+            await self._destroy(pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回浏览器池的使用情况"""
+        return {
+            "size": self._size,
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "recycled": self._recycled,
+        }
+
+    async def _should_recycle(self, pooled: PooledCrawler) -> bool:
+        """
+        判断实例是否需要回收
+
+        RSS只统计该实例自己的浏览器进程树，每个实例最多每rss_check_interval秒检查一次，
+        遍历进程在线程中执行，不阻塞事件循环。
+        """
+        if self.max_pages_per_crawler and pooled.pages_served >= self.max_pages_per_crawler:
+            logger.info(f"浏览器实例已服务 {pooled.pages_served} 个页面，回收")
+            return True
+        if not (self.max_rss_mb and pooled.browser_pids):
+            return False
+        now = time.monotonic()
+        if now - pooled.rss_checked_at < self.rss_check_interval:
+            return False
+        pooled.rss_checked_at = now
+        rss_mb = await asyncio.to_thread(browser_rss_mb, pooled.browser_pids)
+        if rss_mb > self.max_rss_mb:
+            logger.info(f"浏览器进程RSS {rss_mb:.0f}MB 超过阈值，回收实例")
+            return True
+        return False
+
+    async def _create(self) -> PooledCrawler:
+        """创建并启动一个新实例"""
+        crawler = AsyncWebCrawler(config=self.browser_config_factory())
+        if not self.max_rss_mb or psutil is None:
+            await crawler.start()
+            return PooledCrawler(crawler)
+
+        # 启动前后对比当前进程的直接子进程，新出现的就是该实例的浏览器进程
+        async with self._start_lock:
+            before = set(child_pids())
+            await crawler.start()
+            pooled = PooledCrawler(crawler)
+            pooled.browser_pids = [pid for pid in child_pids() if pid not in before]
+        return pooled
+
+    async def _destroy(self, pooled: PooledCrawler):
+        """关闭实例，忽略关闭过程中的错误"""
+        try:
+            await pooled.crawler.close()
+        except Exception as e:
+            logger.warning(f"关闭浏览器实例时出错: {e}")
+
+    async def _evict_idle_loop(self):
+        """定期关闭超过最少实例数且空闲过久的实例"""
+        interval = max(1.0, self.idle_timeout / 2)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            evicted = []
+            async with self._condition:
+                for pooled in list(self._idle):
+                    if self._size <= self.min_size:
+                        break
+                    if now - pooled.last_used >= self.idle_timeout:
+                        self._idle.remove(pooled)
+                        self._size -= 1
+                        evicted.append(pooled)
+            for pooled in evicted:
+                logger.info("关闭空闲的浏览器实例")
+                await self._destroy(pooled)
+
+
+def child_pids() -> List[int]:
+    """
+    返回当前进程的直接子进程PID
+
+    不包括multiprocessing派生的进程（页面处理进程池和forkserver）。
+    """
+    if psutil is None:
+        return []
+    pids = []
+    for child in psutil.Process(os.getpid()).children():
+        try:
+            if any("multiprocessing" in arg for arg in child.cmdline()):
+                continue
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        pids.append(child.pid)
+    return pids
+
+
+def browser_rss_mb(pids: List[int]) -> float:
+    """
+    返回给定进程及其所有子进程的RSS总和，单位MB
+
+    Args:
+        pids: 浏览器进程树的根进程PID
+    """
+    if psutil is None:
+        return 0.0
+    total = 0
+    for pid in pids:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+    return total / (1024 * 1024)
@@ -0,0 +1,186 @@
+"""
+Crawl4AI MCP服务器的大结果存储。
+过大的工具结果按内容寻址保存在服务器端，响应只返回句柄、大小和第一块，客户端按游标分块读取其余部分。
+"""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+
+class ResultNotFound(Exception):
+    """句柄不存在或已过期"""
+
+
+class StoredResult:
+    """结果存储中的一个条目"""
+
+    __slots__ = ("data", "expires_at")
+
+    def __init__(self, data: bytes, expires_at: float):
+        self.data = data
+        self.expires_at = expires_at
+
+
+def utf8_boundary(data: bytes, end: int) -> int:
+    """把切分位置向前调整到UTF-8字符边界，保证每块都能独立解码"""
+    if end >= len(data):
+        return len(data)
+    while end > 0 and (data[end] & 0xC0) == 0x80:
+        end -= 1
+    return end
+
+
+class ResultStore:
+    """
+    内容寻址的结果存储
+
+    句柄是结果字节的SHA-256摘要，相同的结果只保存一份；按字节预算以LRU淘汰，每个条目在TTL后过期。
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: float = 600.0):
+        """
+        Args:
+            max_bytes: 存储的字节预算
+            ttl: 条目的有效期（秒），每次读取都会续期
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, StoredResult]" = OrderedDict()
+        self._bytes = 0
+        self.stored = 0
+        self.chunks_served = 0
+        self.expired = 0
+
+    def put(self, data: bytes) -> str:
+        """
+        保存结果
+
+        Args:
+            data: 已编码的结果字节
+
+        Returns:
+            结果句柄
+
+        Raises:
+            ValueError: 结果超过存储的字节预算
+        """
+        if len(data) > self.max_bytes:
+            raise ValueError(f"结果大小 {len(data)} 字节超过结果存储容量 {self.max_bytes} 字节")
+        self._prune()
+        handle = hashlib.sha256(data).hexdigest()
+        expires_at = time.time() + self.ttl
+        entry = self._entries.get(handle)
+        if entry is not None:
+            entry.expires_at = expires_at
+            self._entries.move_to_end(handle)
+            return handle
+
+        self._entries[handle] = StoredResult(data, expires_at)
+        self._bytes += len(data)
+        self.stored += 1
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+        return handle
+
+    def read(self, handle: str, cursor: int = 0, max_bytes: int = 1024 * 1024) -> Dict[str, Any]:
+        """
+        从游标位置读取一块
+
+        Args:
+            handle: 结果句柄
+            cursor: 起始字节偏移，由上一次读取的next_cursor给出
+            max_bytes: 本块的最大字节数
+
+        Returns:
+            包含data、next_cursor（读完时为None）和大小信息的字典
+
+        Raises:
+            ResultNotFound: 句柄不存在或已过期
+            ValueError: 游标超出范围
+        """
+        self._prune()
+        entry = self._entries.get(handle)
+        if entry is None:
+            raise ResultNotFound(f"结果不存在或已过期: {handle}")
+        data = entry.data
+        if cursor < 0 or cursor > len(data):
+            raise ValueError(f"无效的游标: {cursor}")
+
+        end = utf8_boundary(data, cursor + max(4, max_bytes))
+        entry.expires_at = time.time() + self.ttl
+        self._entries.move_to_end(handle)
+        self.chunks_served += 1
+        return {
+            "handle": handle,
+            "cursor": cursor,
+            "next_cursor": end if end < len(data) else None,
+            "total_bytes": len(data),
+            "data": data[cursor:end].decode("utf-8"),
+            "expires_at": entry.expires_at,
+        }
+
+    def release(self, handle: str) -> bool:
+        """
+        提前删除结果
+
+        Args:
+            handle: 结果句柄
+
+        Returns:
+            结果是否存在
+        """
+        if handle not in self._entries:
+            return False
+        self._remove(handle)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """返回存储的使用情况"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "stored": self.stored,
+            "chunks_served": self.chunks_served,
+            "expired": self.expired,
+        }
+
+    def _remove(self, handle: str):
+        entry = self._entries.pop(handle)
+        self._bytes -= len(entry.data)
+
+    def _prune(self):
+        """删除已过期的条目"""
+        now = time.time()
+        for handle in [h for h, e in self._entries.items() if e.expires_at <= now]:
+            self._remove(handle)
+            self.expired += 1
+
+
+def paginate_result(store: ResultStore, data: bytes, chunk_bytes: int) -> Dict[str, Any]:
+    """
+    把编码后的结果存入存储，返回句柄和第一块
+
+    Args:
+        store: 结果存储
+        data: 已编码的结果字节
+        chunk_bytes: 每块的最大字节数
+
+    Returns:
+        分页结果的描述
+    """
+    handle = store.put(data)
+    first = store.read(handle, 0, chunk_bytes)
+    logger.info(f"结果 {len(data)} 字节存入结果存储: {handle}")
+    return {
+        "paginated": True,
+        "content_type": "application/json",
+        "chunk_bytes": chunk_bytes,
+        **first,
+    }
@@ -5,21 +5,17 @@ Main server implementation for Crawl4AI MCP Server.
 
 from crawl4ai_mcp.utils import (
     setup_logging,
-    crawl_webpage_impl,
-    crawl_website_impl,
-    extract_structured_data_impl,
-    save_as_markdown_impl,
     check_virtual_env
 )
-import json
 import logging
 import os
 import sys
 import asyncio
+import contextvars
+import time
 import traceback
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Union, Tuple
-from enum import Enum, auto
+from typing import Dict, Any, List, Optional, Union, Tuple, Callable, Awaitable, Literal
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
@@ -36,17 +32,22 @@ from mcp.types import (
 from mcp.shared.exceptions import McpError
 from pydantic import BaseModel, Field
 
-# 添加CacheMode枚举类定义，解决"type object 'CacheMode' has no attribute 'DEFAULT'"错误
-
-
-class CacheMode(Enum):
-    DEFAULT = auto()
-    BYPASS = auto()
-    FORCE = auto()
-
-
-# 设置日志记录器 - 确保所有日志输出到stderr
-logger = setup_logging("crawl4ai_mcp")
+import crawl4ai_mcp_crawler as crawler
+from crawl4ai_mcp_archive import ARCHIVE_MODES, ArchivingCrawlerPool, FetchArchive
+from crawl4ai_mcp_cache import CacheMode, ResultCache, SingleFlight
+from crawl4ai_mcp_codec import JSON_BACKEND, RawJSON, decode_json, encode_json
+from crawl4ai_mcp_convert import close_conversion_pool, conversion_pool
+from crawl4ai_mcp_extract import SchemaCache
+from crawl4ai_mcp_http import HttpFetcher
+from crawl4ai_mcp_logging import install_queue_logging, request_id_var, summarize
+from crawl4ai_mcp_metrics import ServerMetrics, run_textfile_exporter
+from crawl4ai_mcp_pool import CrawlerPool
+from crawl4ai_mcp_results import ResultNotFound, ResultStore, paginate_result
+from crawl4ai_mcp_sitemap import HostCache
+from crawl4ai_mcp_state import CrawlStateStore
+
+# 日志记录器，输出目标由init_runtime()中的setup_logging配置
+logger = logging.getLogger("crawl4ai_mcp")
 
 # 服务器版本和协议版本
 SERVER_VERSION = "0.1.0"
@@ -55,46 +56,344 @@ PROTOCOL_VERSION = "0.1.0"
 # 请求ID计数器（处理旧版请求时使用）
 request_id_counter = 1
 
+# 同时执行的工具调用数量上限，可通过环境变量配置
+MAX_CONCURRENT_REQUESTS = int(
+    os.environ.get("CRAWL4AI_MCP_MAX_CONCURRENCY", "8"))
+
+# 单条JSON-RPC消息的最大字节数，超出的消息会被丢弃并返回错误
+MAX_MESSAGE_BYTES = int(
+    os.environ.get("CRAWL4AI_MCP_MAX_MESSAGE_BYTES", str(16 * 1024 * 1024)))
+
+# 输出队列积压字节数的高水位，超过后新的工具调用会等待输出排空
+OUTPUT_HIGH_WATER_BYTES = int(
+    os.environ.get("CRAWL4AI_MCP_OUTPUT_HIGH_WATER", str(8 * 1024 * 1024)))
+
+# 浏览器池配置
+POOL_MIN_SIZE = int(os.environ.get("CRAWL4AI_MCP_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.environ.get("CRAWL4AI_MCP_POOL_MAX", "4"))
+POOL_IDLE_SECONDS = float(os.environ.get("CRAWL4AI_MCP_POOL_IDLE_SECONDS", "300"))
+POOL_MAX_PAGES = int(os.environ.get("CRAWL4AI_MCP_POOL_MAX_PAGES", "100"))
+POOL_MAX_RSS_MB = int(os.environ.get("CRAWL4AI_MCP_POOL_MAX_RSS_MB", "2048"))
+POOL_RSS_CHECK_SECONDS = float(os.environ.get("CRAWL4AI_MCP_POOL_RSS_CHECK_SECONDS", "30"))
+
+# 抓取存档：record把每次抓取写入CRAWL4AI_MCP_ARCHIVE_DIR，replay只从存档读取、不访问网络
+ARCHIVE_MODE = os.environ.get("CRAWL4AI_MCP_ARCHIVE_MODE", "off").lower()
+ARCHIVE_DIR = os.environ.get("CRAWL4AI_MCP_ARCHIVE_DIR", "crawl4ai_archive")
+
+POOL_OPTIONS = dict(
+    min_size=POOL_MIN_SIZE,
+    max_size=POOL_MAX_SIZE,
+    idle_timeout=POOL_IDLE_SECONDS,
+    max_pages_per_crawler=POOL_MAX_PAGES,
+    max_rss_mb=POOL_MAX_RSS_MB,
+    rss_check_interval=POOL_RSS_CHECK_SECONDS,
+)
+
+
+# 结果缓存配置，设置CRAWL4AI_MCP_CACHE_DIR后启用磁盘层
+CACHE_MEMORY_MB = int(os.environ.get("CRAWL4AI_MCP_CACHE_MEMORY_MB", "64"))
+CACHE_TTL_SECONDS = float(os.environ.get("CRAWL4AI_MCP_CACHE_TTL", "3600"))
+CACHE_DIR = os.environ.get("CRAWL4AI_MCP_CACHE_DIR") or None
+
+# 合并相同URL和选项的并发抓取
+fetch_flights = SingleFlight()
+
+# 增量爬取状态目录，保存每个URL的ETag、Last-Modified、内容摘要和上次的内容
+CRAWL_STATE_DIR = os.environ.get("CRAWL4AI_MCP_STATE_DIR", "crawl4ai_state")
+
+# 大结果存储的字节预算和条目有效期（秒）
+RESULT_STORE_MB = int(os.environ.get("CRAWL4AI_MCP_RESULT_STORE_MB", "256"))
+RESULT_STORE_TTL = float(os.environ.get("CRAWL4AI_MCP_RESULT_STORE_TTL", "600"))
+
+# results/read未指定max_bytes时每块的字节数
+DEFAULT_RESULT_CHUNK_BYTES = int(os.environ.get("CRAWL4AI_MCP_RESULT_CHUNK_BYTES", str(1024 * 1024)))
+
+# 分页返回的大结果，按句柄和游标读取
+result_store = ResultStore(max_bytes=RESULT_STORE_MB * 1024 * 1024, ttl=RESULT_STORE_TTL)
+
+# 结构化提取的编译计划缓存容量（schema数）
+SCHEMA_CACHE_SIZE = int(os.environ.get("CRAWL4AI_MCP_SCHEMA_CACHE_SIZE", "128"))
+
+# 按schema摘要缓存的编译计划
+schema_cache = SchemaCache(SCHEMA_CACHE_SIZE)
+
+# 工具调用的默认截止时间（秒），0表示不限制；单次调用可通过timeout参数覆盖
+DEFAULT_TOOL_TIMEOUT = float(os.environ.get("CRAWL4AI_MCP_DEFAULT_TIMEOUT", "300"))
+
+# 工具调用并发控制信号量
+request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+# Prometheus文本文件的输出路径（为空时不输出）和写入间隔（秒）
+METRICS_FILE = os.environ.get("CRAWL4AI_MCP_METRICS_FILE") or None
+METRICS_INTERVAL = float(os.environ.get("CRAWL4AI_MCP_METRICS_INTERVAL", "15"))
+
+# 以下运行时对象由init_runtime()创建。处理进程池的worker会把本脚本作为__mp_main__重新导入，
+# 导入时只定义函数和配置，不启动线程、不创建目录
+# 服务器持有的浏览器池，所有工具共享
+crawler_pool: Optional[CrawlerPool] = None
+# 爬取结果缓存
+result_cache: Optional[ResultCache] = None
+# 静态页面使用的HTTP抓取引擎；存档模式下所有抓取都经过浏览器池，以便录制和回放
+http_fetcher: Optional[HttpFetcher] = None
+# 按主机缓存的robots.txt规则和sitemap，通过HTTP引擎抓取
+host_cache: Optional[HostCache] = None
+# crawl_website增量爬取使用的状态存储
+crawl_state: Optional[CrawlStateStore] = None
+# 服务器运行指标
+metrics: Optional[ServerMetrics] = None
+
+
+def init_runtime():
+    """配置日志并创建服务器持有的运行时对象，由main()在启动时调用一次"""
+    global ARCHIVE_MODE, crawler_pool, result_cache, http_fetcher, host_cache, crawl_state, metrics
+
+    # 设置日志记录器 - 确保所有日志输出到stderr
+    setup_logging("crawl4ai_mcp")
+    # 日志在后台线程中格式化和写出，不阻塞事件循环
+    install_queue_logging("crawl4ai_mcp")
+
+    if ARCHIVE_MODE not in ARCHIVE_MODES:
+        logger.warning(f"未知的存档模式 {ARCHIVE_MODE}，不使用存档")
+        ARCHIVE_MODE = "off"
+    if ARCHIVE_MODE == "off":
+        crawler_pool = CrawlerPool(**POOL_OPTIONS)
+    else:
+        crawler_pool = ArchivingCrawlerPool(FetchArchive(ARCHIVE_DIR), ARCHIVE_MODE, **POOL_OPTIONS)
+
+    result_cache = ResultCache(
+        max_memory_bytes=CACHE_MEMORY_MB * 1024 * 1024,
+        default_ttl=CACHE_TTL_SECONDS,
+        disk_dir=CACHE_DIR,
+    )
+    http_fetcher = HttpFetcher() if ARCHIVE_MODE == "off" else None
+    host_cache = HostCache(http_fetcher) if http_fetcher is not None and http_fetcher.available else None
+    crawl_state = CrawlStateStore(CRAWL_STATE_DIR)
+    metrics = ServerMetrics()
+
+# 正在处理中的请求任务
+inflight_tasks: set = set()
+
+# 服务器自身的后台任务（例如从线程读取标准输入），关闭时取消
+background_tasks: set = set()
+
+# 收到shutdown请求后置位，主循环据此退出
+shutdown_event = asyncio.Event()
+
+# 当前tools/call请求携带的进度令牌（params._meta.progressToken）
+progress_token_var: contextvars.ContextVar = contextvars.ContextVar(
+    "progress_token", default=None)
+
+# 当前批量请求收集成员响应的列表，不在批量请求中时为None
+batch_responses_var: contextvars.ContextVar = contextvars.ContextVar(
+    "batch_responses", default=None)
+
 # 模型定义
 
 
-class CrawlWebpageParams(BaseModel):
+class ToolParams(BaseModel):
+    """Parameters shared by all tools."""
+    timeout: Optional[float] = Field(
+        default=None, gt=0, description="本次调用的执行时间上限（秒），从开始执行时计算，不含排队时间；为空时使用服务器默认值；超时后停止爬取，crawl_website返回已完成的页面")
+    max_result_bytes: Optional[int] = Field(
+        default=None, ge=1024, description="结果编码后超过该字节数时保存在服务器端，响应只返回句柄、大小和第一块（不超过该字节数），其余部分通过results/read按游标读取")
+
+
+class CrawlWebpageParams(ToolParams):
     """Parameters for crawling a single webpage."""
     url: str = Field(description="要爬取的网页URL")
     include_images: bool = Field(default=True, description="是否在结果中包含图像")
+    engine: Literal["auto", "http", "browser"] = Field(
+        default="auto", description="抓取引擎：auto先用HTTP抓取，页面需要JavaScript渲染或内容为空时回退到浏览器；http只用HTTP；browser只用浏览器。结果中的engine字段表示实际使用的引擎")
+    bypass_cache: bool = Field(default=False, description="是否绕过缓存")
+    cache_mode: Optional[Literal["default", "bypass", "force"]] = Field(
+        default=None, description="缓存模式：default读写缓存，bypass重新抓取并刷新缓存，force优先使用缓存（包括已过期条目）；指定后覆盖bypass_cache")
+    cache_ttl: Optional[float] = Field(
+        default=None, description="结果在缓存中的有效期（秒），为空时使用服务器默认值")
+
+
+class CrawlWebpagesParams(ToolParams):
+    """Parameters for crawling a batch of unrelated webpages."""
+    urls: List[str] = Field(min_length=1, description="要爬取的网页URL列表")
+    include_images: bool = Field(default=True, description="是否在结果中包含图像")
     bypass_cache: bool = Field(default=False, description="是否绕过缓存")
+    cache_mode: Optional[Literal["default", "bypass", "force"]] = Field(
+        default=None, description="缓存模式，含义与crawl_webpage相同；指定后覆盖bypass_cache")
+    cache_ttl: Optional[float] = Field(
+        default=None, description="结果在缓存中的有效期（秒），为空时使用服务器默认值")
+    max_concurrency: int = Field(default=8, ge=1, description="同时爬取的最大URL数")
+    stream: bool = Field(
+        default=False, description="是否在每个URL完成时通过notifications/progress推送其结果（需要请求携带progressToken），最终响应只包含各URL的状态")
 
 
-class CrawlWebsiteParams(BaseModel):
+class CrawlWebsiteParams(ToolParams):
     """Parameters for crawling a website."""
     url: str = Field(description="爬取起始URL")
     max_depth: int = Field(default=1, description="最大爬取深度")
     max_pages: int = Field(default=5, description="最大爬取页面数量")
     include_images: bool = Field(default=True, description="是否在结果中包含图像")
-
-
-class ExtractStructuredDataParams(BaseModel):
+    engine: Literal["auto", "http", "browser"] = Field(
+        default="auto", description="抓取引擎：auto先用HTTP抓取，页面需要JavaScript渲染或内容为空时回退到浏览器；http只用HTTP；browser只用浏览器。结果中的engine字段表示实际使用的引擎")
+    stream: bool = Field(
+        default=False, description="是否在每个页面完成时通过notifications/progress推送该页面结果（需要请求携带progressToken），最终响应只包含摘要")
+    max_concurrency: int = Field(default=4, ge=1, description="同时抓取的最大页面数")
+    per_host_concurrency: int = Field(default=2, ge=1, description="单个主机同时抓取的最大页面数")
+    incremental: bool = Field(
+        default=False, description="是否增量爬取：发送条件请求，未修改的页面使用上次保存的内容而不重新渲染，每个页面标记为new、changed或unchanged")
+    changed_only: bool = Field(
+        default=False, description="增量爬取时只返回新增和有变化的页面，未修改的页面只在unchanged_urls中列出；指定后隐含incremental")
+    use_sitemap: bool = Field(
+        default=False, description="是否先用sitemap.xml（包括sitemap索引和gzip压缩的sitemap）中起始URL所在目录下的页面填充爬取队列，按lastmod从新到旧排列")
+    respect_robots: bool = Field(
+        default=False, description="是否遵循robots.txt：跳过禁止抓取的URL并按crawl-delay限制同一主机的抓取间隔")
+
+
+class ExtractStructuredDataParams(ToolParams):
     """Parameters for extracting structured data from a webpage."""
     url: str = Field(description="要提取数据的网页URL")
     schema: Optional[Dict[str, Any]] = Field(
         default=None, description="定义提取的schema")
     css_selector: str = Field(default="body", description="用于定位特定页面部分的CSS选择器")
+    schemas: Optional[List[Dict[str, Any]]] = Field(
+        default=None, min_length=1, description="在同一次抓取的页面上依次执行的多个schema，指定后忽略schema和css_selector，结果按顺序放在results中")
+    bypass_cache: bool = Field(default=False, description="是否绕过缓存的页面HTML重新抓取")
+    cache_mode: Optional[Literal["default", "bypass", "force"]] = Field(
+        default=None, description="页面HTML的缓存模式，含义与crawl_webpage相同；指定后覆盖bypass_cache")
 
 
-class SaveAsMarkdownParams(BaseModel):
+class SaveAsMarkdownParams(ToolParams):
     """Parameters for saving a webpage as markdown."""
     url: str = Field(description="要爬取的网页URL")
     filename: str = Field(description="保存Markdown的文件名")
     include_images: bool = Field(default=True, description="是否包含图像")
 
 
+class ExportSiteParams(ToolParams):
+    """Parameters for exporting a website or a list of webpages as markdown."""
+    output_path: str = Field(description="导出目录（directory格式）或文件路径（jsonl/tar格式，tar路径以.gz或.tgz结尾时压缩）")
+    url: Optional[str] = Field(default=None, description="爬取网站的起始URL，与urls二选一")
+    urls: Optional[List[str]] = Field(default=None, min_length=1, description="要导出的网页URL列表，与url二选一")
+    format: Literal["directory", "jsonl", "tar"] = Field(
+        default="directory", description="导出格式：directory每个页面一个.md文件，jsonl每行一个页面，tar打包为一个归档")
+    max_depth: int = Field(default=1, description="爬取网站时的最大深度")
+    max_pages: int = Field(default=50, ge=1, description="爬取网站时的最大页面数量")
+    include_images: bool = Field(default=True, description="是否包含图像")
+    max_concurrency: int = Field(default=4, ge=1, description="同时爬取的最大页面数")
+    per_host_concurrency: int = Field(default=2, ge=1, description="爬取网站时单个主机同时抓取的最大页面数")
+    skip_unchanged: bool = Field(
+        default=True, description="是否跳过内容与上次导出（按清单中的SHA-256）相同的页面")
+
+
+class StdoutWriter:
+    """
+    独占标准输出的异步写入器
+
+    所有响应和通知都先进入队列，由单个写入协程按顺序取出，把当前积压的消息
+    合并为一次写入，并根据管道的drain状态施加背压。
+    """
+
+    def __init__(self, high_water: int = OUTPUT_HIGH_WATER_BYTES):
+        self.high_water = high_water
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.pending_bytes = 0
+        self.bytes_written = 0
+        self.write_count = 0
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """写入协程是否在运行"""
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """在标准输出管道上建立写入流并启动写入协程"""
+        loop = asyncio.get_running_loop()
+        try:
+            transport, protocol = await loop.connect_write_pipe(
+                asyncio.streams.FlowControlMixin, sys.stdout.buffer)
+        except (OSError, ValueError) as e:
+            # 标准输出不是管道（例如重定向到普通文件），退回同步写入
+            logger.warning(f"无法异步写入标准输出，使用同步写入: {e}")
+            return
+        self._writer = asyncio.StreamWriter(transport, protocol, None, loop)
+        self._task = asyncio.create_task(self._run())
+
+    def send(self, data: bytes):
+        """
+        将一条已编码的消息放入输出队列
+
+        Args:
+            data: 不含换行符的JSON字节串
+        """
+        if not self.running:
+            sys.stdout.buffer.write(data + b"\n")
+            sys.stdout.buffer.flush()
+            self.bytes_written += len(data) + 1
+            self.write_count += 1
+            return
+
+        self.queue.put_nowait(data)
+        self.pending_bytes += len(data) + 1
+        if self.pending_bytes > self.high_water and self._writable.is_set():
+            logger.warning(
+                f"输出队列积压: {self.queue.qsize()} 条消息, {self.pending_bytes} 字节")
+            self._writable.clear()
+
+    async def wait_writable(self):
+        """等待输出队列积压降到高水位以下"""
+        await self._writable.wait()
+
+    def queue_depth(self) -> Dict[str, int]:
+        """
+        返回当前输出队列深度
+
+        Returns:
+            包含排队消息数和字节数的字典
+        """
+        return {
+            "messages": self.queue.qsize(),
+            "bytes": self.pending_bytes,
+        }
+
+    async def _run(self):
+        """写入协程：合并积压消息，写出后等待管道排空"""
+        while True:
+            batch = [await self.queue.get()]
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            payload = b"\n".join(batch) + b"\n"
+            self._writer.write(payload)
+            # 管道写满时在此等待，形成背压
+            await self._writer.drain()
+
+            self.pending_bytes -= len(payload)
+            self.bytes_written += len(payload)
+            self.write_count += 1
+            if self.pending_bytes <= self.high_water:
+                self._writable.set()
+            for _ in batch:
+                self.queue.task_done()
+
+    async def flush(self):
+        """等待队列中的所有消息写出"""
+        if self.running:
+            await self.queue.join()
+
+
+# 标准输出写入器，所有JSON-RPC输出都经由它发送
+stdout_writer = StdoutWriter()
+
+
 def send_jsonrpc_response(id: Any, result: Any = None, error: Optional[Dict[str, Any]] = None):
     """
     发送严格遵循JSON-RPC 2.0格式的响应
 
     Args:
         id: 请求ID
-        result: 响应结果（成功时）
+        result: 响应结果（成功时），其中的RawJSON片段原样拼接
         error: 错误信息（失败时）
     """
     response = {
@@ -107,8 +406,14 @@ def send_jsonrpc_response(id: Any, result: Any = None, error: Optional[Dict[str,
     else:
         response["result"] = result
 
-    # 输出为JSON并强制刷新
-    print(json.dumps(response, ensure_ascii=False), flush=True)
+    # 编码后交给写入协程输出，已序列化的结果片段不会被重新编码
+    encoded = encode_json(response)
+    batch_responses = batch_responses_var.get()
+    if batch_responses is not None:
+        # 批量请求的成员：响应由批量处理统一写出
+        batch_responses.append(encoded)
+    else:
+        stdout_writer.send(encoded)
 
 
 def send_jsonrpc_notification(method: str, params: Optional[Dict[str, Any]] = None):
@@ -127,110 +432,426 @@ def send_jsonrpc_notification(method: str, params: Optional[Dict[str, Any]] = No
     if params is not None:
         notification["params"] = params
 
-    # 输出为JSON并强制刷新
-    print(json.dumps(notification, ensure_ascii=False), flush=True)
+    # 编码后交给写入协程输出
+    stdout_writer.send(encode_json(notification))
+
+# 工具注册表 - 工具元数据、参数模型与处理函数只在此处定义一次
+
+
+class ToolSpec:
+    """单个工具的注册信息"""
+
+    def __init__(self, name: str, description: str, params_model: type,
+                 handler: Callable[[BaseModel], Awaitable[Any]]):
+        self.name = name
+        self.description = description
+        self.params_model = params_model
+        self.handler = handler
+        # 参数校验器和JSON schema在注册时构建一次，请求路径上直接复用
+        self.validator = params_model.__pydantic_validator__
+        self.input_schema = params_model.model_json_schema()
+
+    def validate(self, arguments: Dict[str, Any]) -> BaseModel:
+        """
+        使用预先构建的校验器校验调用参数
+
+        Args:
+            arguments: 调用参数
+
+        Returns:
+            校验后的参数模型实例
+        """
+        return self.validator.validate_python(arguments)
+
+
+# 工具名称到注册信息的映射
+TOOL_REGISTRY: Dict[str, ToolSpec] = {}
+
+
+def register_tool(name: str, description: str, params_model: type):
+    """
+    注册工具处理函数的装饰器
+
+    Args:
+        name: 工具名称
+        description: 工具描述
+        params_model: 参数Pydantic模型
+    """
+    def decorator(handler: Callable[[BaseModel], Awaitable[Any]]):
+        TOOL_REGISTRY[name] = ToolSpec(name, description, params_model, handler)
+        return handler
+    return decorator
+
+
+@register_tool("crawl_webpage", "爬取单个网页并返回其内容为markdown格式。", CrawlWebpageParams)
+async def crawl_webpage_tool(params: CrawlWebpageParams) -> Any:
+    """爬取单个网页"""
+    return await crawler.crawl_webpage(
+        crawler_pool, params.url, params.include_images,
+        cache=result_cache, cache_mode=resolve_cache_mode(params), cache_ttl=params.cache_ttl,
+        flights=fetch_flights, engine=params.engine, http=http_fetcher
+    )
+
+
+@register_tool("crawl_webpages", "并发爬取多个网页，返回每个URL各自的结果或错误。", CrawlWebpagesParams)
+async def crawl_webpages_tool(params: CrawlWebpagesParams) -> Any:
+    """批量爬取网页"""
+    on_result = None
+    if params.stream:
+        progress_token = progress_token_var.get()
+        if progress_token is None:
+            logger.warning("请求未携带progressToken，crawl_webpages不使用流式模式")
+        else:
+            on_result = make_progress_sender(progress_token, len(params.urls), "result")
+
+    return await crawler.crawl_webpages(
+        crawler_pool, params.urls, params.include_images,
+        cache=result_cache, cache_mode=resolve_cache_mode(params), cache_ttl=params.cache_ttl,
+        flights=fetch_flights,
+        max_concurrency=params.max_concurrency,
+        on_result=on_result,
+        http=http_fetcher
+    )
+
+
+def resolve_cache_mode(params: Union[CrawlWebpageParams, CrawlWebpagesParams,
+                                     ExtractStructuredDataParams]) -> CacheMode:
+    """由cache_mode和bypass_cache参数确定缓存模式，cache_mode优先"""
+    if params.cache_mode:
+        return CacheMode[params.cache_mode.upper()]
+    return CacheMode.BYPASS if params.bypass_cache else CacheMode.DEFAULT
+
+
+@register_tool("crawl_website", "从给定URL开始爬取网站，最多爬取指定深度和页面数量。", CrawlWebsiteParams)
+async def crawl_website_tool(params: CrawlWebsiteParams) -> Any:
+    """爬取网站"""
+    on_page = None
+    if params.stream:
+        progress_token = progress_token_var.get()
+        if progress_token is None:
+            logger.warning("请求未携带progressToken，crawl_website不使用流式模式")
+        else:
+            on_page = make_progress_sender(progress_token, params.max_pages, "page")
+
+    return await crawler.crawl_website(
+        crawler_pool, params.url, params.max_depth, params.max_pages, params.include_images,
+        on_page=on_page,
+        max_concurrency=params.max_concurrency,
+        per_host_concurrency=params.per_host_concurrency,
+        engine=params.engine,
+        http=http_fetcher,
+        state=crawl_state if params.incremental or params.changed_only else None,
+        changed_only=params.changed_only,
+        hosts=host_cache,
+        use_sitemap=params.use_sitemap,
+        respect_robots=params.respect_robots
+    )
+
+
+def make_progress_sender(progress_token: Any, total: int, field: str = "page"):
+    """
+    创建把逐项结果作为进度通知推送的回调
 
-# 获取所有工具列表 - 直接构建工具列表
+    Args:
+        progress_token: 请求携带的进度令牌
+        total: 预计的结果总数
+        field: 结果在通知参数中的字段名
+
+    Returns:
+        每完成一项调用一次的异步回调
+    """
+    sent = 0
+
+    async def send_item(item: Any):
+        nonlocal sent
+        sent += 1
+        send_jsonrpc_notification("notifications/progress", {
+            "progressToken": progress_token,
+            "progress": sent,
+            "total": total,
+            field: item,
+        })
+        # 输出积压时暂停爬取，等待客户端读取
+        await stdout_writer.wait_writable()
+
+    return send_item
+
+
+@register_tool("extract_structured_data",
+               "使用CSS选择器从网页中提取结构化数据。可在同一次抓取的页面上执行多个schema，缓存中有页面HTML时不重新抓取。",
+               ExtractStructuredDataParams)
+async def extract_structured_data_tool(params: ExtractStructuredDataParams) -> Any:
+    """提取结构化数据"""
+    return await crawler.extract_structured_data(
+        crawler_pool, params.url, params.schema, params.css_selector,
+        schemas=params.schemas,
+        schema_cache=schema_cache,
+        cache=result_cache,
+        cache_mode=resolve_cache_mode(params),
+        flights=fetch_flights
+    )
+
+
+@register_tool("save_as_markdown", "爬取网页并将内容保存为Markdown文件。", SaveAsMarkdownParams)
+async def save_as_markdown_tool(params: SaveAsMarkdownParams) -> Any:
+    """保存网页为Markdown文件"""
+    return await crawler.save_as_markdown(
+        crawler_pool, params.url, params.filename, params.include_images
+    )
+
+
+@register_tool("export_site",
+               "批量爬取网站或URL列表并导出为Markdown（目录、JSONL文件或tar归档），返回导出清单而不是页面内容。",
+               ExportSiteParams)
+async def export_site_tool(params: ExportSiteParams) -> Any:
+    """批量导出为Markdown"""
+    return await crawler.export_site(
+        crawler_pool, params.output_path, url=params.url, urls=params.urls,
+        format=params.format, max_depth=params.max_depth, max_pages=params.max_pages,
+        include_images=params.include_images, max_concurrency=params.max_concurrency,
+        per_host_concurrency=params.per_host_concurrency,
+        skip_unchanged=params.skip_unchanged,
+        cache=result_cache, flights=fetch_flights, http=http_fetcher
+    )
+
+# 获取所有工具列表 - 由注册表构建
 
 
 def get_tools_list():
     """返回所有可用工具的列表"""
     return [
         {
-            "name": "crawl_webpage",
-            "description": "爬取单个网页并返回其内容为markdown格式。",
-            "parameters": CrawlWebpageParams.model_json_schema(),
-        },
-        {
-            "name": "crawl_website",
-            "description": "从给定URL开始爬取网站，最多爬取指定深度和页面数量。",
-            "parameters": CrawlWebsiteParams.model_json_schema(),
-        },
-        {
-            "name": "extract_structured_data",
-            "description": "使用CSS选择器从网页中提取结构化数据。",
-            "parameters": ExtractStructuredDataParams.model_json_schema(),
-        },
-        {
-            "name": "save_as_markdown",
-            "description": "爬取网页并将内容保存为Markdown文件。",
-            "parameters": SaveAsMarkdownParams.model_json_schema(),
+            "name": spec.name,
+            "description": spec.description,
+            "parameters": spec.input_schema,
         }
+        for spec in TOOL_REGISTRY.values()
     ]
 
+
+def get_initialize_result() -> Dict[str, Any]:
+    """返回initialize请求的结果"""
+    return {
+        "protocolVersion": PROTOCOL_VERSION,
+        "serverInfo": {
+            "name": "crawl4ai-mcp-server",
+            "version": SERVER_VERSION,
+        },
+        "capabilities": {
+            "tools": {
+                "list": True,
+            },
+        },
+    }
+
+
+# initialize和tools/list的结果在启动时序列化一次，之后直接复用字节
+INITIALIZE_RESULT = RawJSON(encode_json(get_initialize_result()))
+TOOLS_LIST_RESULT = RawJSON(encode_json({"tools": get_tools_list()}))
+
 # 执行工具调用的函数
 
 
-async def execute_tool_call(tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+class ToolCallCancelled(Exception):
+    """工具调用被客户端取消或超过截止时间"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        message = "请求已取消" if reason == "cancelled" else "请求超过截止时间"
+        super().__init__(message)
+
+
+class ActiveCall:
+    """正在执行的工具调用，可按请求ID取消或在截止时间到达时取消"""
+
+    def __init__(self, task: asyncio.Task, request_id: Any = None):
+        self.task = task
+        self.request_id = request_id
+        self.cancel_reason: Optional[str] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def cancel(self, reason: str):
+        """
+        取消调用
+
+        Args:
+            reason: 取消原因，"cancelled"或"deadline"
+        """
+        if self.cancel_reason is None and not self.task.done():
+            logger.info(f"取消工具调用 {self.request_id}: {reason}")
+            self.cancel_reason = reason
+            self.task.cancel()
+
+    def set_deadline(self, timeout: float):
+        """在timeout秒后以deadline原因取消调用"""
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(timeout, self.cancel, "deadline")
+
+    def finish(self):
+        """调用结束，撤销截止时间定时器"""
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+# 正在执行的工具调用，按请求ID索引，供notifications/cancelled查找
+active_calls: Dict[Any, ActiveCall] = {}
+
+
+def build_execution_error(e: Exception) -> Dict[str, Any]:
+    """
+    把工具执行异常转换为JSON-RPC错误对象
+
+    Args:
+        e: 工具执行时抛出的异常
+
+    Returns:
+        JSON-RPC错误字典
+    """
+    if isinstance(e, ToolCallCancelled):
+        return {
+            "code": -32800,
+            "message": str(e),
+            "data": {
+                "type": "REQUEST_CANCELLED" if e.reason == "cancelled" else "DEADLINE_EXCEEDED",
+                "error_type": type(e).__name__
+            }
+        }
+    return {
+        "code": -32000,
+        "message": str(e),
+        "data": {
+            "type": "EXECUTION_ERROR",
+            "error_type": type(e).__name__
+        }
+    }
+
+
+async def execute_tool_call(tool_name: str, params: Dict[str, Any],
+                            request_id: Any = None) -> Dict[str, Any]:
     """
     执行工具调用
 
+    调用在当前任务中运行：收到针对request_id的notifications/cancelled或超过截止时间时，
+    任务被取消并抛出ToolCallCancelled；支持部分结果的工具（crawl_website）会直接返回已完成的部分。
+
     Args:
         tool_name: 工具名称
         params: 调用参数
+        request_id: 请求ID，用于按ID取消
 
     Returns:
         包含执行结果或错误信息的字典
     """
-    logger.info(f"执行工具: {tool_name} {params}")
+    logger.info("执行工具: %s %s", tool_name, summarize(params), extra={"tool": tool_name})
 
-    try:
-        result = None
-
-        if tool_name == "crawl_webpage":
-            # 使用Pydantic模型验证参数
-            validated_params = CrawlWebpageParams(**params)
-            # 使用CacheMode.DEFAULT或CacheMode.BYPASS替代布尔值
-            cache_mode = CacheMode.BYPASS if validated_params.bypass_cache else CacheMode.DEFAULT
-            result_json = await crawl_webpage_impl(
-                validated_params.url,
-                validated_params.include_images,
-                cache_mode  # 使用枚举值替代布尔值
-            )
-            result = json.loads(result_json)
-
-        elif tool_name == "crawl_website":
-            validated_params = CrawlWebsiteParams(**params)
-            result_json = await crawl_website_impl(
-                validated_params.url,
-                validated_params.max_depth,
-                validated_params.max_pages,
-                validated_params.include_images
-            )
-            result = json.loads(result_json)
-
-        elif tool_name == "extract_structured_data":
-            validated_params = ExtractStructuredDataParams(**params)
-            result_json = await extract_structured_data_impl(
-                validated_params.url,
-                validated_params.schema,
-                validated_params.css_selector
-            )
-            result = json.loads(result_json)
-
-        elif tool_name == "save_as_markdown":
-            validated_params = SaveAsMarkdownParams(**params)
-            result_json = await save_as_markdown_impl(
-                validated_params.url,
-                validated_params.filename,
-                validated_params.include_images
-            )
-            result = json.loads(result_json)
+    spec = TOOL_REGISTRY.get(tool_name)
+    if spec is None:
+        logger.error(f"未知工具: {tool_name}")
+        raise ValueError(f"未知工具: {tool_name}")
 
-        else:
-            logger.error(f"未知工具: {tool_name}")
-            raise ValueError(f"未知工具: {tool_name}")
+    call = ActiveCall(asyncio.current_task(), request_id)
+    if request_id is not None:
+        active_calls[request_id] = call
+    started = time.perf_counter()
+    error_type: Optional[str] = None
 
-        # 返回符合JSON-RPC 2.0格式的结果
+    try:
+        # 使用预先构建的校验器验证参数
+        validated_params = spec.validate(params)
+
+        with metrics.queued_call():
+            # 输出管道积压时暂缓开始新的工具调用
+            await stdout_writer.wait_writable()
+            # 限制同时运行的工具调用数量，超出的请求排队等待
+            await request_semaphore.acquire()
+        try:
+            # 截止时间从取得执行名额时开始计算，排队时间不占用工具的执行时间
+            timeout = validated_params.timeout or DEFAULT_TOOL_TIMEOUT
+            if timeout:
+                call.set_deadline(timeout)
+            with metrics.running_call():
+                result = await spec.handler(validated_params)
+        finally:
+            request_semaphore.release()
+
+        if isinstance(result, dict) and result.get("success") is False:
+            error_type = "ToolFailure"
+
+        if call.cancel_reason:
+            # 工具吞掉取消并返回了部分结果，撤销取消请求以免影响后续的等待
+            if hasattr(call.task, "uncancel"):
+                call.task.uncancel()
+            if isinstance(result, dict):
+                result["cancel_reason"] = call.cancel_reason
+
+        if validated_params.max_result_bytes:
+            encoded = encode_json(result)
+            if len(encoded) > validated_params.max_result_bytes:
+                result = paginate_result(result_store, encoded, validated_params.max_result_bytes)
+            else:
+                result = RawJSON(encoded)
+
+        # 返回符合JSON-RPC 2.0格式的结果，处理函数返回的RawJSON在输出时原样拼接
         return {
-            "tool": tool_name,
+            "tool": spec.name,
             "result": result
         }
+    except asyncio.CancelledError:
+        if call.cancel_reason is None:
+            # 服务器关闭等外部取消，继续向上传播
+            error_type = "CancelledError"
+            raise
+        if hasattr(call.task, "uncancel"):
+            call.task.uncancel()
+        error_type = "DeadlineExceeded" if call.cancel_reason == "deadline" else "RequestCancelled"
+        raise ToolCallCancelled(call.cancel_reason)
     except Exception as e:
-        logger.error(f"执行工具 {tool_name} 时出错: {str(e)}")
+        error_type = type(e).__name__
+        logger.error(f"执行工具 {spec.name} 时出错: {str(e)}")
         logger.error(traceback.format_exc())
         # 抛出异常，让调用者处理
         raise e
+    finally:
+        metrics.observe_call(spec.name, (time.perf_counter() - started) * 1000, error_type)
+        call.finish()
+        if request_id is not None and active_calls.get(request_id) is call:
+            del active_calls[request_id]
+
+
+def collect_metric_sources() -> Dict[str, Dict[str, Any]]:
+    """收集缓存、请求合并、浏览器池和标准输入输出的统计信息"""
+    pool_stats = crawler_pool.stats()
+    pool_stats["utilization"] = round(pool_stats["in_use"] / pool_stats["max_size"], 3)
+    return {
+        "cache": result_cache.stats(),
+        "coalescing": fetch_flights.stats(),
+        "conversion": conversion_pool().stats(),
+        "extraction": schema_cache.stats(),
+        "http": http_fetcher.stats() if http_fetcher is not None else {"available": False},
+        "hosts": host_cache.stats() if host_cache is not None else {},
+        "results": result_store.stats(),
+        "state": crawl_state.stats(),
+        "pool": pool_stats,
+        "stdio": {
+            "bytes_in": metrics.bytes_in,
+            "messages_in": metrics.messages_in,
+            "rejected_messages": metrics.rejected_messages,
+            "bytes_out": stdout_writer.bytes_written,
+            "writes": stdout_writer.write_count,
+            "output_queue_messages": stdout_writer.queue.qsize(),
+            "output_queue_bytes": stdout_writer.pending_bytes,
+        },
+    }
+
+
+def get_metrics_result() -> Dict[str, Any]:
+    """返回server/metrics方法的结果"""
+    return {**metrics.snapshot(), **collect_metric_sources()}
+
+
+def render_prometheus_metrics() -> str:
+    """返回Prometheus文本格式的全部指标"""
+    return metrics.render_prometheus(collect_metric_sources())
 
 # 处理旧版客户端发送的工具请求
 
@@ -252,8 +873,7 @@ async def handle_legacy_request(request: Dict[str, Any]) -> bool:
 
     if request.get("type") == "list_tools":
         # 返回工具列表（使用JSON-RPC 2.0格式）
-        tools_list = get_tools_list()
-        send_jsonrpc_response(request_id, {"tools": tools_list})
+        send_jsonrpc_response(request_id, TOOLS_LIST_RESULT)
         return True
 
     elif request.get("type") == "call":
@@ -272,18 +892,10 @@ async def handle_legacy_request(request: Dict[str, Any]) -> bool:
 
         try:
             # 执行工具调用
-            result = await execute_tool_call(tool_name, params)
+            result = await execute_tool_call(tool_name, params, request_id)
             send_jsonrpc_response(request_id, result)
         except Exception as e:
-            error = {
-                "code": -32000,
-                "message": str(e),
-                "data": {
-                    "type": "EXECUTION_ERROR",
-                    "error_type": type(e).__name__
-                }
-            }
-            send_jsonrpc_response(request_id, error=error)
+            send_jsonrpc_response(request_id, error=build_execution_error(e))
         return True
 
     return False
@@ -314,29 +926,49 @@ async def handle_jsonrpc_request(request: Dict[str, Any]) -> bool:
 
     # 初始化请求
     if method == "initialize":
+        # 在后台预热浏览器池，不推迟initialize响应
+        spawn_request_task(crawler_pool.start())
         if not is_notification:
-            result = {
-                "protocolVersion": PROTOCOL_VERSION,
-                "serverInfo": {
-                    "name": "crawl4ai-mcp-server",
-                    "version": SERVER_VERSION,
-                },
-                "capabilities": {
-                    "tools": {
-                        "list": True,
-                    },
-                },
-            }
-            send_jsonrpc_response(request_id, result)
+            send_jsonrpc_response(request_id, INITIALIZE_RESULT)
         return True
 
     # 工具列表请求
     elif method == "tools/list":
         if not is_notification:
-            result = {
-                "tools": get_tools_list(),
-            }
-            send_jsonrpc_response(request_id, result)
+            send_jsonrpc_response(request_id, TOOLS_LIST_RESULT)
+        return True
+
+    # 服务器运行指标
+    elif method == "server/metrics":
+        if not is_notification:
+            send_jsonrpc_response(request_id, get_metrics_result())
+        return True
+
+    # 按游标读取分页结果的下一块
+    elif method == "results/read":
+        if not is_notification:
+            try:
+                chunk = result_store.read(
+                    params.get("handle", ""),
+                    int(params.get("cursor") or 0),
+                    int(params.get("max_bytes") or DEFAULT_RESULT_CHUNK_BYTES))
+                send_jsonrpc_response(request_id, chunk)
+            except (ResultNotFound, ValueError, TypeError) as e:
+                send_jsonrpc_response(request_id, error={
+                    "code": -32602,
+                    "message": str(e),
+                    "data": {
+                        "type": "RESULT_NOT_FOUND" if isinstance(e, ResultNotFound) else "INVALID_CURSOR",
+                        "error_type": type(e).__name__
+                    }
+                })
+        return True
+
+    # 提前释放分页结果
+    elif method == "results/release":
+        released = result_store.release(params.get("handle", ""))
+        if not is_notification:
+            send_jsonrpc_response(request_id, {"released": released})
         return True
 
     # 执行工具请求
@@ -355,20 +987,23 @@ async def handle_jsonrpc_request(request: Dict[str, Any]) -> bool:
                     send_jsonrpc_response(request_id, error=error)
                     return True
 
+                # 记录进度令牌，供流式工具发送进度通知
+                meta = params.get("_meta") or {}
+                progress_token_var.set(meta.get("progressToken"))
+
                 # 执行工具调用
-                result = await execute_tool_call(tool_name, tool_params)
+                result = await execute_tool_call(tool_name, tool_params, request_id)
                 send_jsonrpc_response(request_id, result)
 
             except Exception as e:
-                error = {
-                    "code": -32000,
-                    "message": str(e),
-                    "data": {
-                        "type": "EXECUTION_ERROR",
-                        "error_type": type(e).__name__
-                    }
-                }
-                send_jsonrpc_response(request_id, error=error)
+                send_jsonrpc_response(request_id, error=build_execution_error(e))
+        return True
+
+    # 取消通知：取消对应ID的进行中工具调用
+    elif method == "notifications/cancelled":
+        call = active_calls.get(params.get("requestId"))
+        if call is not None:
+            call.cancel("cancelled")
         return True
 
     # 已初始化通知，无需返回结果
@@ -380,14 +1015,137 @@ async def handle_jsonrpc_request(request: Dict[str, Any]) -> bool:
         if not is_notification:
             send_jsonrpc_response(request_id, None)
 
-        # 退出进程
+        # 通知主循环退出
         logger.info("收到关闭请求，正在退出...")
-        sys.exit(0)
+        shutdown_event.set()
         return True
 
     # 处理不了的方法
     return False
 
+# 处理单行请求
+
+
+async def process_request_line(line: bytes):
+    """
+    解析并处理一行JSON-RPC请求（单个请求或批量数组），响应在处理完成后立即写出
+
+    Args:
+        line: 从标准输入读取的一行原始字节
+    """
+    try:
+        request = decode_json(line)
+    except ValueError as e:
+        logger.error(f"JSON解析错误: {e}")
+        error = {
+            "code": -32700,
+            "message": "解析错误",
+            "data": {
+                "error": str(e),
+                "line": line.rstrip(b"\r\n").decode("utf-8", errors="replace")
+            }
+        }
+        # 无法从无效JSON中获取ID，按规范使用null
+        send_jsonrpc_response(None, error=error)
+        return
+
+    if isinstance(request, list):
+        await process_batch(request)
+    else:
+        await dispatch_request(request)
+
+
+async def process_batch(requests: List[Any]):
+    """
+    并发处理JSON-RPC批量请求，所有成员的响应合并为一行数组写出
+
+    Args:
+        requests: 批量请求数组
+    """
+    logger.info(f"收到批量请求: {len(requests)} 个")
+    if not requests:
+        # 空数组按规范返回单个无效请求错误
+        send_jsonrpc_response(None, error={"code": -32600, "message": "无效的请求：空的批量请求"})
+        return
+
+    responses: List[bytes] = []
+    token = batch_responses_var.set(responses)
+    try:
+        # 成员任务继承当前上下文，响应写入responses而不是直接输出
+        await asyncio.gather(*(dispatch_request(request) for request in requests))
+    finally:
+        batch_responses_var.reset(token)
+        # 全部是通知时不输出任何内容；被shutdown取消时也写出已有的响应
+        if responses:
+            stdout_writer.send(b"[" + b",".join(responses) + b"]")
+
+
+async def dispatch_request(request: Any):
+    """
+    处理单个已解析的请求
+
+    Args:
+        request: 请求数据
+    """
+    method = request.get("method") if isinstance(request, dict) else None
+    if isinstance(request, dict) and request.get("id") is not None:
+        request_id_var.set(str(request["id"]))
+    try:
+        logger.info("收到请求: %s", summarize(request),
+                    extra={"method": method, "sample_key": method})
+
+        if isinstance(request, dict):
+            # 尝试处理JSON-RPC 2.0请求
+            if await handle_jsonrpc_request(request):
+                return
+
+            # 尝试处理旧版请求
+            if await handle_legacy_request(request):
+                return
+
+        # 未知请求格式 - 使用JSON-RPC 2.0错误响应
+        logger.error("未知请求格式: %s", summarize(request))
+        error = {
+            "code": -32600,
+            "message": "无效的请求",
+            "data": {
+                "request": request
+            }
+        }
+        # 尝试从请求中获取ID，无法获取时按规范使用null
+        request_id = request.get("id") if isinstance(request, dict) else None
+        send_jsonrpc_response(request_id, error=error)
+
+    except Exception as e:
+        logger.error(f"处理请求时出错: {e}")
+        logger.error(traceback.format_exc())
+        error = {
+            "code": -32603,
+            "message": "内部错误",
+            "data": {
+                "error": str(e),
+                "error_type": type(e).__name__
+            }
+        }
+        # 使用请求的ID，无法获取时为null
+        send_jsonrpc_response(request.get("id") if isinstance(request, dict) else None, error=error)
+
+
+def spawn_request_task(coro) -> asyncio.Task:
+    """
+    将请求处理协程作为后台任务启动，并跟踪其生命周期
+
+    Args:
+        coro: 请求处理协程
+
+    Returns:
+        创建的任务
+    """
+    task = asyncio.create_task(coro)
+    inflight_tasks.add(task)
+    task.add_done_callback(inflight_tasks.discard)
+    return task
+
 # 直接处理标准输入/输出
 
 
@@ -395,113 +1153,150 @@ async def manual_stdio_server():
     """手动实现标准输入输出服务器，严格遵循JSON-RPC 2.0协议"""
     logger.info("启动手动实现的标准输入输出服务器")
 
+    # 启动独占标准输出的写入协程
+    await stdout_writer.start()
+
     # 发送初始化响应 - 只使用JSON-RPC 2.0格式
-    send_jsonrpc_response(0, {
-        "protocolVersion": PROTOCOL_VERSION,
-        "serverInfo": {
-            "name": "crawl4ai-mcp-server",
-            "version": SERVER_VERSION,
-        },
-        "capabilities": {
-            "tools": {
-                "list": True,
-            },
-        },
-    })
+    send_jsonrpc_response(0, INITIALIZE_RESULT)
 
     # 发送工具列表 - 只使用JSON-RPC 2.0格式
-    send_jsonrpc_response(0, {
-        "tools": get_tools_list()
-    })
-
-    # 设置标准输入为非阻塞模式
-    import fcntl
-    import os
-    fl = fcntl.fcntl(sys.stdin.fileno(), fcntl.F_GETFL)
-    fcntl.fcntl(sys.stdin.fileno(), fcntl.F_SETFL, fl | os.O_NONBLOCK)
-
-    # 读取标准输入并处理请求
-    buffer = ""
-    while True:
-        try:
-            # 尝试读取一行
-            chunk = sys.stdin.read(1024)
-            if not chunk:
-                # 如果没有数据，等待一会再试
-                await asyncio.sleep(0.1)
-                continue
-
-            buffer += chunk
-
-            # 处理完整的行
-            lines = buffer.split("\n")
-            buffer = lines.pop()  # 保留最后一个不完整的行
+    send_jsonrpc_response(0, TOOLS_LIST_RESULT)
+
+    # 在标准输入管道上建立异步流读取器，数据到达时才会唤醒
+    reader = await open_stdin_reader()
+
+    # 定期写出Prometheus指标文件
+    exporter_task = None
+    if METRICS_FILE:
+        exporter_task = asyncio.create_task(run_textfile_exporter(
+            METRICS_FILE, METRICS_INTERVAL, render_prometheus_metrics))
+
+    # 读取循环作为独立任务运行，收到shutdown时可直接取消
+    read_task = asyncio.create_task(read_requests(reader))
+    shutdown_wait = asyncio.create_task(shutdown_event.wait())
+    await asyncio.wait({read_task, shutdown_wait},
+                       return_when=asyncio.FIRST_COMPLETED)
+    read_task.cancel()
+    shutdown_wait.cancel()
+
+    if shutdown_event.is_set():
+        # 收到关闭请求：取消仍在执行的请求
+        for task in list(inflight_tasks):
+            task.cancel()
+    if inflight_tasks:
+        # 标准输入关闭时等待已接收的请求处理完毕
+        await asyncio.gather(*inflight_tasks, return_exceptions=True)
+
+    if exporter_task is not None:
+        exporter_task.cancel()
+    for task in list(background_tasks):
+        task.cancel()
+
+    # 关闭浏览器池和页面处理进程池，并确保所有响应都已写出
+    await crawler_pool.close()
+    close_conversion_pool()
+    if http_fetcher is not None:
+        await http_fetcher.close()
+    await stdout_writer.flush()
+
+
+async def open_stdin_reader() -> asyncio.StreamReader:
+    """
+    将标准输入包装为asyncio流读取器
 
-            for line in lines:
-                if not line.strip():
-                    continue
+    Returns:
+        绑定到stdin管道的StreamReader，单条消息长度受MAX_MESSAGE_BYTES限制
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_MESSAGE_BYTES)
+    protocol = asyncio.StreamReaderProtocol(reader)
+    try:
+        await loop.connect_read_pipe(lambda: protocol, sys.stdin.buffer)
+    except ValueError:
+        # 标准输入是普通文件时无法使用管道传输，改由线程读取后喂给读取器。
+        # 事件循环只弱引用任务，这里保留引用以免任务在读取中途被回收
+        task = asyncio.create_task(feed_reader_from_thread(reader))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+    return reader
 
-                try:
-                    request = json.loads(line)
-                    logger.info(f"收到请求: {request}")
 
-                    # 尝试处理JSON-RPC 2.0请求
-                    if await handle_jsonrpc_request(request):
-                        continue
+async def feed_reader_from_thread(reader: asyncio.StreamReader):
+    """
+    在线程中阻塞读取标准输入，并把数据交给流读取器
 
-                    # 尝试处理旧版请求
-                    if await handle_legacy_request(request):
-                        continue
+    Args:
+        reader: 标准输入流读取器
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, sys.stdin.buffer.read1, 65536)
+        if not chunk:
+            reader.feed_eof()
+            return
+        reader.feed_data(chunk)
 
-                    # 未知请求格式 - 使用JSON-RPC 2.0错误响应
-                    logger.error(f"未知请求格式: {request}")
-                    error = {
-                        "code": -32600,
-                        "message": "无效的请求",
-                        "data": {
-                            "request": request
-                        }
-                    }
-                    # 尝试从请求中获取ID，如果没有则使用0
-                    request_id = request.get("id", 0)
-                    send_jsonrpc_response(request_id, error=error)
 
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON解析错误: {e}")
-                    error = {
-                        "code": -32700,
-                        "message": "解析错误",
-                        "data": {
-                            "error": str(e),
-                            "line": line
-                        }
-                    }
-                    # 无法从无效JSON中获取ID，使用0
-                    send_jsonrpc_response(0, error=error)
+async def read_requests(reader: asyncio.StreamReader):
+    """
+    按行切分标准输入字节流并分发请求，直到输入结束
 
-                except Exception as e:
-                    logger.error(f"处理请求时出错: {e}")
-                    logger.error(traceback.format_exc())
-                    error = {
-                        "code": -32603,
-                        "message": "内部错误",
-                        "data": {
-                            "error": str(e),
-                            "error_type": type(e).__name__
-                        }
-                    }
-                    # 使用0作为默认ID
-                    send_jsonrpc_response(0, error=error)
+    Args:
+        reader: 标准输入流读取器
+    """
+    while True:
+        try:
+            # 在字节层面按换行符增量切分，不会重复拼接缓冲区
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            # 输入结束，处理最后一条没有换行符的消息
+            if e.partial.strip():
+                metrics.observe_message(len(e.partial))
+                spawn_request_task(process_request_line(e.partial))
+            logger.info("标准输入已关闭")
+            return
+        except asyncio.LimitOverrunError:
+            # 消息超过上限：丢弃到下一个换行符为止
+            logger.error(f"请求超过最大长度 {MAX_MESSAGE_BYTES} 字节，已丢弃")
+            metrics.rejected_messages += 1
+            await discard_oversized_message(reader)
+            # 被丢弃的消息无法解析出ID，按规范使用null
+            send_jsonrpc_response(None, error={
+                "code": -32600,
+                "message": "请求过大",
+                "data": {"max_message_bytes": MAX_MESSAGE_BYTES}
+            })
+            continue
+
+        if not line.strip():
+            continue
+        metrics.observe_message(len(line))
+
+        # 每个请求作为独立任务运行，避免慢请求阻塞后续请求
+        spawn_request_task(process_request_line(line))
+
+
+async def discard_oversized_message(reader: asyncio.StreamReader):
+    """
+    丢弃一条超长消息的剩余部分
 
-        except Exception as e:
-            logger.error(f"读取输入时出错: {e}")
-            logger.error(traceback.format_exc())
-            await asyncio.sleep(0.1)
+    Args:
+        reader: 标准输入流读取器
+    """
+    while True:
+        try:
+            await reader.readuntil(b"\n")
+            return
+        except asyncio.LimitOverrunError as e:
+            await reader.readexactly(e.consumed)
+        except asyncio.IncompleteReadError:
+            return
 
 
 async def serve():
     """Run the Crawl4AI MCP server."""
     logger.info("启动Crawl4AI MCP服务器...")
+    logger.info(f"JSON编解码后端: {JSON_BACKEND}")
 
     try:
         # 使用手动处理stdin/stdout的方法
@@ -518,31 +1313,20 @@ async def serve_with_mcp_lib():
     """使用MCP库运行服务器（备用方案）"""
     server = Server("Crawl4AI")
 
+    # 工具列表由注册表构建一次
+    tools = [
+        Tool(
+            name=spec.name,
+            description=spec.description,
+            inputSchema=spec.input_schema,
+        )
+        for spec in TOOL_REGISTRY.values()
+    ]
+
     @server.list_tools()
     async def list_tools() -> list[Tool]:
         """List available tools in this server."""
-        return [
-            Tool(
-                name="crawl_webpage",
-                description="爬取单个网页并返回其内容为markdown格式。",
-                inputSchema=CrawlWebpageParams.model_json_schema(),
-            ),
-            Tool(
-                name="crawl_website",
-                description="从给定URL开始爬取网站，最多爬取指定深度和页面数量。",
-                inputSchema=CrawlWebsiteParams.model_json_schema(),
-            ),
-            Tool(
-                name="extract_structured_data",
-                description="使用CSS选择器从网页中提取结构化数据。",
-                inputSchema=ExtractStructuredDataParams.model_json_schema(),
-            ),
-            Tool(
-                name="save_as_markdown",
-                description="爬取网页并将内容保存为Markdown文件。",
-                inputSchema=SaveAsMarkdownParams.model_json_schema(),
-            )
-        ]
+        return tools
 
     @server.list_prompts()
     async def list_prompts() -> list[Prompt]:
@@ -581,9 +1365,10 @@ async def serve_with_mcp_lib():
 
             url = arguments["url"]
             try:
-                # 使用CacheMode.DEFAULT替代False
-                result = await crawl_webpage_impl(url, True, CacheMode.DEFAULT)
-                result_data = json.loads(result)
+                result = await crawler.crawl_webpage(
+                    crawler_pool, url, True, cache=result_cache, flights=fetch_flights,
+                    http=http_fetcher)
+                result_data = decode_json(result)
                 if not result_data.get("success", False):
                     return GetPromptResult(
                         description=f"Failed to crawl {url}",
@@ -624,8 +1409,8 @@ async def serve_with_mcp_lib():
             url = arguments["url"]
             filename = arguments["filename"]
             try:
-                result = await save_as_markdown_impl(url, filename, True)
-                result_data = json.loads(result)
+                result = await crawler.save_as_markdown(crawler_pool, url, filename, True)
+                result_data = decode_json(result)
                 if not result_data.get("success", False):
                     return GetPromptResult(
                         description=f"Failed to save {url}",
@@ -667,62 +1452,23 @@ async def serve_with_mcp_lib():
     @server.call_tool()
     async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         """Handle tool calls."""
-        logger.info(f"工具调用: {name} {arguments}")
-
-        if name == "crawl_webpage":
-            try:
-                params = CrawlWebpageParams(**arguments)
-                # 使用CacheMode.DEFAULT或CacheMode.BYPASS替代布尔值
-                cache_mode = CacheMode.BYPASS if params.bypass_cache else CacheMode.DEFAULT
-                result = await crawl_webpage_impl(
-                    params.url, params.include_images, cache_mode
-                )
-                return [TextContent(type="text", text=result)]
-            except Exception as e:
-                logger.error(f"爬取网页时出错: {str(e)}")
-                raise McpError(ErrorData(code=INVALID_PARAMS, message=str(e)))
+        logger.info("工具调用: %s %s", name, summarize(arguments), extra={"tool": name})
 
-        elif name == "crawl_website":
-            try:
-                params = CrawlWebsiteParams(**arguments)
-                result = await crawl_website_impl(
-                    params.url, params.max_depth, params.max_pages, params.include_images
-                )
-                return [TextContent(type="text", text=result)]
-            except Exception as e:
-                logger.error(f"爬取网站时出错: {str(e)}")
-                raise McpError(ErrorData(code=INVALID_PARAMS, message=str(e)))
-
-        elif name == "extract_structured_data":
-            try:
-                params = ExtractStructuredDataParams(**arguments)
-                result = await extract_structured_data_impl(
-                    params.url, params.schema, params.css_selector
-                )
-                return [TextContent(type="text", text=result)]
-            except Exception as e:
-                logger.error(f"提取结构化数据时出错: {str(e)}")
-                raise McpError(ErrorData(code=INVALID_PARAMS, message=str(e)))
-
-        elif name == "save_as_markdown":
-            try:
-                params = SaveAsMarkdownParams(**arguments)
-                result = await save_as_markdown_impl(
-                    params.url, params.filename, params.include_images
-                )
-                return [TextContent(type="text", text=result)]
-            except Exception as e:
-                logger.error(f"保存为Markdown时出错: {str(e)}")
-                raise McpError(ErrorData(code=INVALID_PARAMS, message=str(e)))
-
-        else:
+        if name not in TOOL_REGISTRY:
             logger.error(f"未知工具: {name}")
             raise McpError(ErrorData(code=INVALID_PARAMS,
                            message=f"Unknown tool: {name}"))
 
+        try:
+            # 与手动服务器共用并发限制和截止时间
+            result = (await execute_tool_call(name, arguments))["result"]
+            return [TextContent(type="text", text=encode_json(result).decode("utf-8"))]
+        except Exception as e:
+            logger.error(f"执行工具 {name} 时出错: {str(e)}")
+            raise McpError(ErrorData(code=INVALID_PARAMS, message=str(e)))
+
     # 输出工具列表和服务器启动信息
-    tools_list = await list_tools()
-    tool_names = [tool.name for tool in tools_list]
+    tool_names = [tool.name for tool in tools]
     logger.info(f"MCP服务器启动，可用工具: {', '.join(tool_names)}")
 
     # 创建服务器选项
@@ -730,12 +1476,20 @@ async def serve_with_mcp_lib():
 
     # 使用标准的stdio服务器运行
     logger.info("使用标准stdio服务器运行MCP服务")
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(read_stream, write_stream, options, raise_exceptions=True)
+    await crawler_pool.start()
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, options, raise_exceptions=True)
+    finally:
+        await crawler_pool.close()
+        close_conversion_pool()
+        if http_fetcher is not None:
+            await http_fetcher.close()
 
 
 def main():
     """Command-line entry point for the server."""
+    init_runtime()
     logger.info("启动Crawl4AI MCP服务器...")
     check_virtual_env()
 
@@ -0,0 +1,264 @@
+"""
+Crawl4AI MCP服务器的sitemap和robots.txt支持。
+每个主机的robots.txt规则（包括crawl-delay和Sitemap声明）和sitemap中的URL只抓取一次，按TTL缓存；
+sitemap支持索引文件和gzip压缩，URL按lastmod从新到旧排序，用于在网站爬取开始时填充前沿队列。
+"""
+
+import logging
+import os
+import time
+import xml.etree.ElementTree as ElementTree
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from crawl4ai_mcp_cache import SingleFlight
+from crawl4ai_mcp_convert import conversion_pool
+from crawl4ai_mcp_http import HttpFetcher, HttpFetchError
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+# robots.txt和sitemap的缓存时间（秒）；robots.txt暂时不可用时只缓存较短时间
+HOST_CACHE_TTL = float(os.environ.get("CRAWL4AI_MCP_HOST_CACHE_TTL", "3600"))
+HOST_CACHE_ERROR_TTL = 60.0
+
+# 每个主机最多读取的sitemap文件数和URL数
+MAX_SITEMAP_FILES = int(os.environ.get("CRAWL4AI_MCP_MAX_SITEMAP_FILES", "50"))
+MAX_SITEMAP_URLS = int(os.environ.get("CRAWL4AI_MCP_MAX_SITEMAP_URLS", "50000"))
+
+# 遵循的crawl-delay上限（秒），避免单次工具调用被过长的延迟拖住
+MAX_CRAWL_DELAY = float(os.environ.get("CRAWL4AI_MCP_MAX_CRAWL_DELAY", "10"))
+
+# 解压后sitemap的最大字节数（sitemap协议规定的上限）
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+
+# 匹配robots.txt规则时使用的用户代理
+ROBOTS_USER_AGENT = "crawl4ai-mcp"
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class RobotsRules:
+    """单个主机的robots.txt规则"""
+
+    def __init__(self, lines: Optional[List[str]] = None, disallow_all: bool = False):
+        """
+        Args:
+            lines: robots.txt的内容行，为空时允许所有URL
+            disallow_all: 是否禁止所有URL（robots.txt暂时不可用时）
+        """
+        self._parser = RobotFileParser()
+        self._parser.parse(lines or [])
+        self._parser.disallow_all = disallow_all
+
+    def allowed(self, url: str) -> bool:
+        """判断URL是否允许抓取"""
+        return self._parser.can_fetch(ROBOTS_USER_AGENT, url)
+
+    @property
+    def crawl_delay(self) -> float:
+        """两次抓取之间的最小间隔（秒），不超过MAX_CRAWL_DELAY"""
+        delay = self._parser.crawl_delay(ROBOTS_USER_AGENT)
+        try:
+            return min(float(delay or 0), MAX_CRAWL_DELAY)
+        except ValueError:
+            return 0.0
+
+    @property
+    def sitemaps(self) -> List[str]:
+        """robots.txt中声明的sitemap地址"""
+        return self._parser.site_maps() or []
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[float]:
+    """把sitemap的lastmod（W3C日期时间）转换为时间戳，无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        # 只有日期或没有时区的时间按UTC处理
+        return (parsed - datetime(1970, 1, 1)).total_seconds()
+    return parsed.timestamp()
+
+
+class SitemapError(ValueError):
+    """sitemap无法解压或超过大小上限"""
+
+
+def decompress_sitemap(data: bytes, max_bytes: int = MAX_SITEMAP_BYTES) -> bytes:
+    """
+    解压gzip压缩的sitemap，限制解压后的大小
+
+    Raises:
+        SitemapError: 数据损坏或解压后超过max_bytes
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        output = decompressor.decompress(data, max_bytes + 1)
+    except zlib.error as e:
+        raise SitemapError(f"gzip数据损坏: {e}") from None
+    if len(output) > max_bytes:
+        raise SitemapError(f"解压后超过 {max_bytes} 字节")
+    return output
+
+
+def parse_sitemap(data: bytes) -> Tuple[List[Tuple[str, Optional[float]]], List[str]]:
+    """
+    解析sitemap或sitemap索引
+
+    支持gzip压缩的文件和每行一个URL的文本sitemap。该函数在大文件上是CPU密集的，通过处理进程池调用。
+
+    Args:
+        data: sitemap文件内容
+
+    Returns:
+        (页面URL和lastmod时间戳列表, 子sitemap地址列表)
+
+    Raises:
+        SitemapError: gzip数据损坏或解压后过大
+    """
+    if data[:2] == _GZIP_MAGIC:
+        data = decompress_sitemap(data)
+    stripped = data.lstrip()
+    if not stripped.startswith(b"<"):
+        lines = stripped.decode("utf-8", errors="replace").splitlines()
+        return [(line.strip(), None) for line in lines if line.strip().startswith("http")], []
+
+    urls: List[Tuple[str, Optional[float]]] = []
+    sitemaps: List[str] = []
+    try:
+        root = ElementTree.fromstring(stripped)
+    except ElementTree.ParseError as e:
+        logger.warning(f"无法解析sitemap: {e}")
+        return urls, sitemaps
+
+    # 忽略命名空间，只比较本地标签名
+    for entry in root:
+        tag = entry.tag.rsplit("}", 1)[-1]
+        fields = {child.tag.rsplit("}", 1)[-1]: (child.text or "").strip() for child in entry}
+        loc = fields.get("loc")
+        if not loc:
+            continue
+        if tag == "sitemap":
+            sitemaps.append(loc)
+        elif tag == "url":
+            urls.append((loc, parse_lastmod(fields.get("lastmod"))))
+    return urls, sitemaps
+
+
+class HostCache:
+    """
+    按主机缓存的robots.txt规则和sitemap URL
+
+    同一主机的并发请求合并为一次抓取，结果在TTL内复用。
+    """
+
+    def __init__(self, http: HttpFetcher, ttl: float = HOST_CACHE_TTL):
+        """
+        Args:
+            http: 抓取robots.txt和sitemap使用的HTTP引擎
+            ttl: 缓存时间（秒）
+        """
+        self.http = http
+        self.ttl = ttl
+        # (类型, 主机) -> (过期时间, 值)
+        self._entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.sitemap_files = 0
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc.lower()}"
+
+    async def _cached(self, kind: str, url: str, load) -> Any:
+        key = (kind, self._origin(url))
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        async def fetch():
+            self.misses += 1
+            value, ttl = await load(key[1])
+            self._entries[key] = (time.monotonic() + ttl, value)
+            return value
+
+        return await self._flights.run(f"{kind}:{key[1]}", fetch)
+
+    async def robots(self, url: str) -> RobotsRules:
+        """
+        返回URL所属主机的robots.txt规则
+
+        robots.txt不存在（4xx）时允许所有URL；服务器错误或无法访问时暂时禁止所有URL，只缓存较短时间。
+        """
+        return await self._cached("robots", url, self._load_robots)
+
+    async def _load_robots(self, origin: str) -> Tuple[RobotsRules, float]:
+        try:
+            status, body = await self.http.fetch_raw(origin + "/robots.txt")
+        except HttpFetchError as e:
+            logger.warning(f"无法获取 {origin} 的robots.txt: {e}")
+            return RobotsRules(disallow_all=True), HOST_CACHE_ERROR_TTL
+        if status >= 500:
+            logger.warning(f"{origin} 的robots.txt返回 {status}")
+            return RobotsRules(disallow_all=True), HOST_CACHE_ERROR_TTL
+        if status >= 300:
+            return RobotsRules(), self.ttl
+        return RobotsRules(body.decode("utf-8", errors="replace").splitlines()), self.ttl
+
+    async def sitemap_urls(self, url: str) -> List[str]:
+        """
+        返回URL所属主机sitemap中的页面URL，按lastmod从新到旧排序，没有lastmod的排在最后
+
+        sitemap地址取自robots.txt的Sitemap声明，没有声明时使用/sitemap.xml。
+        """
+        return await self._cached("sitemap", url, self._load_sitemaps)
+
+    async def _load_sitemaps(self, origin: str) -> Tuple[List[str], float]:
+        rules = await self.robots(origin + "/")
+        pending = rules.sitemaps or [origin + "/sitemap.xml"]
+        visited = set()
+        urls: List[Tuple[str, Optional[float]]] = []
+        while pending and len(visited) < MAX_SITEMAP_FILES and len(urls) < MAX_SITEMAP_URLS:
+            sitemap_url = urljoin(origin + "/", pending.pop(0))
+            if sitemap_url in visited:
+                continue
+            visited.add(sitemap_url)
+            try:
+                status, body = await self.http.fetch_raw(sitemap_url)
+            except HttpFetchError as e:
+                logger.warning(f"无法获取sitemap {sitemap_url}: {e}")
+                continue
+            if status >= 300 or not body:
+                continue
+            self.sitemap_files += 1
+            try:
+                page_urls, children = await conversion_pool().run(len(body), parse_sitemap, body)
+            except Exception as e:
+                # 单个sitemap无法解析时跳过，不影响其余sitemap和爬取本身
+                logger.warning(f"无法解析sitemap {sitemap_url}: {e}")
+                continue
+            urls.extend(page_urls)
+            pending.extend(children)
+
+        # 稳定排序：有lastmod的按从新到旧，其余保持sitemap中的顺序
+        urls.sort(key=lambda item: -item[1] if item[1] is not None else float("inf"))
+        logger.info(f"{origin} 的sitemap中有 {len(urls)} 个URL（{len(visited)} 个文件）")
+        return [loc for loc, _ in urls[:MAX_SITEMAP_URLS]], self.ttl
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "sitemap_files": self.sitemap_files,
+        }
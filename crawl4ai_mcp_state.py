@@ -0,0 +1,109 @@
+"""
+Crawl4AI MCP服务器的增量爬取状态。
+按URL保存上次爬取时的ETag、Last-Modified、响应体和内容摘要，以及页面内容和链接；
+再次爬取时据此发送条件请求，页面未修改时直接使用保存的内容，不重新渲染。
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from crawl4ai_mcp_cache import normalize_url
+from crawl4ai_mcp_files import atomic_write, sharded_path
+
+logger = logging.getLogger("crawl4ai_mcp")
+
+
+def content_hash(text: str) -> str:
+    """计算页面内容的摘要"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CrawlStateStore:
+    """
+    增量爬取状态存储
+
+    每个规范化URL对应一个gzip压缩的JSON条目，目录在第一次写入时创建。
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: 状态目录
+        """
+        self.directory = directory
+        self.reads = 0
+        self.writes = 0
+        self.misses = 0
+
+    def _entry_path(self, url: str) -> str:
+        # 与抓取存档相同的布局：规范化URL的摘要按前两位分目录
+        return sharded_path(self.directory, normalize_url(url), ".json.gz")
+
+    async def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        读取URL上次爬取的状态
+
+        Args:
+            url: 页面URL
+
+        Returns:
+            状态条目，不存在或无法读取时返回None
+        """
+        entry = await asyncio.to_thread(self._read, url)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.reads += 1
+        return entry
+
+    async def put(self, url: str, entry: Dict[str, Any]):
+        """
+        保存URL的爬取状态，写入失败只记录日志
+
+        Args:
+            url: 页面URL
+            entry: 状态条目
+        """
+        data = gzip.compress(json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        try:
+            await asyncio.to_thread(atomic_write, self._entry_path(url), data)
+            self.writes += 1
+        except OSError as e:
+            logger.warning(f"保存 {url} 的爬取状态失败: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回状态存储的使用统计"""
+        return {"reads": self.reads, "writes": self.writes, "misses": self.misses}
+
+    def _read(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._entry_path(url), "rb") as f:
+                return json.loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取 {url} 的爬取状态失败: {e}")
+            return None
+
+
+class UnchangedResult:
+    """由状态条目还原的未修改页面，字段与crawl4ai的CrawlResult一致"""
+
+    unchanged = True
+
+    def __init__(self, url: str, entry: Dict[str, Any]):
+        self.url = entry.get("url") or url
+        self.success = True
+        self.error_message = None
+        # 只保存了head，足够解析canonical
+        self.html = entry.get("head")
+        self.markdown = entry.get("markdown") or ""
+        self.metadata = {"title": entry.get("title", "")}
+        self.media = {}
+        self.links = {"internal": entry.get("links") or []}
+        self.extracted_content = None
+        self.engine = entry.get("engine", "browser")
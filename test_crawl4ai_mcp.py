@@ -1,36 +1,34 @@
 #!/usr/bin/env python3
 """
 测试爬虫功能的简单脚本
+需要crawl4ai和网络访问，直接运行时打印每个工具的结果，在pytest中作为一个端到端测试运行。
 """
 
-import json
 import asyncio
+import json
 import sys
-from enum import Enum, auto
 
-# 导入需要测试的函数
-from crawl4ai_mcp.utils import (
-    crawl_webpage_impl,
-    crawl_website_impl,
-    extract_structured_data_impl,
-    save_as_markdown_impl
-)
+import pytest
 
-# 模拟CacheMode枚举
+pytest.importorskip("crawl4ai")
 
-
-class CacheMode(Enum):
-    DEFAULT = auto()
-    BYPASS = auto()
-    FORCE = auto()
+# 导入需要测试的函数
+from crawl4ai_mcp_cache import CacheMode
+from crawl4ai_mcp_codec import decode_json
+from crawl4ai_mcp_crawler import (
+    crawl_webpage,
+    crawl_website,
+    extract_structured_data,
+    save_as_markdown
+)
+from crawl4ai_mcp_pool import CrawlerPool
 
 
-async def test_crawl_webpage():
+async def check_crawl_webpage(pool: CrawlerPool):
     """测试爬取单个网页"""
     print("\n=== 测试爬取单个网页 ===")
     url = "https://www.anthropic.com/engineering/building-effective-agents"
-    result_json = await crawl_webpage_impl(url, True, CacheMode.BYPASS)
-    result = json.loads(result_json)
+    result = decode_json(await crawl_webpage(pool, url, True, cache_mode=CacheMode.BYPASS))
 
     if result.get("success", False):
         print(f"网页爬取成功: {url}")
@@ -44,16 +42,16 @@ async def test_crawl_webpage():
         print(f"\n内容预览:\n{preview}")
     else:
         print(f"网页爬取失败: {result.get('error', '未知错误')}")
+    return result
 
 
-async def test_crawl_website():
+async def check_crawl_website(pool: CrawlerPool):
     """测试爬取网站"""
     print("\n=== 测试爬取网站 ===")
     url = "https://www.anthropic.com/engineering"
     max_depth = 1
     max_pages = 2
-    result_json = await crawl_website_impl(url, max_depth, max_pages, True)
-    result = json.loads(result_json)
+    result = await crawl_website(pool, url, max_depth, max_pages, True)
 
     if result.get("success", False):
         print(f"网站爬取成功: {url}")
@@ -67,9 +65,10 @@ async def test_crawl_website():
             print(f"  单词数量: {page.get('word_count', 0)}")
     else:
         print(f"网站爬取失败: {result.get('error', '未知错误')}")
+    return result
 
 
-async def test_extract_structured_data():
+async def check_extract_structured_data(pool: CrawlerPool):
     """测试提取结构化数据"""
     print("\n=== 测试提取结构化数据 ===")
     url = "https://www.anthropic.com/engineering/building-effective-agents"
@@ -87,8 +86,7 @@ async def test_extract_structured_data():
         ]
     }
 
-    result_json = await extract_structured_data_impl(url, schema, "main")
-    result = json.loads(result_json)
+    result = await extract_structured_data(pool, url, schema, "main")
 
     if result.get("success", False):
         print(f"结构化数据提取成功: {url}")
@@ -97,16 +95,16 @@ async def test_extract_structured_data():
             f"提取的数据: {json.dumps(data, indent=2, ensure_ascii=False)[:500]}...")
     else:
         print(f"结构化数据提取失败: {result.get('error', '未知错误')}")
+    return result
 
 
-async def test_save_as_markdown():
+async def check_save_as_markdown(pool: CrawlerPool):
     """测试保存为Markdown"""
     print("\n=== 测试保存为Markdown ===")
     url = "https://www.anthropic.com/engineering/building-effective-agents"
     filename = "test_output.md"
 
-    result_json = await save_as_markdown_impl(url, filename, True)
-    result = json.loads(result_json)
+    result = await save_as_markdown(pool, url, filename, True)
 
     if result.get("success", False):
         print(f"保存为Markdown成功: {url}")
@@ -124,6 +122,27 @@ async def test_save_as_markdown():
             print(f"读取文件失败: {str(e)}")
     else:
         print(f"保存为Markdown失败: {result.get('error', '未知错误')}")
+    return result
+
+
+async def run_all():
+    """在同一个浏览器池上依次运行所有检查，返回各工具的结果"""
+    pool = CrawlerPool(min_size=1, max_size=1)
+    try:
+        return [
+            await check_crawl_webpage(pool),
+            await check_crawl_website(pool),
+            await check_extract_structured_data(pool),
+            await check_save_as_markdown(pool),
+        ]
+    finally:
+        await pool.close()
+
+
+def test_crawl_tools():
+    """所有工具都能成功爬取真实页面"""
+    for result in asyncio.run(run_all()):
+        assert result.get("success"), result.get("error")
 
 
 async def main():
@@ -134,10 +153,7 @@ async def main():
 
     try:
         # 运行测试
-        await test_crawl_webpage()
-        await test_crawl_website()
-        await test_extract_structured_data()
-        await test_save_as_markdown()
+        await run_all()
 
     except Exception as e:
         print(f"测试过程中出错: {str(e)}")
@@ -0,0 +1,145 @@
+"""
+结果缓存和请求合并的测试
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from crawl4ai_mcp_cache import CacheMode, ResultCache, SingleFlight, make_cache_key, normalize_url
+
+
+def test_normalize_url_equivalent_forms():
+    assert normalize_url("HTTPS://Example.com:443?b=2&a=1#top") == "https://example.com/?a=1&b=2"
+    assert normalize_url("http://example.com:8080/x") == "http://example.com:8080/x"
+
+
+def test_make_cache_key_depends_on_options():
+    key = make_cache_key("crawl_webpage", "https://example.com/", include_images=True)
+    assert key == make_cache_key("crawl_webpage", "https://EXAMPLE.com", include_images=True)
+    assert key != make_cache_key("crawl_webpage", "https://example.com/", include_images=False)
+
+
+def test_cache_modes():
+    async def scenario():
+        cache = ResultCache(default_ttl=60)
+        assert await cache.get("k") is None
+        await cache.put("k", b'{"a":1}')
+        assert await cache.get("k") == b'{"a":1}'
+        assert await cache.get("k", CacheMode.BYPASS) is None
+
+        await cache.put("stale", b"1", ttl=-1)
+        assert await cache.get("stale") is None
+        await cache.put("stale", b"1", ttl=-1)
+        assert await cache.get("stale", CacheMode.FORCE) == b"1"
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+
+
+def test_memory_budget_evicts_least_recently_used():
+    async def scenario():
+        cache = ResultCache(max_memory_bytes=10)
+        await cache.put("a", b"12345")
+        await cache.put("b", b"12345")
+        await cache.get("a")
+        await cache.put("c", b"12345")
+        return [await cache.get(key) for key in ("a", "b", "c")], cache.stats()
+
+    values, stats = asyncio.run(scenario())
+    assert values == [b"12345", None, b"12345"]
+    assert stats["memory_bytes"] == 10
+
+
+def test_disk_layer_survives_restart(tmp_path):
+    async def scenario():
+        await ResultCache(disk_dir=str(tmp_path)).put("k", b'{"page":true}', ttl=60)
+        fresh = ResultCache(disk_dir=str(tmp_path))
+        return await fresh.get("k"), fresh.stats()
+
+    value, stats = asyncio.run(scenario())
+    assert value == b'{"page":true}'
+    assert stats["disk_hits"] == 1
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def scenario():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.run("k", fetch) for _ in range(5)))
+        return results, flights.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [1] * 5
+    assert stats == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+
+def test_single_flight_shares_exceptions():
+    async def fetch():
+        await asyncio.sleep(0)
+        raise RuntimeError("boom")
+
+    async def scenario():
+        flights = SingleFlight()
+        return await asyncio.gather(flights.run("k", fetch), flights.run("k", fetch),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_single_flight_cancelled_waiter_does_not_cancel_others():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        flights = SingleFlight()
+        first = asyncio.create_task(flights.run("k", fetch))
+        second = asyncio.create_task(flights.run("k", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    started = time.monotonic()
+    assert asyncio.run(scenario()) == "done"
+    assert time.monotonic() - started < 5
+
+
+def test_single_flight_new_caller_after_last_waiter_cancelled():
+    async def fetch():
+        try:
+            await asyncio.sleep(0.05)
+            return "done"
+        finally:
+            # 取消后的清理（例如关闭页面）需要一段时间
+            await asyncio.shield(asyncio.sleep(0.05))
+
+    async def scenario():
+        flights = SingleFlight()
+        first = asyncio.create_task(flights.run("k", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0)
+        # 被取消的抓取仍在清理时到达的相同请求
+        second = asyncio.create_task(flights.run("k", fetch))
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second, flights.stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result == "done"
+    assert stats["leaders"] == 2
@@ -0,0 +1,48 @@
+"""
+JSON编解码的测试
+"""
+
+import json
+
+import pytest
+
+from crawl4ai_mcp_codec import RawJSON, decode_json, encode_json
+
+
+def test_encode_matches_compact_stdlib_output():
+    value = {"title": "中文标题", "count": 3, "items": [1.5, None, True]}
+    assert encode_json(value) == json.dumps(
+        value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def test_raw_fragments_are_spliced_verbatim():
+    fragment = RawJSON(b'{"markdown":"# page","word_count":2}')
+    encoded = encode_json({"jsonrpc": "2.0", "id": 1, "result": [fragment, fragment]})
+    assert decode_json(encoded) == {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "result": [{"markdown": "# page", "word_count": 2}] * 2,
+    }
+    assert encode_json(fragment) is fragment.data
+
+
+def test_placeholder_like_strings_are_not_replaced():
+    value = {"text": "\x00not-a-placeholder:0\x00"}
+    assert decode_json(encode_json({"raw": RawJSON(b"1"), **value})) == {"raw": 1, **value}
+
+
+def test_decode_accepts_bytes_str_and_objects():
+    assert decode_json(b'{"a":1}') == {"a": 1}
+    assert decode_json('{"a":1}') == {"a": 1}
+    assert decode_json(RawJSON(b"[1,2]")) == [1, 2]
+    assert decode_json({"a": 1}) == {"a": 1}
+
+
+def test_decode_rejects_invalid_json():
+    with pytest.raises(json.JSONDecodeError):
+        decode_json(b"{not json")
+
+
+def test_unserializable_values_raise_type_error():
+    with pytest.raises(TypeError):
+        encode_json({"value": object()})
@@ -0,0 +1,66 @@
+"""
+爬取实现的离线测试，浏览器池和爬虫由桩对象代替
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("crawl4ai")
+pytest.importorskip("crawl4ai_mcp.utils")
+
+from crawl4ai_mcp_crawler import save_as_markdown
+
+MARKDOWN = "word " * 500
+
+
+class StubCrawler:
+    """按URL返回固定结果的爬虫"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def arun(self, url, config=None):
+        self.calls.append(url)
+        return SimpleNamespace(success=True, url=url, error_message=None, markdown=MARKDOWN,
+                               html="<p>" + MARKDOWN + "</p>", metadata={"title": "Stub"},
+                               media={}, links={})
+
+
+class StubPool:
+    """只提供lease的浏览器池"""
+
+    def __init__(self):
+        self.crawler = StubCrawler()
+
+    @asynccontextmanager
+    async def lease(self):
+        yield self.crawler
+
+
+def test_save_as_markdown_writes_file(tmp_path):
+    pool = StubPool()
+    target = tmp_path / "out" / "page"
+    result = asyncio.run(save_as_markdown(pool, "https://example.com/", str(target)))
+
+    assert result["success"], result.get("error")
+    assert result["filename"] == str(target) + ".md"
+    assert result["word_count"] == 500
+    content = (tmp_path / "out" / "page.md").read_text(encoding="utf-8")
+    assert content.startswith("# Stub\n\nSource: https://example.com/\n\n")
+    assert content.endswith(MARKDOWN)
+    assert pool.crawler.calls == ["https://example.com/"]
+
+
+def test_save_as_markdown_reports_crawl_failure(tmp_path):
+    pool = StubPool()
+
+    async def failing(url, config=None):
+        return SimpleNamespace(success=False, error_message="boom")
+
+    pool.crawler.arun = failing
+    result = asyncio.run(save_as_markdown(pool, "https://example.com/", str(tmp_path / "x.md")))
+    assert result == {"success": False, "error": "boom"}
+    assert not (tmp_path / "x.md").exists()
@@ -0,0 +1,97 @@
+"""
+批量导出的测试
+"""
+
+import asyncio
+import json
+import tarfile
+
+import pytest
+
+from crawl4ai_mcp_export import create_exporter, url_to_filename
+
+PAGES = [
+    {"url": "https://example.com/", "title": "Home", "markdown": "home", "word_count": 1},
+    {"url": "https://example.com/docs/intro", "title": "Intro", "markdown": "intro text",
+     "word_count": 2},
+]
+
+
+def export(format: str, output_path: str, pages=PAGES, failures=()):
+    async def scenario():
+        exporter = create_exporter(format, output_path)
+        for page in pages:
+            await exporter.add(page)
+        for url in failures:
+            exporter.add_failure(url, "timeout")
+        return await exporter.finish()
+
+    return asyncio.run(scenario())
+
+
+def test_url_to_filename():
+    assert url_to_filename("https://example.com/") == "example.com_index.md"
+    assert url_to_filename("https://example.com/docs/intro/") == "example.com_docs_intro.md"
+    with_query = url_to_filename("https://example.com/search?q=1")
+    assert with_query.startswith("example.com_search_") and with_query.endswith(".md")
+    assert len(url_to_filename("https://example.com/" + "a" * 500)) < 200
+
+
+def test_directory_export_skips_unchanged_pages(tmp_path):
+    output = tmp_path / "site"
+    summary = export("directory", str(output), failures=["https://example.com/broken"])
+    assert (summary["written"], summary["failed"], summary["pages_exported"]) == (2, 1, 2)
+    assert (output / "example.com_docs_intro.md").read_text(encoding="utf-8") == \
+        "# Intro\n\nSource: https://example.com/docs/intro\n\nintro text"
+    manifest = json.loads((output / "manifest.json").read_text(encoding="utf-8"))
+    assert [page["url"] for page in manifest["pages"]][-1] == "https://example.com/broken"
+
+    summary = export("directory", str(output))
+    assert (summary["written"], summary["unchanged"]) == (0, 2)
+    assert summary["output_changed"] is False
+
+
+def test_jsonl_export_keeps_unchanged_file(tmp_path):
+    output = tmp_path / "site.jsonl"
+    assert export("jsonl", str(output))["output_changed"] is True
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [record["url"] for record in records] == [page["url"] for page in PAGES]
+
+    mtime = output.stat().st_mtime_ns
+    assert export("jsonl", str(output))["output_changed"] is False
+    assert output.stat().st_mtime_ns == mtime
+    assert export("jsonl", str(output), pages=PAGES[:1])["output_changed"] is True
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_tar_export(tmp_path):
+    output = tmp_path / "site.tar.gz"
+    summary = export("tar", str(output))
+    assert summary["written"] == 2
+    with tarfile.open(output) as tar:
+        assert sorted(tar.getnames()) == ["example.com_docs_intro.md", "example.com_index.md"]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        create_exporter("zip", str(tmp_path / "out"))
+
+
+def test_directory_export_separates_colliding_filenames(tmp_path):
+    output = tmp_path / "site"
+    pages = [
+        {"url": "https://example.com/a/b", "title": "AB", "markdown": "slash"},
+        {"url": "https://example.com/a_b", "title": "A_B", "markdown": "underscore"},
+        {"url": "https://example.com/a.md", "title": "A.md", "markdown": "suffix"},
+        {"url": "https://example.com/a", "title": "A", "markdown": "plain"},
+    ]
+    summary = export("directory", str(output), pages=pages)
+    paths = [page["path"] for page in summary["pages"]]
+    assert len(set(paths)) == 4
+    assert paths[0] == "example.com_a_b.md"
+    for page, path in zip(pages, paths):
+        assert (output / path).read_text(encoding="utf-8").endswith(page["markdown"])
+
+    summary = export("directory", str(output), pages=list(reversed(pages)))
+    assert [page["path"] for page in reversed(summary["pages"])] == paths
+    assert summary["unchanged"] == 4
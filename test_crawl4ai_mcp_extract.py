@@ -0,0 +1,77 @@
+"""
+结构化数据提取的测试
+"""
+
+import pytest
+
+pytest.importorskip("crawl4ai")
+
+from crawl4ai_mcp_extract import (
+    FAST_PARSER,
+    SchemaCache,
+    compile_schema,
+    run_plans,
+    run_schemas,
+    schema_hash,
+)
+
+HTML = """<html><head><title>t</title></head><body>
+<div class="item"><h2> First </h2><a href="/1">one</a><span class="price">$10</span></div>
+<div class="item"><h2>Second</h2><a href="/2">two</a></div>
+</body></html>"""
+
+SCHEMA = {
+    "name": "Items",
+    "baseSelector": "div.item",
+    "fields": [
+        {"name": "title", "selector": "h2", "type": "text"},
+        {"name": "link", "selector": "a", "type": "attribute", "attribute": "href"},
+        {"name": "price", "selector": ".price", "type": "regex", "pattern": r"\$(\d+)"},
+    ],
+}
+
+EXPECTED = [
+    {"title": "First", "link": "/1", "price": "10"},
+    {"title": "Second", "link": "/2"},
+]
+
+
+def test_schema_hash_ignores_key_order():
+    reordered = {"fields": SCHEMA["fields"], "baseSelector": "div.item", "name": "Items"}
+    assert schema_hash(reordered) == schema_hash(SCHEMA)
+
+
+def test_schema_cache_reuses_plans():
+    cache = SchemaCache(max_entries=1)
+    digest, plan = cache.get(SCHEMA)
+    assert cache.get(dict(SCHEMA)) == (digest, plan)
+    cache.get({"name": "Other", "baseSelector": "body", "fields": []})
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 2)
+
+
+def test_compile_schema_rejects_invalid_schema():
+    with pytest.raises(ValueError):
+        compile_schema({"fields": "not a list"})
+
+
+def test_run_plans_parses_page_once_for_all_schemas():
+    titles = {"name": "Titles", "baseSelector": "h2", "fields": [
+        {"name": "text", "selector": "*", "type": "text"}]}
+    items, _ = run_plans([compile_schema(SCHEMA), compile_schema(titles)],
+                         "https://example.com/", HTML)
+    assert items == EXPECTED
+
+
+def test_run_schemas_matches_run_plans():
+    assert run_schemas([SCHEMA], "https://example.com/", HTML.encode("utf-8")) == [EXPECTED]
+
+
+@pytest.mark.skipif(not FAST_PARSER, reason="需要lxml和cssselect")
+def test_compiled_plan_matches_crawl4ai_strategy():
+    from crawl4ai_mcp_extract import StrategySchema
+
+    plan = compile_schema(SCHEMA)
+    assert plan.fast
+    assert run_plans([plan], "https://example.com/", HTML) == \
+        run_plans([StrategySchema(SCHEMA)], "https://example.com/", HTML)
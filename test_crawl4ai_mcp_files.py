@@ -0,0 +1,34 @@
+"""
+文件工具的测试
+"""
+
+import os
+
+import pytest
+
+from crawl4ai_mcp_files import atomic_write, sharded_path
+
+
+def test_atomic_write_creates_directories_and_joins_chunks(tmp_path):
+    path = tmp_path / "a" / "b" / "file.bin"
+    atomic_write(str(path), b"head\n", b"body")
+    assert path.read_bytes() == b"head\nbody"
+    atomic_write(str(path), b"new")
+    assert path.read_bytes() == b"new"
+    assert os.listdir(path.parent) == ["file.bin"]
+
+
+def test_atomic_write_leaves_no_temp_file_on_error(tmp_path):
+    path = tmp_path / "file.bin"
+    with pytest.raises(TypeError):
+        atomic_write(str(path), b"ok", "not bytes")
+    assert not path.exists()
+    assert os.listdir(tmp_path) == []
+
+
+def test_sharded_path():
+    path = sharded_path("/store", "https://example.com/", ".json.gz")
+    directory, name = os.path.split(path)
+    assert name.endswith(".json.gz") and len(name) == 64 + len(".json.gz")
+    assert directory == os.path.join("/store", name[:2])
+    assert sharded_path("/store", "https://example.com/", ".json.gz") == path
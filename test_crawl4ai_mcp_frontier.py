@@ -0,0 +1,70 @@
+"""
+网站爬取前沿队列的测试
+"""
+
+import asyncio
+
+from crawl4ai_mcp_frontier import (
+    CrawlFrontier,
+    HostLimiter,
+    canonicalize_url,
+    extract_canonical_url,
+)
+
+
+def test_canonicalize_drops_tracking_params_and_fragment():
+    assert (canonicalize_url("https://Example.com/a?utm_source=x&id=2&gclid=y#part")
+            == "https://example.com/a?id=2")
+
+
+def test_extract_canonical_url_from_head():
+    html = ('<html><head><link rel="canonical" href="/docs/?utm_medium=mail"></head>'
+            '<body><link rel="canonical" href="/ignored"></body></html>')
+    assert extract_canonical_url(html, "https://example.com/page") == "https://example.com/docs/"
+    assert extract_canonical_url("<html><head></head></html>", "https://example.com/") is None
+    assert extract_canonical_url(None, "https://example.com/") is None
+
+
+def test_frontier_orders_by_priority_then_discovery():
+    frontier = CrawlFrontier(max_depth=2)
+    assert frontier.add("https://example.com/deep", 2)
+    assert frontier.add("https://example.com/b", 1)
+    assert frontier.add("https://example.com/a", 1)
+    assert frontier.add("https://example.com/first", 2, priority=-1)
+    order = [frontier.pop()[0] for _ in range(len(frontier))]
+    assert order == [
+        "https://example.com/first",
+        "https://example.com/b",
+        "https://example.com/a",
+        "https://example.com/deep",
+    ]
+
+
+def test_frontier_rejects_duplicates_depth_scheme_and_hosts():
+    frontier = CrawlFrontier(max_depth=1, allowed_hosts=["Example.com"])
+    assert frontier.add("https://example.com/a?utm_campaign=x", 1)
+    assert not frontier.add("https://example.com/a#section", 1)
+    assert not frontier.add("https://example.com/b", 2)
+    assert not frontier.add("mailto:someone@example.com", 1)
+    assert not frontier.add("https://other.com/", 1)
+    assert frontier.add_links(["https://example.com/c", "https://example.com/c"], 1) == 1
+    assert not frontier.mark_seen("https://example.com/c")
+    assert frontier.mark_seen("https://example.com/d")
+
+
+def test_host_limiter_shares_semaphore_per_host():
+    limiter = HostLimiter(per_host=2)
+    assert limiter.for_url("https://a.com/1") is limiter.for_url("https://A.com/2")
+    assert limiter.for_url("https://a.com/") is not limiter.for_url("https://b.com/")
+
+
+def test_host_limiter_paces_requests():
+    async def scenario():
+        limiter = HostLimiter(per_host=2)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(limiter.pace("https://a.com/", 0.05) for _ in range(3)))
+        await limiter.pace("https://b.com/", 0.05)
+        return loop.time() - started
+
+    assert asyncio.run(scenario()) >= 0.1
@@ -0,0 +1,72 @@
+"""
+大结果存储和分页的测试
+"""
+
+import pytest
+
+from crawl4ai_mcp_results import ResultNotFound, ResultStore, paginate_result, utf8_boundary
+
+
+def read_all(store: ResultStore, handle: str, chunk_bytes: int) -> str:
+    chunks = []
+    cursor = 0
+    while cursor is not None:
+        chunk = store.read(handle, cursor, chunk_bytes)
+        chunks.append(chunk["data"])
+        cursor = chunk["next_cursor"]
+    return "".join(chunks)
+
+
+def test_paginate_result_returns_handle_and_first_chunk():
+    store = ResultStore()
+    data = ('{"text":"' + "汉字" * 100 + '"}').encode("utf-8")
+    page = paginate_result(store, data, 64)
+    assert page["paginated"] is True
+    assert page["total_bytes"] == len(data)
+    assert page["cursor"] == 0
+    assert len(page["data"].encode("utf-8")) <= 64
+    assert page["next_cursor"] is not None
+    assert read_all(store, page["handle"], 64) == data.decode("utf-8")
+
+
+def test_chunks_end_on_utf8_boundaries():
+    data = "é".encode("utf-8") * 10
+    assert utf8_boundary(data, 3) == 2
+    assert utf8_boundary(data, 100) == len(data)
+
+
+def test_identical_results_share_a_handle():
+    store = ResultStore()
+    assert store.put(b"same") == store.put(b"same")
+    assert store.stats()["entries"] == 1
+
+
+def test_byte_budget_evicts_oldest():
+    store = ResultStore(max_bytes=8)
+    first = store.put(b"aaaa")
+    store.put(b"bbbb")
+    store.put(b"cccc")
+    with pytest.raises(ResultNotFound):
+        store.read(first)
+    with pytest.raises(ValueError):
+        store.put(b"x" * 9)
+
+
+def test_expired_and_released_results_are_gone():
+    store = ResultStore(ttl=-1)
+    handle = store.put(b"data")
+    with pytest.raises(ResultNotFound):
+        store.read(handle)
+    assert store.stats()["expired"] == 1
+
+    store = ResultStore()
+    handle = store.put(b"data")
+    assert store.release(handle) is True
+    assert store.release(handle) is False
+
+
+def test_invalid_cursor():
+    store = ResultStore()
+    handle = store.put(b"data")
+    with pytest.raises(ValueError):
+        store.read(handle, 5)
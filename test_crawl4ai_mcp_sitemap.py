@@ -0,0 +1,76 @@
+"""
+sitemap解析和robots.txt规则的测试
+"""
+
+import gzip
+
+import pytest
+
+pytest.importorskip("crawl4ai")
+
+from crawl4ai_mcp_sitemap import (
+    RobotsRules,
+    SitemapError,
+    decompress_sitemap,
+    parse_lastmod,
+    parse_sitemap,
+)
+
+URLSET = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://example.com/a</loc><lastmod>2024-01-02</lastmod></url>
+  <url><loc> https://example.com/b </loc></url>
+  <url><lastmod>2024-01-03</lastmod></url>
+</urlset>"""
+
+INDEX = b"""<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://example.com/sitemap-1.xml.gz</loc></sitemap>
+</sitemapindex>"""
+
+
+def test_parse_urlset():
+    urls, children = parse_sitemap(URLSET)
+    assert urls == [("https://example.com/a", parse_lastmod("2024-01-02")),
+                    ("https://example.com/b", None)]
+    assert children == []
+
+
+def test_parse_index_and_gzip():
+    urls, children = parse_sitemap(gzip.compress(INDEX))
+    assert urls == []
+    assert children == ["https://example.com/sitemap-1.xml.gz"]
+
+
+def test_parse_text_sitemap_and_invalid_xml():
+    urls, _ = parse_sitemap(b"https://example.com/a\n\nnot a url\nhttps://example.com/b\n")
+    assert [loc for loc, _ in urls] == ["https://example.com/a", "https://example.com/b"]
+    assert parse_sitemap(b"<urlset><url>") == ([], [])
+
+
+def test_decompression_is_bounded():
+    with pytest.raises(SitemapError):
+        decompress_sitemap(gzip.compress(b"x" * 1000), max_bytes=100)
+    with pytest.raises(SitemapError):
+        parse_sitemap(b"\x1f\x8bnot gzip at all")
+
+
+def test_parse_lastmod():
+    assert parse_lastmod("2024-01-01T00:00:00Z") == parse_lastmod("2024-01-01") == 1704067200
+    assert parse_lastmod("2024-01-01T02:00:00+02:00") == 1704067200
+    assert parse_lastmod("yesterday") is None
+    assert parse_lastmod(None) is None
+
+
+def test_robots_rules():
+    rules = RobotsRules([
+        "User-agent: *",
+        "Disallow: /private",
+        "Crawl-delay: 2",
+        "Sitemap: https://example.com/sitemap.xml",
+    ])
+    assert rules.allowed("https://example.com/docs")
+    assert not rules.allowed("https://example.com/private/page")
+    assert rules.crawl_delay == 2
+    assert rules.sitemaps == ["https://example.com/sitemap.xml"]
+    assert not RobotsRules(disallow_all=True).allowed("https://example.com/")
+    assert RobotsRules().allowed("https://example.com/")